@@ -2,10 +2,14 @@
 WhileD Language Abstract Syntax Tree (AST) Definition
 
 This module defines AST node classes for the WhileD language, including expressions (Expr) and commands (Com).
+
+Nodes are immutable slotted dataclasses with a structural hash computed once
+at construction. HashConsTable shares structurally identical subtrees, so a
+program holds a single EVar("i") however often i is used.
 """
 
-from dataclasses import dataclass
-from typing import Union
+from dataclasses import dataclass, field
+from typing import Dict, List, Union
 
 
 def indent_lines(text: str, indent: str = "  ") -> str:
@@ -14,28 +18,80 @@ def indent_lines(text: str, indent: str = "  ") -> str:
     return '\n'.join(indent + line if line.strip() else line for line in lines)
 
 
+# =======================
+# Node Base Class
+# =======================
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Node:
+    """Base class of all AST nodes.
+    
+    The structural hash is computed in __post_init__ from the node type and
+    the fields (children contribute their own cached hash), so hashing any
+    node is O(1). Equality is structural and checked without recursion, so
+    it also works on very deep trees.
+    """
+    _hash: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, '_hash', hash((type(self), *map(self.__getattribute__, self.__match_args__))))
+    
+    def children(self) -> tuple:
+        """Field values in declaration order (sub-nodes and plain values)."""
+        return tuple(map(self.__getattribute__, self.__match_args__))
+    
+    def __hash__(self):
+        return self._hash
+    
+    def __reduce__(self):
+        # Rebuild through the constructor: the cached hash depends on the
+        # process (string hashing is randomised), so it must not be pickled
+        return (type(self), self.children())
+    
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not type(self) or other._hash != self._hash:
+            return False
+        
+        # Compare field by field, walking sub-nodes with an explicit stack
+        stack = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            for x, y in zip(a.children(), b.children()):
+                if x is y:
+                    continue
+                if isinstance(x, Node):
+                    if type(x) is not type(y) or x._hash != y._hash:
+                        return False
+                    stack.append((x, y))
+                elif type(x) is not type(y) or x != y:
+                    return False
+        return True
+
+
 # =======================
 # Expression AST Nodes
 # =======================
 
-@dataclass
-class EConst:
+@dataclass(frozen=True, slots=True, eq=False)
+class EConst(Node):
     """Integer constant: 5, 10, etc."""
     value: int
     
     def __str__(self):
         return str(self.value)
 
-@dataclass
-class EVar:
+@dataclass(frozen=True, slots=True, eq=False)
+class EVar(Node):
     """Variable reference: x, y, etc."""
     name: str
     
     def __str__(self):
         return self.name
 
-@dataclass
-class EBinop:
+@dataclass(frozen=True, slots=True, eq=False)
+class EBinop(Node):
     """Binary operation: e1 + e2, e1 && e2, etc.
     
     Operators:
@@ -50,8 +106,8 @@ class EBinop:
     def __str__(self):
         return f"({self.left} {self.op} {self.right})"
 
-@dataclass
-class EUnop:
+@dataclass(frozen=True, slots=True, eq=False)
+class EUnop(Node):
     """Unary operation: !e, -e
     
     Operators:
@@ -64,8 +120,8 @@ class EUnop:
     def __str__(self):
         return f"({self.op}{self.expr})"
 
-@dataclass
-class EDeref:
+@dataclass(frozen=True, slots=True, eq=False)
+class EDeref(Node):
     """Pointer dereference: *e
     
     Equivalent to *ptr in C language.
@@ -75,8 +131,8 @@ class EDeref:
     def __str__(self):
         return f"(*{self.expr})"
 
-@dataclass
-class EAddrOf:
+@dataclass(frozen=True, slots=True, eq=False)
+class EAddrOf(Node):
     """Address-of operator: &e
     
     Equivalent to &var in C language.
@@ -96,15 +152,15 @@ Expr = Union[EConst, EVar, EBinop, EUnop, EDeref, EAddrOf]
 # Command AST Nodes
 # =======================
 
-@dataclass
-class CSkip:
+@dataclass(frozen=True, slots=True, eq=False)
+class CSkip(Node):
     """Skip statement (no-op)"""
     
     def __str__(self):
         return "skip"
 
-@dataclass
-class CAsgnVar:
+@dataclass(frozen=True, slots=True, eq=False)
+class CAsgnVar(Node):
     """Variable assignment: x = e"""
     var: str
     expr: Expr
@@ -112,8 +168,8 @@ class CAsgnVar:
     def __str__(self):
         return f"{self.var} = {self.expr}"
 
-@dataclass
-class CAsgnDeref:
+@dataclass(frozen=True, slots=True, eq=False)
+class CAsgnDeref(Node):
     """Pointer assignment: *e1 = e2
     
     Store value e2 to address e1.
@@ -125,8 +181,8 @@ class CAsgnDeref:
     def __str__(self):
         return f"*{self.addr} = {self.value}"
 
-@dataclass
-class CSeq:
+@dataclass(frozen=True, slots=True, eq=False)
+class CSeq(Node):
     """Sequential composition: c1; c2"""
     first: 'Com'
     second: 'Com'
@@ -139,8 +195,8 @@ class CSeq:
             second_str = indent_lines(second_str)
         return f"{first_str};\n{second_str}"
 
-@dataclass
-class CIf:
+@dataclass(frozen=True, slots=True, eq=False)
+class CIf(Node):
     """Conditional statement: if (cond) then c1 else c2"""
     cond: Expr
     then_branch: 'Com'
@@ -160,8 +216,8 @@ class CIf:
             else_str = "  " + else_str
         return f"if ({self.cond}) then\n{then_str}\nelse\n{else_str}"
 
-@dataclass
-class CWhile:
+@dataclass(frozen=True, slots=True, eq=False)
+class CWhile(Node):
     """Loop statement: while (cond) do body"""
     cond: Expr
     body: 'Com'
@@ -178,3 +234,60 @@ class CWhile:
 
 # Command type alias
 Com = Union[CSkip, CAsgnVar, CAsgnDeref, CSeq, CIf, CWhile]
+
+
+# =======================
+# Hash-Consing
+# =======================
+
+class HashConsTable:
+    """Shares structurally identical AST subtrees.
+    
+    Usage:
+        table = HashConsTable()
+        program = table.intern(program)       # canonical copy of a whole tree
+        i = table.make(EVar, "i")             # canonical node from canonical children
+    
+    Every structurally distinct subtree exists once among the canonical
+    nodes, so canonical nodes can be compared with `is` and used as cache
+    keys for work done per subtree.
+    """
+    
+    def __init__(self):
+        self.nodes: Dict[Node, Node] = {}
+    
+    def make(self, cls: type, *args) -> Node:
+        """Build a node whose Node arguments are already canonical, returning the canonical one."""
+        node = cls(*args)
+        return self.nodes.setdefault(node, node)
+    
+    def intern(self, root: Node) -> Node:
+        """Canonical version of a whole tree (iterative, post-order)."""
+        nodes = self.nodes
+        canonical: Dict[int, Node] = {}    # id(original) -> canonical node
+        stack: List[tuple] = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in canonical:
+                continue
+            if nodes.get(node) is node:
+                canonical[id(node)] = node
+                continue
+            children = node.children()
+            if not expanded:
+                stack.append((node, True))
+                for child in children:
+                    if isinstance(child, Node) and id(child) not in canonical:
+                        stack.append((child, False))
+                continue
+            
+            args = [canonical[id(c)] if isinstance(c, Node) else c for c in children]
+            if all(a is c for a, c in zip(args, children)):
+                candidate = node
+            else:
+                candidate = type(node)(*args)
+            canonical[id(node)] = nodes.setdefault(candidate, candidate)
+        return canonical[id(root)]
+    
+    def __len__(self):
+        return len(self.nodes)
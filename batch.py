@@ -0,0 +1,225 @@
+"""
+Batch Compiler: WhileD Source Files to CFG Markdown
+
+This module compiles many WhileD source files in parallel:
+1. Collect sources from directories (recursively), glob patterns or single files
+2. Fan the files out over a ProcessPoolExecutor, one fresh CFGGenerator per file
+3. Write one Markdown file per source (linear IR, BB IR and Mermaid flowchart,
+   in the same layout as main.py --generate)
+4. Report per-file failures without aborting the batch
+5. Optionally reuse the artifacts of unchanged programs from a CFGCache
+
+Usage:
+    python batch.py programs/                    # every *.wd file under programs/
+    python batch.py "programs/**/*.wd" -o out -j 8
+    python batch.py programs/ --cache .cfg_cache  # skip unchanged programs
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from cfg_generator import CFGGenerator
+from cfg_cache import CFGArtifacts, CFGCache
+from whiled_parser import parse_program
+
+
+DEFAULT_OUTPUT_DIR = "mermaid_outputs/batch"
+DEFAULT_EXTENSION = ".wd"
+
+
+@dataclass
+class CompileResult:
+    """Outcome of compiling one source file."""
+    source: str                   # input path
+    output: Optional[str]         # written Markdown file (None on failure)
+    error: Optional[str] = None   # failure message
+    instructions: int = 0         # linear IR length
+    blocks: int = 0               # basic blocks
+    seconds: float = 0.0
+    cached: bool = False          # artifacts came from the cache
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# =======================
+# Source Collection
+# =======================
+
+def collect_sources(paths: Sequence[str], extension: str = DEFAULT_EXTENSION) -> List[Tuple[str, str]]:
+    """Expand directories, glob patterns and files into (source, output stem) pairs.
+
+    The output stem is the path relative to the directory argument (or the
+    file name for globs and single files) without the extension, so a
+    directory tree is mirrored in the output directory. Sources from
+    different arguments that would share a stem (d1/a.wd and d2/a.wd) are
+    prefixed with the name of their argument's directory (d1/a, d2/a);
+    any stem still taken gets a numeric suffix, so every source has its
+    own output file.
+    """
+    found: List[Tuple[str, str, str]] = []
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            root = path
+            matches = [(f, os.path.relpath(f, path))
+                       for f in glob.glob(os.path.join(path, "**", "*" + extension), recursive=True)]
+        elif os.path.isfile(path):
+            root = os.path.dirname(path) or "."
+            matches = [(path, os.path.basename(path))]
+        else:
+            root = _glob_root(path)
+            matches = [(f, os.path.relpath(f, root))
+                       for f in glob.glob(path, recursive=True) if os.path.isfile(f)]
+        root_name = os.path.basename(os.path.abspath(root))
+        for source, relative in sorted(matches):
+            if source not in seen:
+                seen.add(source)
+                found.append((source, os.path.splitext(relative)[0], root_name))
+
+    counts = Counter(stem for _, stem, _ in found)
+    taken = set()
+    pairs: List[Tuple[str, str]] = []
+    for source, stem, root_name in found:
+        if counts[stem] > 1:
+            stem = os.path.join(root_name, stem)
+        unique, n = stem, 1
+        while unique in taken:
+            n += 1
+            unique = f"{stem}_{n}"
+        taken.add(unique)
+        pairs.append((source, unique))
+    return pairs
+
+
+def _glob_root(pattern: str) -> str:
+    """Directory part of a glob pattern before its first wildcard."""
+    cut = min((i for i, c in enumerate(pattern) if c in "*?["), default=len(pattern))
+    return os.path.dirname(pattern[:cut]) or "."
+
+
+# =======================
+# Compilation
+# =======================
+
+def cfg_markdown(title: str, source: str, artifacts: CFGArtifacts) -> str:
+    """Markdown report of a CFG: source, linear IR, BB IR and Mermaid flowchart."""
+    return (f"# {title}\n\n**源程序**: `{source}`\n\n"
+            f"## 阶段1：表达式拆分 (LABEL)\n\n```\n{artifacts.linear_ir}```\n\n"
+            f"## 阶段2：基本块 (BB)\n\n```\n{artifacts.bb_ir}```\n\n"
+            f"## 阶段3：控制流图\n\n```mermaid\n{artifacts.mermaid}\n```\n")
+
+
+def compile_file(source_path: str, output_path: str, cache: Optional[CFGCache] = None) -> CompileResult:
+    """Parse, lower and write one file; errors are returned, not raised."""
+    start = time.perf_counter()
+    try:
+        with open(source_path, encoding="utf-8") as f:
+            source = f.read()
+        program = parse_program(source)
+        if cache is not None:
+            hits = cache.stats.hits
+            artifacts = cache.get_or_build(program)
+            cached = cache.stats.hits > hits
+        else:
+            artifacts = CFGArtifacts.from_cfg(CFGGenerator(iterative=True).generate_cfg(program))
+            cached = False
+        text = cfg_markdown(os.path.basename(source_path), " ".join(source.split()), artifacts)
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return CompileResult(source_path, output_path, None, artifacts.instructions, artifacts.blocks,
+                             time.perf_counter() - start, cached)
+    except Exception as e:
+        return CompileResult(source_path, None, f"{type(e).__name__}: {e}",
+                             seconds=time.perf_counter() - start)
+
+
+def compile_chunk(jobs: List[Tuple[str, str]], cache_dir: Optional[str] = None) -> List[CompileResult]:
+    """Compile a list of (source, output) pairs in one worker task."""
+    cache = CFGCache(cache_dir) if cache_dir else None
+    return [compile_file(source, output, cache) for source, output in jobs]
+
+
+def compile_batch(sources: List[Tuple[str, str]], output_dir: str,
+                  workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                  cache_dir: Optional[str] = None) -> List[CompileResult]:
+    """Compile (source, output stem) pairs, in parallel when workers > 1.
+
+    Files are sent to the workers in chunks to keep inter-process overhead
+    low on large batches of small programs. A worker that dies takes only
+    its own chunk down: those files are reported as failed.
+
+    Args:
+        sources: Output of collect_sources
+        output_dir: Directory that receives <stem>.md for every source
+        workers: Worker processes (default: os.cpu_count()); 1 compiles in-process
+        chunk_size: Files per task (default: about four tasks per worker)
+        cache_dir: CFGCache directory shared by all workers (None: no cache)
+
+    Returns:
+        One CompileResult per source, in input order
+    """
+    jobs = [(source, os.path.join(output_dir, stem + ".md")) for source, stem in sources]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return compile_chunk(jobs, cache_dir)
+
+    chunk_size = chunk_size or max(1, len(jobs) // (workers * 4))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    results: List[Optional[List[CompileResult]]] = [None] * len(chunks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(compile_chunk, chunk, cache_dir): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = [CompileResult(source, None, f"worker failed: {type(e).__name__}: {e}")
+                              for source, _ in chunks[i]]
+    return [result for chunk in results for result in chunk]
+
+
+# =======================
+# Command Line
+# =======================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量编译 WhileD 源文件，生成 IR 和 Mermaid 流程图")
+    parser.add_argument("paths", nargs="+", help="源文件、目录（递归查找）或 glob 模式")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_DIR, help=f"输出目录（默认 {DEFAULT_OUTPUT_DIR}）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--ext", default=DEFAULT_EXTENSION, help=f"目录中查找的扩展名（默认 {DEFAULT_EXTENSION}）")
+    parser.add_argument("--cache", metavar="DIR", default=None, help="缓存目录：未修改的程序直接复用上次的结果")
+    args = parser.parse_args(argv)
+
+    sources = collect_sources(args.paths, args.ext)
+    if not sources:
+        print("未找到源文件")
+        return 1
+
+    start = time.perf_counter()
+    results = compile_batch(sources, args.output, args.jobs, cache_dir=args.cache)
+    elapsed = time.perf_counter() - start
+
+    failures = [result for result in results if not result.ok]
+    for result in failures:
+        print(f"  ✗ {result.source}: {result.error}")
+    print(f"共 {len(results)} 个文件，成功 {len(results) - len(failures)}，失败 {len(failures)}，"
+          f"耗时 {elapsed:.2f}s，输出目录 {args.output}/")
+    if args.cache:
+        print(f"缓存命中 {sum(result.cached for result in results)} 个文件（{args.cache}/）")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2393 @@
+"""
+Benchmarks: Performance Measurements for the WhileD CFG Generator
+
+This module provides:
+1. Synthetic program generators (built iteratively, so they can be nested arbitrarily deep)
+2. Timing helpers
+3. Benchmarks for individual generator features, each timing large programs,
+   and correctness checks for them (round trips, property tests against
+   reference implementations) that run on small programs
+4. A regression suite: per-phase timings of stress-shaped programs, written
+   as JSON and compared against a stored baseline
+
+
+Usage:
+    python benchmark.py                # run all benchmarks
+    python benchmark.py iterative      # run a single benchmark
+    python benchmark.py --check        # correctness checks only, at small sizes (for CI)
+    python benchmark.py --check binary irparser
+    python benchmark.py suite --json results.json --baseline benchmark_baseline.json
+    python benchmark.py suite --save-baseline benchmark_baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import make_dataclass
+from io import StringIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ast_definition import *
+from ir_representation import *
+from cfg_generator import CFGGenerator
+from block_builder import BlockBuilder
+from whiled_parser import parse_expression, parse_program, tokenize
+from batch import collect_sources, compile_batch
+from cfg_cache import CFGArtifacts, CFGCache, ast_digest
+from incremental import IncrementalCFGGenerator, top_level_statements
+import cfg_binary
+from ir_parser import IRParseError, parse_cfg, parse_ir, read_cfg
+from ir_optimizer import fold_constants, instruction_count, merge_blocks, simplify_cfg
+from dominance import dominators, post_dominators
+from ir_interpreter import ExecutionError, Interpreter, StepLimitExceeded, run_cfg
+from ssa import IRPhi, SSAForm, construct_ssa, destruct_ssa, phi_functions, rename_instruction
+from dataflow import (FORWARD, DataflowProblem, block_instructions, block_order, defined_variable,
+                      is_variable, liveness, reaching_definitions, solve, used_operands)
+
+
+# =======================
+# Synthetic Programs
+# =======================
+
+def main_programs() -> List[Tuple[str, Com]]:
+    """The ten test programs from main.py."""
+    return [
+        ("test1_expression_splitting",
+         CAsgnVar("x", EBinop("+", EBinop("+", EVar("a"), EVar("b")), EVar("c")))),
+        ("test2_nested_expressions",
+         CAsgnVar("result", EBinop("<", EBinop("*", EBinop("+", EVar("x"), EVar("y")), EBinop("-", EVar("z"), EConst(10))), EConst(100)))),
+        ("test3_shortcircuit_and",
+         CAsgnVar("result", EBinop("&&", EVar("p"), EBinop("!=", EDeref(EVar("p")), EConst(0))))),
+        ("test4_shortcircuit_or",
+         CAsgnVar("result", EBinop("||", EBinop("==", EVar("x"), EConst(0)), EBinop(">", EVar("y"), EConst(10))))),
+        ("test5_while_loop",
+         CWhile(EBinop("<", EVar("i"), EVar("n")), CSeq(CAsgnVar("s", EBinop("+", EVar("s"), EVar("i"))), CAsgnVar("i", EBinop("+", EVar("i"), EConst(1)))))),
+        ("test6_if_else",
+         CIf(EBinop(">", EVar("x"), EConst(0)), CAsgnVar("y", EVar("x")), CAsgnVar("y", EUnop("-", EVar("x"))))),
+        ("test7_pointer_operations",
+         CSeq(CAsgnVar("p", EAddrOf(EVar("x"))), CAsgnDeref(EVar("p"), EConst(10)))),
+        ("test8_complex_while_shortcircuit",
+         CWhile(EBinop("&&", EBinop("!=", EVar("p"), EConst(0)), EBinop(">", EDeref(EVar("p")), EConst(0))), CAsgnVar("p", EBinop("+", EVar("p"), EConst(1))))),
+        ("test9_nested_if",
+         CIf(EBinop(">", EVar("x"), EConst(0)), CIf(EBinop(">", EVar("y"), EConst(0)), CAsgnVar("z", EConst(1)), CAsgnVar("z", EConst(2))), CAsgnVar("z", EConst(3)))),
+        ("test10_comprehensive",
+         CWhile(EBinop("<", EVar("i"), EVar("n")), CSeq(CSeq(CAsgnVar("p", EBinop("+", EVar("arr"), EVar("i"))), CIf(EBinop(">", EDeref(EVar("p")), EVar("max")), CAsgnVar("max", EDeref(EVar("p"))), CSkip())), CAsgnVar("i", EBinop("+", EVar("i"), EConst(1)))))),
+    ]
+
+
+def seq_chain(n: int) -> Com:
+    """Right-nested CSeq chain of n statements: x = x + 1; y = x * 2; ..."""
+    return chain([CAsgnVar("y", EBinop("*", EVar("x"), EConst(2))) if i % 2 else
+                  CAsgnVar("x", EBinop("+", EVar("x"), EConst(1)))
+                  for i in range(n)])
+
+
+def chain(stmts: List[Com]) -> Com:
+    """Right-nested CSeq chain of the given statements."""
+    program = stmts[-1]
+    for stmt in reversed(stmts[:-1]):
+        program = CSeq(stmt, program)
+    return program
+
+
+def main_mix(n: int) -> Com:
+    """CSeq chain of n statements cycling through the main.py programs."""
+    programs = [program for _, program in main_programs()]
+    return chain([programs[i % len(programs)] for i in range(n)])
+
+
+def seq_tree(n: int) -> Com:
+    """Balanced CSeq tree of the same n statements as seq_chain (depth log n)."""
+    level = [CAsgnVar("y", EBinop("*", EVar("x"), EConst(2))) if i % 2 else
+             CAsgnVar("x", EBinop("+", EVar("x"), EConst(1)))
+             for i in range(n)]
+    while len(level) > 1:
+        paired = [CSeq(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def nested_if(depth: int) -> Com:
+    """CIf nested depth levels deep in the then-branch."""
+    program: Com = CAsgnVar("x", EConst(0))
+    for i in range(depth):
+        program = CIf(EBinop("<", EVar("x"), EConst(i)), program, CAsgnVar("x", EConst(i)))
+    return program
+
+
+def nested_while(depth: int) -> Com:
+    """CWhile nested depth levels deep."""
+    program: Com = CAsgnVar("i", EBinop("+", EVar("i"), EConst(1)))
+    for _ in range(depth):
+        program = CWhile(EBinop("<", EVar("i"), EVar("n")), program)
+    return program
+
+
+def long_sum(n: int) -> Com:
+    """x = a0 + a1 + ... + a(n-1), parsed left-associatively."""
+    expr: Expr = EVar("a0")
+    for i in range(1, n):
+        expr = EBinop("+", expr, EVar(f"a{i}"))
+    return CAsgnVar("x", expr)
+
+
+def logic_chain(n: int, op: str = "&&") -> Com:
+    """r = (a0 < 0) op (a1 < 1) op ... with n comparisons, joined left-associatively by && or ||."""
+    expr: Expr = EBinop("<", EVar("a0"), EConst(0))
+    for i in range(1, n):
+        expr = EBinop(op, expr, EBinop("<", EVar(f"a{i}"), EConst(i)))
+    return CAsgnVar("r", expr)
+
+
+def pointer_code(n: int) -> Com:
+    """CSeq chain of n pointer-heavy statements (address-of, loads and stores through computed addresses)."""
+    stmts: List[Com] = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            stmts.append(CAsgnVar("p", EAddrOf(EVar(f"v{i % 7}"))))
+        elif kind == 1:
+            stmts.append(CAsgnDeref(EVar("p"), EBinop("+", EDeref(EVar("q")), EConst(i))))
+        else:
+            stmts.append(CAsgnDeref(EBinop("+", EVar("q"), EConst(i % 5)), EDeref(EDeref(EVar("r")))))
+    return chain(stmts)
+
+
+def long_expr(n: int) -> Com:
+    """r = balanced arithmetic tree over n leaves (x0 + x1) * (x2 - x3) ..."""
+    level: List[Expr] = [EVar(f"x{i}") for i in range(n)]
+    ops = "+*-"
+    while len(level) > 1:
+        paired = [EBinop(ops[i % 3], level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return CAsgnVar("r", level[0])
+
+
+def random_expr(rng: random.Random, depth: int) -> Expr:
+    """Random expression using every operator (variables a..e, small constants)."""
+    kind = rng.randrange(7) if depth > 0 else rng.randrange(2)
+    if kind == 0:
+        return EConst(rng.randint(-3, 9))
+    if kind == 1:
+        return EVar(rng.choice("abcde"))
+    if kind in (2, 3):
+        op = rng.choice(["+", "-", "*", "/", "%", "<", "<=", ">", ">=", "==", "!=", "&&", "||"])
+        return EBinop(op, random_expr(rng, depth - 1), random_expr(rng, depth - 1))
+    if kind == 4:
+        return EUnop(rng.choice("-!"), random_expr(rng, depth - 1))
+    if kind == 5:
+        return EDeref(random_expr(rng, depth - 1))
+    return EAddrOf(EVar(rng.choice("abcde")))
+
+
+def random_program(rng: random.Random, depth: int = 3, length: int = 4) -> Com:
+    """Random statement sequence with nested if/while statements, for property tests."""
+    stmts: List[Com] = []
+    for _ in range(rng.randint(1, length)):
+        kind = rng.randrange(6) if depth > 0 else rng.randrange(3)
+        if kind == 0:
+            stmts.append(CSkip())
+        elif kind == 1:
+            stmts.append(CAsgnVar(rng.choice("abcde"), random_expr(rng, 2)))
+        elif kind == 2:
+            stmts.append(CAsgnDeref(random_expr(rng, 1), random_expr(rng, 2)))
+        elif kind in (3, 4):
+            stmts.append(CIf(random_expr(rng, 2), random_program(rng, depth - 1, length),
+                             random_program(rng, depth - 1, length)))
+        else:
+            stmts.append(CWhile(random_expr(rng, 2), random_program(rng, depth - 1, length)))
+    return chain(stmts)
+
+
+def fresh_loops(n: int, node: Callable[..., object] = lambda cls, *args: cls(*args)) -> object:
+    """CSeq chain of n while loops built from fresh nodes (no shared subtrees).
+    
+    Args:
+        node: Node constructor, called as node(cls, *args); pass
+            HashConsTable().make to share identical subtrees while building
+    """
+    variables = ["i", "n", "s", "t", "p", "q"]
+    stmts = []
+    for k in range(n):
+        i, s = variables[k % 3], variables[3 + k % 3]
+        cond = node(EBinop, "<", node(EVar, i), node(EVar, "n"))
+        add = node(CAsgnVar, s, node(EBinop, "+", node(EVar, s), node(EVar, i)))
+        step = node(CAsgnVar, i, node(EBinop, "+", node(EVar, i), node(EConst, k % 4)))
+        stmts.append(node(CWhile, cond, node(CSeq, add, step)))
+    program = stmts[-1]
+    for stmt in reversed(stmts[:-1]):
+        program = node(CSeq, stmt, program)
+    return program
+
+
+MAIN_SOURCES = [
+    "x = a + b + c",
+    "result = (x + y) * (z - 10) < 100",
+    "result = p && *p != 0",
+    "result = x == 0 || y > 10",
+    "while (i < n) do { s = s + i; i = i + 1 }",
+    "if (x > 0) then y = x else y = -x",
+    "p = &x; *p = 10",
+    "while (p != 0 && *p > 0) do { p = p + 1 }",
+    "if (x > 0) then { if (y > 0) then z = 1 else z = 2 } else z = 3",
+    "while (i < n) do { p = arr + i; if (*p > max) then max = *p else skip; i = i + 1 }",
+]
+
+
+def source_text(size: int) -> str:
+    """WhileD source of about size characters: the main.py sources, repeated, one per line."""
+    lines = []
+    total = 0
+    while total < size:
+        line = MAIN_SOURCES[len(lines) % len(MAIN_SOURCES)]
+        lines.append(line)
+        total += len(line) + 2
+    return ";\n".join(lines)
+
+
+# =======================
+# Timing Helpers
+# =======================
+
+def best_of(func: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    """Best wall-clock time (seconds) of `number` calls, over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def best_of_pair(func_a: Callable[[], object], func_b: Callable[[], object],
+                 repeat: int = 300, number: int = 20) -> Tuple[float, float]:
+    """Best per-call times (seconds) of two functions, measured interleaved.
+
+    Interleaving keeps background noise from favouring one side.
+    """
+    best_a = best_b = float("inf")
+    for _ in range(repeat):
+        best_a = min(best_a, best_of(func_a, repeat=1, number=number))
+        best_b = min(best_b, best_of(func_b, repeat=1, number=number))
+    return best_a / number, best_b / number
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    """Peak traced memory (bytes) allocated while running func."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_memory(func: Callable[[], object]) -> Tuple[object, int]:
+    """Result of func and the traced memory (bytes) still allocated once it returns."""
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def cfg_signature(blocks: List[BasicBlock]) -> List[tuple]:
+    """Structure of a block list (labels, instructions, edges), for comparison."""
+    return [(block.id, block.label, ir_text(block.instructions), str(block.terminator),
+             [succ.id for succ in block.successors], [pred.id for pred in block.predecessors])
+            for block in blocks]
+
+
+class NullWriter:
+    """Text sink that only counts characters and remembers when output started."""
+
+    def __init__(self):
+        self.chars = 0
+        self.start = time.perf_counter()
+        self.first_write: Optional[float] = None
+
+    def write(self, text: str):
+        if self.first_write is None:
+            self.first_write = time.perf_counter() - self.start
+        self.chars += len(text)
+
+
+def ir_text(instructions: List[Instruction]) -> List[str]:
+    """Textual form of an instruction list, for byte-for-byte comparison."""
+    return [str(instr) for instr in instructions]
+
+
+# =======================
+# Benchmarks and Checks
+# =======================
+
+# Program shapes of bench_iterative and check_iterative
+ITERATIVE_SHAPES = [("seq_chain", seq_chain), ("nested_if", nested_if),
+                    ("nested_while", nested_while), ("long_sum", long_sum)]
+
+
+def check_iterative():
+    """Recursive and iterative lowering give the same IR; deep programs lower iteratively."""
+    for name, program in main_programs():
+        rec = CFGGenerator().generate_cfg(program)
+        it = CFGGenerator(iterative=True).generate_cfg(program)
+        assert ir_text(rec.linear_ir) == ir_text(it.linear_ir), name
+        assert ir_text(rec.bb_ir) == ir_text(it.bb_ir), name
+
+    # A simple right operand of && / || is copied to the result on its path
+    for op, expected in (("&&", ["if (! a) then jmp LABEL_1", "x = b", "jmp LABEL_2", "LABEL_1:", "x = a", "LABEL_2:"]),
+                         ("||", ["if (! a) then jmp LABEL_1", "x = a", "jmp LABEL_2", "LABEL_1:", "x = 1", "LABEL_2:"])):
+        right = EVar("b") if op == "&&" else EConst(1)
+        program = CAsgnVar("x", EBinop(op, EVar("a"), right))
+        assert ir_text(CFGGenerator().process_statement(program)) == expected, op
+        assert ir_text(CFGGenerator().process_statement_iterative(program)) == expected, op
+
+    for name, make in ITERATIVE_SHAPES:
+        program = make(400)
+        assert ir_text(CFGGenerator().process_statement(program)) == \
+            ir_text(CFGGenerator().process_statement_iterative(program)), name
+        # Deeper than the recursion limit
+        depth = 5 * sys.getrecursionlimit()
+        cfg = CFGGenerator(iterative=True).generate_cfg(make(depth))
+        assert len(cfg.linear_ir) >= depth, name
+
+
+def bench_iterative():
+    """Recursive vs. iterative (worklist) Phase 1 lowering."""
+    print("=" * 70)
+    print("Recursive vs. iterative lowering")
+    print("=" * 70)
+
+    # main.py cases: comparable speed
+    generator = CFGGenerator()
+    total_rec = total_iter = 0.0
+    print(f"{'program':<36}{'recursive':>12}{'iterative':>12}")
+    for name, program in main_programs():
+        t_rec, t_iter = best_of_pair(lambda: generator.process_statement(program),
+                                     lambda: generator.process_statement_iterative(program))
+        total_rec += t_rec
+        total_iter += t_iter
+        print(f"{name:<36}{t_rec * 1e6:>10.2f}us{t_iter * 1e6:>10.2f}us")
+    print(f"{'total':<36}{total_rec * 1e6:>10.2f}us{total_iter * 1e6:>10.2f}us")
+    print()
+
+    # Medium programs (within the recursion limit)
+    size = 400
+    print(f"{'shape (size ' + str(size) + ')':<36}{'recursive':>12}{'iterative':>12}")
+    for name, make in ITERATIVE_SHAPES:
+        program = make(size)
+        t_rec = best_of(lambda: CFGGenerator().process_statement(program), repeat=20)
+        t_iter = best_of(lambda: CFGGenerator().process_statement_iterative(program), repeat=20)
+        print(f"{name:<36}{t_rec * 1e3:>10.2f}ms{t_iter * 1e3:>10.2f}ms")
+    print()
+
+    # Deep programs: the recursive path fails, the iterative path does not
+    depth = 10 ** 6
+    print(f"{'shape (depth ' + str(depth) + ')':<36}{'recursive':>12}{'iterative':>12}")
+    for name, make in ITERATIVE_SHAPES:
+        program = make(depth)
+        try:
+            CFGGenerator().process_statement(program)
+            rec_status = "ok"
+        except RecursionError:
+            rec_status = "RecursionError"
+        start = time.perf_counter()
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<36}{rec_status:>12}{elapsed:>11.2f}s  ({len(cfg.linear_ir)} instrs, {len(cfg.blocks)} blocks)")
+        del cfg, program
+    print()
+
+
+def bench_emitter():
+    """Scaling of generate_cfg with program size (shared emitter buffer)."""
+    print("=" * 70)
+    print("generate_cfg scaling (append-only emitter)")
+    print("=" * 70)
+
+    print(f"{'mode':<12}{'statements':>12}{'time':>12}{'us/stmt':>10}{'peak MB':>10}{'bytes/stmt':>12}")
+    for mode, make, iterative in [("recursive", seq_tree, False), ("iterative", seq_chain, True)]:
+        for n in (1_000, 10_000, 100_000):
+            program = make(n)
+            elapsed = best_of(lambda: CFGGenerator(iterative=iterative).generate_cfg(program), repeat=3)
+            peak = peak_memory(lambda: CFGGenerator(iterative=iterative).generate_cfg(program))
+            print(f"{mode:<12}{n:>12}{elapsed:>11.3f}s{elapsed / n * 1e6:>10.2f}"
+                  f"{peak / 2 ** 20:>10.1f}{peak // n:>12}")
+    print()
+
+
+def check_block_builder():
+    """BlockBuilder gives the same BB IR, blocks and edges as the multi-pass construction."""
+    instructions = CFGGenerator(iterative=True).process_statement_iterative(main_mix(1_000))
+    instructions.insert(0, IRLabel("LABEL_entry"))
+    generator = CFGGenerator()
+    bb_old = generator._convert_labels_to_bb(instructions)
+    blocks_old = generator.build_cfg(bb_old)
+    bb_new, blocks_new = BlockBuilder().build(instructions)
+    assert ir_text(bb_old) == ir_text(bb_new)
+    assert cfg_signature(blocks_old) == cfg_signature(blocks_new)
+
+
+def bench_block_builder():
+    """Single-pass BlockBuilder vs. _convert_labels_to_bb + build_cfg."""
+    print("=" * 70)
+    print("Basic block construction: single pass vs. multi-pass")
+    print("=" * 70)
+
+    for n in (1_000, 10_000, 132_000):
+        instructions = CFGGenerator(iterative=True).process_statement_iterative(main_mix(n))
+        instructions.insert(0, IRLabel("LABEL_entry"))
+
+        generator = CFGGenerator()
+        t_old = best_of(lambda: generator.build_cfg(generator._convert_labels_to_bb(instructions)), repeat=3)
+        t_new = best_of(lambda: BlockBuilder().build(instructions), repeat=3)
+        print(f"{len(instructions):>9} instrs   multi-pass {t_old:7.3f}s   single-pass {t_new:7.3f}s"
+              f"   speedup {t_old / t_new:5.2f}x")
+    print()
+
+
+class ListBlock:
+    """Block with edges in plain lists, as BasicBlock stored them before EdgeStore."""
+
+    def __init__(self, block_id: int):
+        self.id = block_id
+        self.successors: List['ListBlock'] = []
+        self.predecessors: List['ListBlock'] = []
+
+    def add_successor(self, block: 'ListBlock'):
+        if block not in self.successors:
+            self.successors.append(block)
+        if self not in block.predecessors:
+            block.predecessors.append(self)
+
+
+def fan_in_ir(n: int) -> List[Instruction]:
+    """Linear IR with n conditional jumps to one join label (fan-in n)."""
+    instructions: List[Instruction] = [IRLabel("LABEL_entry")]
+    for i in range(n):
+        instructions.append(IRAssign(f"x{i}", str(i)))
+        instructions.append(IRCondJump(f"x{i}", "LABEL_join"))
+    instructions.append(IRLabel("LABEL_join"))
+    instructions.append(IRAssign("y", "0"))
+    return instructions
+
+
+def link_blocks(make: Callable[[int], object], n: int) -> object:
+    """Join block (made by make) with n predecessors, each edge added twice."""
+    join = make(n)
+    sources = [make(i) for i in range(n)]
+    for source in sources:
+        source.add_successor(join)
+    # Re-adding existing edges exercises the membership test
+    for source in sources:
+        source.add_successor(join)
+    return join
+
+
+def link_store(n: int) -> EdgeStore:
+    """EdgeStore whose block 0 has n predecessors, each edge added twice."""
+    store = EdgeStore()
+    join = store.add_block(BasicBlock(n))
+    sources = [store.add_block(BasicBlock(i)) for i in range(n)]
+    for source in sources:
+        store.add_edge(source, join)
+    for source in sources:
+        store.add_edge(source, join)
+    return store
+
+
+def check_fan_in():
+    """Duplicate edges are ignored by lists, BasicBlock and EdgeStore alike, also through BlockBuilder."""
+    n = 1_000
+    assert len(link_blocks(ListBlock, n).predecessors) == n
+    assert len(link_blocks(BasicBlock, n).predecessors) == n
+    assert len(link_store(n).pred[0]) == n
+    builder = BlockBuilder()
+    _, blocks = builder.build(fan_in_ir(n))
+    join = blocks[-1]
+    assert len(join.predecessors) == n
+    assert builder.edges.has_edge(blocks[0].index, join.index)
+
+
+def bench_fan_in():
+    """Edge insertion into a high fan-in block: lists vs. EdgeStore."""
+    print("=" * 70)
+    print("High fan-in edges: list adjacency vs. EdgeStore")
+    print("=" * 70)
+
+    print(f"{'edges':>9}{'lists':>12}{'standalone':>13}{'EdgeStore':>12}")
+    for n in (1_000, 5_000, 20_000, 100_000):
+        # Quadratic: too slow to run at the largest size
+        lists = f"{best_of(lambda: link_blocks(ListBlock, n), repeat=3):.3f}s" if n <= 20_000 else "-"
+        t_block = best_of(lambda: link_blocks(BasicBlock, n), repeat=3)
+        t_store = best_of(lambda: link_store(n), repeat=3)
+        print(f"{n:>9}{lists:>12}{t_block:>12.3f}s{t_store:>11.3f}s")
+
+    # Same construction through BlockBuilder: n predecessors on one block
+    print()
+    for n in (1_000, 10_000, 100_000):
+        instructions = fan_in_ir(n)
+        elapsed = best_of(lambda: BlockBuilder().build(instructions), repeat=3)
+        print(f"BlockBuilder {n:>7} jumps to one label  {elapsed:7.3f}s  "
+              f"{elapsed / len(instructions) * 1e6:5.2f} us/instr")
+    print()
+
+
+def scan_to_mermaid(cfg: ControlFlowGraph) -> str:
+    """to_mermaid as it was before label_to_block: jump targets found by scanning all blocks."""
+    lines = ["flowchart TD"]
+    for block in cfg.blocks:
+        lines.extend(mermaid_node_lines(block))
+    lines.append("")
+    for block in cfg.blocks:
+        jump_target = None
+        if isinstance(block.terminator, (IRJump, IRCondJump)):
+            for b in cfg.blocks:
+                if b.label == block.terminator.label:
+                    jump_target = b
+                    break
+        lines.extend(mermaid_edge_lines(block, jump_target))
+    lines.extend(mermaid_style_lines(cfg.entry_block.id if cfg.entry_block else None))
+    return "\n".join(lines)
+
+
+def check_export():
+    """to_mermaid through the label index gives the same text as scanning for jump targets."""
+    for name, program in main_programs() + [("main_mix", main_mix(200))]:
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        assert scan_to_mermaid(cfg) == cfg.to_mermaid(), name
+
+
+def bench_export():
+    """Mermaid export: label scan vs. label_to_block index."""
+    print("=" * 70)
+    print("Mermaid export: label scan vs. label index")
+    print("=" * 70)
+
+    print(f"{'blocks':>9}{'scan':>12}{'index':>12}{'us/block':>10}")
+    for n in (200, 1_000, 5_000, 25_000):
+        cfg = CFGGenerator(iterative=True).generate_cfg(main_mix(n))
+        blocks = len(cfg.blocks)
+        # Quadratic: too slow to run at the largest size
+        scan = f"{best_of(lambda: scan_to_mermaid(cfg), repeat=3):.3f}s" if n <= 5_000 else "-"
+        t_index = best_of(cfg.to_mermaid, repeat=3)
+        print(f"{blocks:>9}{scan:>12}{t_index:>11.3f}s{t_index / blocks * 1e6:>10.2f}")
+    print()
+
+
+def check_table():
+    """lower_to_table gives the same instructions as process_statement."""
+    for name, program in main_programs() + [("main_mix", main_mix(200)), ("long_sum", long_sum(400))]:
+        for iterative in (False, True):
+            instructions = CFGGenerator(iterative=iterative).process_statement(program)
+            table = CFGGenerator(iterative=iterative).lower_to_table(program)
+            assert ir_text(list(table)) == ir_text(instructions), name
+
+
+def bench_table():
+    """Linear IR memory: list of dataclasses vs. InstructionTable."""
+    print("=" * 70)
+    print("Linear IR storage: dataclass list vs. struct-of-arrays table")
+    print("=" * 70)
+
+    print(f"{'program':<10}{'instrs':>10}{'list MB':>10}{'table MB':>10}{'B/instr':>16}"
+          f"{'list s':>9}{'table s':>9}")
+    for name, make, n in (("main_mix", main_mix, 10_000), ("main_mix", main_mix, 130_000),
+                          ("long_sum", long_sum, 1_000_000)):
+        program = make(n)
+        instructions, list_bytes = retained_memory(
+            lambda: CFGGenerator(iterative=True).process_statement_iterative(program))
+        count = len(instructions)
+        del instructions
+        table, table_bytes = retained_memory(lambda: CFGGenerator(iterative=True).lower_to_table(program))
+        del table
+        t_list = best_of(lambda: CFGGenerator(iterative=True).process_statement_iterative(program), repeat=2)
+        t_table = best_of(lambda: CFGGenerator(iterative=True).lower_to_table(program), repeat=2)
+        print(f"{name:<10}{count:>10}{list_bytes / 2 ** 20:>10.1f}{table_bytes / 2 ** 20:>10.1f}"
+              f"{list_bytes // count:>8} -> {table_bytes // count:<5}{t_list:>8.2f}s{t_table:>8.2f}s")
+    print()
+
+
+def check_symbols():
+    """LABEL_ -> BB_ renaming on symbol ids gives the same IR as on strings."""
+    program = main_mix(1_000)
+    instructions = CFGGenerator(iterative=True).process_statement_iterative(program)
+    instructions.insert(0, IRLabel("LABEL_entry"))
+    table = CFGGenerator(iterative=True).lower_to_table(program)
+    table.insert(0, IRLabel("LABEL_entry"))
+    generator = CFGGenerator()
+    converted = generator._convert_labels_to_bb(table)
+    assert ir_text(list(converted)) == ir_text(generator._convert_labels_to_bb(instructions))
+
+
+def bench_symbols():
+    """LABEL_ -> BB_ renaming and operand strings: strings vs. symbol ids."""
+    print("=" * 70)
+    print("Operand names: strings vs. interned symbol ids")
+    print("=" * 70)
+
+    print(f"{'instrs':>9}{'str objects':>13}{'symbols':>9}{'rename str':>12}{'rename ids':>12}")
+    for n in (1_000, 10_000, 130_000):
+        program = main_mix(n)
+        instructions = CFGGenerator(iterative=True).process_statement_iterative(program)
+        instructions.insert(0, IRLabel("LABEL_entry"))
+        table = CFGGenerator(iterative=True).lower_to_table(program)
+        table.insert(0, IRLabel("LABEL_entry"))
+        generator = CFGGenerator()
+
+        # Distinct string objects referenced by the dataclass IR
+        strings = {id(value) for instr in instructions for value in vars(instr).values()}
+        t_str = best_of(lambda: generator._convert_labels_to_bb(instructions), repeat=3)
+        t_ids = best_of(table.convert_labels_to_bb, repeat=3)
+        print(f"{len(table):>9}{len(strings):>13}{len(table.symbols):>9}{t_str:>11.3f}s{t_ids:>11.3f}s")
+    print()
+
+
+def check_ast():
+    """A hash-consed tree equals the original and lowers to the same IR."""
+    program = fresh_loops(100)
+    shared = HashConsTable().intern(program)
+    assert shared == program and str(shared) == str(program)
+    assert ir_text(CFGGenerator().process_statement(shared)) == ir_text(CFGGenerator().process_statement(program))
+
+
+def bench_ast():
+    """AST memory and construction time: plain vs. slotted vs. hash-consed nodes."""
+    print("=" * 70)
+    print("AST nodes: plain dataclasses vs. slotted vs. hash-consed")
+    print("=" * 70)
+
+    # The node classes as they were before: mutable dataclasses with a __dict__
+    plain = {cls: make_dataclass(cls.__name__, list(cls.__match_args__))
+             for cls in (EConst, EVar, EBinop, CAsgnVar, CSeq, CWhile)}
+
+    builds = (
+        ("plain", lambda n: fresh_loops(n, lambda cls, *args: plain[cls](*args))),
+        ("slotted", fresh_loops),
+        ("hash-consed", lambda n: fresh_loops(n, HashConsTable().make)),
+    )
+    print(f"{'loops':>9}{'nodes':>9}  {'variant':<13}{'MB':>8}{'B/node':>8}{'build s':>9}")
+    for n in (10_000, 100_000):
+        nodes = 13 * n - 1
+        for name, build in builds:
+            _, retained = retained_memory(lambda: build(n))
+            elapsed = best_of(lambda: build(n), repeat=3)
+            print(f"{n:>9}{nodes:>9}  {name:<13}{retained / 2 ** 20:>8.1f}{retained // nodes:>8}{elapsed:>8.3f}s")
+    print()
+
+
+def check_parser():
+    """Parsed sources lower like the hand-built main.py ASTs; deep nesting parses."""
+    for (name, program), source in zip(main_programs(), MAIN_SOURCES):
+        parsed = parse_program(source)
+        assert ir_text(CFGGenerator().process_statement(parsed)) == \
+            ir_text(CFGGenerator().process_statement(program)), name
+    depth = 10_000
+    assert parse_program("while (i < n) do { " * depth + "i = i + 1" + " }" * depth) == nested_while(depth)
+    assert parse_expression("(" * depth + "x" + ")" * depth) == EVar("x")
+
+
+def bench_parser():
+    """Source parser throughput (MB/s) and deep nesting."""
+    print("=" * 70)
+    print("WhileD parser throughput")
+    print("=" * 70)
+
+    print(f"{'MB':>6}{'tokens':>10}{'lex MB/s':>10}{'parse MB/s':>12}{'hash-consed MB/s':>18}")
+    for size in (1_000_000, 4_000_000):
+        source = source_text(size)
+        megabytes = len(source) / 1e6
+        tokens = sum(1 for _ in tokenize(source))
+        t_lex = best_of(lambda: sum(1 for _ in tokenize(source)), repeat=2)
+        t_parse = best_of(lambda: parse_program(source), repeat=2)
+        t_shared = best_of(lambda: parse_program(source, HashConsTable()), repeat=2)
+        print(f"{megabytes:>6.1f}{tokens:>10}{megabytes / t_lex:>10.2f}{megabytes / t_parse:>12.2f}"
+              f"{megabytes / t_shared:>18.2f}")
+
+    for depth in (10_000, 100_000):
+        source = "while (i < n) do { " * depth + "i = i + 1" + " }" * depth
+        elapsed = best_of(lambda: parse_program(source), repeat=1)
+        print(f"{depth:>7} nested while loops parsed in {elapsed:.3f}s")
+    print()
+
+
+def write_corpus(directory: str, files: int, size: int) -> str:
+    """Directory of generated sources p0000.wd ... plus one file with a syntax error (broken.wd)."""
+    corpus = os.path.join(directory, "corpus")
+    os.makedirs(corpus)
+    for i in range(files):
+        with open(os.path.join(corpus, f"p{i:04}.wd"), "w", encoding="utf-8") as f:
+            f.write(source_text(size + 40 * (i % 50)))
+    with open(os.path.join(corpus, "broken.wd"), "w", encoding="utf-8") as f:
+        f.write("x = (a")
+    return corpus
+
+
+def check_batch():
+    """A broken file fails alone; same-named files under two arguments get their own outputs."""
+    with tempfile.TemporaryDirectory() as root:
+        corpus = write_corpus(root, 20, 200)
+        sources = collect_sources([corpus])
+        for workers in (1, 2):
+            results = compile_batch(sources, os.path.join(root, f"out{workers}"), workers, chunk_size=3)
+            failed = [r for r in results if not r.ok]
+            assert len(results) == 21 and [r.source for r in failed] == [os.path.join(corpus, "broken.wd")]
+            assert [r.source for r in results] == [source for source, _ in sources]
+
+        for name, text in (("d1", "x = 1"), ("d2", "y = 2")):
+            os.makedirs(os.path.join(root, name))
+            with open(os.path.join(root, name, "a.wd"), "w", encoding="utf-8") as f:
+                f.write(text)
+        sources = collect_sources([os.path.join(root, "d1"), os.path.join(root, "d2")])
+        assert [stem for _, stem in sources] == [os.path.join("d1", "a"), os.path.join("d2", "a")], sources
+        results = compile_batch(sources, os.path.join(root, "dup"), 2)
+        assert all(r.ok for r in results) and len({r.output for r in results}) == 2
+        for result, text in zip(results, ("x = 1", "y = 2")):
+            with open(result.output, encoding="utf-8") as f:
+                assert f"`{text}`" in f.read()
+
+
+def bench_batch():
+    """Batch compilation of a generated corpus with 1..N worker processes."""
+    print("=" * 70)
+    print(f"Batch compiler scaling (os.cpu_count() = {os.cpu_count()})")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as root:
+        sources = collect_sources([write_corpus(root, 400, 4_000)])
+        print(f"{'workers':>8}{'files':>7}{'failed':>8}{'time':>9}{'files/s':>9}{'speedup':>9}")
+        baseline = None
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            results = compile_batch(sources, os.path.join(root, f"out{workers}"), workers)
+            elapsed = time.perf_counter() - start
+            failed = [r for r in results if not r.ok]
+            baseline = baseline or elapsed
+            print(f"{workers:>8}{len(results):>7}{len(failed):>8}{elapsed:>8.2f}s{len(results) / elapsed:>9.1f}"
+                  f"{baseline / elapsed:>8.2f}x")
+    print()
+
+
+def _fill_cache(directory: str, sources: List[str]) -> int:
+    """Worker of check_cache: build every source through a shared cache directory."""
+    cache = CFGCache(directory)
+    for source in sources:
+        artifacts = cache.get_or_build(parse_program(source))
+        assert artifacts.instructions > 0
+    return cache.stats.writes
+
+
+def check_cache():
+    """Cache entries match fresh generation; damaged entries, eviction and concurrent writers."""
+    # Same artifacts as a fresh generation; hand-built and parsed ASTs share a key
+    with tempfile.TemporaryDirectory() as root:
+        cache = CFGCache(root)
+        for (name, program), source in zip(main_programs(), MAIN_SOURCES):
+            expected = CFGArtifacts.from_cfg(CFGGenerator().generate_cfg(program))
+            assert cache.get_or_build(program) == expected, name
+            # Parsing gives the same tree (and key) except for test 10, whose CSeq nests to the left
+            parsed = parse_program(source)
+            assert (cache.key(parsed) == cache.key(program)) == (parsed == program), name
+        assert (cache.stats.hits, cache.stats.misses) == (0, 10)
+        assert all(cache.get(cache.key(program)) for _, program in main_programs())
+        assert ast_digest(EConst(1)) != ast_digest(EVar("1"))
+
+        # Generator options that change the output get their own entries
+        reuse = CFGCache(root, options={"reuse_temps": True})
+        assert CFGCache(root, options={"reuse_temps": False}).key(program) == cache.key(program)
+        for _, program in main_programs():
+            assert reuse.key(program) != cache.key(program)
+            expected = CFGArtifacts.from_cfg(CFGGenerator(reuse_temps=True).generate_cfg(program))
+            assert reuse.get_or_build(program) == expected
+        assert reuse.stats.misses == 10
+
+    # Overwriting an entry replaces its size in the running total
+    with tempfile.TemporaryDirectory() as root:
+        cache = CFGCache(root)
+        for _, program in main_programs():
+            cache.get_or_build(program)
+        for _ in range(3):
+            cache.put(cache.key(program), cache.get(cache.key(program)))
+        assert cache._size == cache.size_bytes()
+
+        # Damaged entries (bad JSON, wrong shape, missing fields) are misses and get rebuilt
+        key = cache.key(program)
+        expected = cache.get(key)
+        with open(cache.path(key), encoding="utf-8") as f:
+            good = json.load(f)
+        missing = {name: value for name, value in good.items() if name != "linear_ir"}
+        for damaged in ("{", "[1, 2]", "null", json.dumps(missing), json.dumps({**good, "blocks": "3"})):
+            with open(cache.path(key), "w", encoding="utf-8") as f:
+                f.write(damaged)
+            errors = cache.stats.errors
+            assert cache.get_or_build(program) == expected and cache.stats.errors == errors + 1, damaged
+            assert cache.get(key) == expected
+
+    # Keys do not depend on the process (string hashing is randomised per process)
+    import subprocess
+    probe = "from whiled_parser import parse_program; from cfg_cache import cache_key; " \
+            f"print(cache_key(parse_program({MAIN_SOURCES[-1]!r})))"
+    keys = {subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                           cwd=os.path.dirname(os.path.abspath(__file__))).stdout for _ in range(3)}
+    assert len(keys) == 1 and keys.pop().strip() == CFGCache().key(parse_program(MAIN_SOURCES[-1]))
+
+    # Size bound: least recently used entries go first
+    sources = [f"{source_text(1_000 + 10 * i)};\nv = {i}" for i in range(30)]
+    programs = [parse_program(source) for source in sources]
+    with tempfile.TemporaryDirectory() as root:
+        cache = CFGCache(root)
+        for program in programs[:10]:
+            cache.get_or_build(program)
+        entry_size = cache.size_bytes() // 10
+        cache.max_bytes = entry_size * 25
+        cache.get(cache.key(programs[0]))           # programs[0] becomes most recent
+        time.sleep(0.01)
+        for program in programs[10:25]:
+            cache.get_or_build(program)
+        assert cache.size_bytes() <= cache.max_bytes and cache.stats.evictions > 0
+        assert cache.get(cache.key(programs[0])) is not None
+        assert cache.get(cache.key(programs[1])) is None
+
+    # Concurrent writers on the same keys: every entry complete, no temporary files left
+    from concurrent.futures import ProcessPoolExecutor
+    with tempfile.TemporaryDirectory() as root:
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_fill_cache, [root] * 8, [sources] * 8))
+        cache = CFGCache(root)
+        for program in programs:
+            assert cache.get(cache.key(program)) is not None
+        leftovers = [name for shard in os.listdir(root) for name in os.listdir(os.path.join(root, shard))
+                     if not name.endswith(".json")]
+        assert cache.stats.errors == 0 and not leftovers
+
+
+def bench_cache():
+    """On-disk artifact cache: cold vs. warm runs and eviction."""
+    print("=" * 70)
+    print("Content-addressed CFG artifact cache")
+    print("=" * 70)
+
+    # Cold (generate + store) vs. warm (read) runs over a corpus
+    sources = [f"{source_text(2_000 + 20 * i)};\nv = {i}" for i in range(100)]
+    programs = [parse_program(source) for source in sources]
+    print(f"{'run':<16}{'programs':>9}{'time':>9}{'hits':>6}{'misses':>8}")
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        for program in programs:
+            CFGArtifacts.from_cfg(CFGGenerator(iterative=True).generate_cfg(program))
+        print(f"{'no cache':<16}{len(programs):>9}{time.perf_counter() - start:>8.3f}s{'-':>6}{'-':>8}")
+        for run in ("cold", "warm"):
+            cache = CFGCache(root)
+            start = time.perf_counter()
+            for program in programs:
+                cache.get_or_build(program)
+            elapsed = time.perf_counter() - start
+            print(f"{run:<16}{len(programs):>9}{elapsed:>8.3f}s{cache.stats.hits:>6}{cache.stats.misses:>8}")
+        start = time.perf_counter()
+        for program in programs:
+            cache.key(program)
+        print(f"{'  (key only)':<16}{len(programs):>9}{time.perf_counter() - start:>8.3f}s")
+
+    # Writes past the size bound: least recently used entries are evicted
+    with tempfile.TemporaryDirectory() as root:
+        cache = CFGCache(root)
+        cache.get_or_build(programs[0])
+        cache.max_bytes = cache.size_bytes() * 25
+        start = time.perf_counter()
+        for program in programs:
+            cache.get_or_build(program)
+        elapsed = time.perf_counter() - start
+        print(f"eviction: bound {cache.max_bytes / 1024:.0f} KiB, kept {len(cache.entries())} of "
+              f"{len(programs)} entries, {cache.stats.evictions} evicted in {elapsed:.3f}s")
+    print()
+
+
+def canonical_form(cfg: ControlFlowGraph) -> str:
+    """IR listings and Mermaid text with temporaries, labels and blocks renumbered in order of appearance."""
+    artifacts = CFGArtifacts.from_cfg(cfg)
+    text = f"{artifacts.linear_ir}\n{artifacts.bb_ir}\n{artifacts.mermaid}"
+    # (pattern, prefix group, number group): B3 and C3 are the same block
+    for pattern in (r"(#)(\d+)", r"(LABEL_)(\w+)", r"(BB_)(\d+)", r"\b([BC])(\d+)\b"):
+        numbers: Dict[str, int] = {}
+        text = re.sub(pattern, lambda m: f"{m.group(1)}{numbers.setdefault(m.group(2), len(numbers))}", text)
+    return text
+
+
+def check_incremental():
+    """Edited graphs equal a fresh generation; the edge store stays compact; untouched IR is kept."""
+    # Random edit sequences give the same graph as a fresh generation
+    pool = [stmt for _, program in main_programs() for stmt in top_level_statements(program)]
+    pool += [CSkip(), CWhile(EVar("x"), CSkip())]
+    rng = random.Random(7)
+    for _ in range(200):
+        statements = [rng.choice(pool) for _ in range(rng.randint(1, 15))]
+        incremental = IncrementalCFGGenerator()
+        cfg = incremental.generate(chain(statements))
+        assert canonical_form(cfg) == canonical_form(CFGGenerator().generate_cfg(chain(statements)))
+        for _ in range(5):
+            start = rng.randint(0, len(statements) - 1)
+            end = rng.randint(start, min(len(statements), start + 2))
+            keep = len(statements) - (end - start)
+            new = [rng.choice(pool) for _ in range(rng.randint(0 if keep else 1, 2))]
+            statements[start:end] = new
+            program = chain(statements)
+            if rng.random() < 0.5:
+                incremental.update(program)
+            else:
+                incremental.replace(start, end, new)
+            assert canonical_form(cfg) == canonical_form(CFGGenerator().generate_cfg(program))
+
+    # Repeated edits do not grow the edge store: empty slots are compacted away
+    program = main_mix(200)
+    incremental = IncrementalCFGGenerator()
+    cfg = incremental.generate(program)
+    fresh = CFGGenerator(iterative=True).generate_cfg(program)
+    index = len(incremental.statements) // 2
+    original = incremental.statements[index]
+    edited = CWhile(EVar("x"), CAsgnVar("x", EBinop("-", EVar("x"), EConst(1))))
+    for _ in range(500):
+        incremental.replace(index, index + 1, [edited])
+        incremental.replace(index, index + 1, [original])
+    assert len(cfg.edges.blocks) <= 2 * len(cfg.blocks)
+    assert all(block.index >= 0 and cfg.edges.blocks[block.index] is block for block in cfg.blocks)
+    assert canonical_form(cfg) == canonical_form(fresh)
+    def idom_positions(graph):
+        tree = dominators(graph)
+        position = {id(block): i for i, block in enumerate(graph.blocks)}
+        return [position.get(id(tree.immediate_dominator(block))) for block in graph.blocks]
+    assert idom_positions(cfg) == idom_positions(fresh)
+
+    # Untouched statements keep their IR objects (and so their #n / LABEL_n)
+    program = main_mix(2_000)
+    incremental = IncrementalCFGGenerator()
+    cfg = incremental.generate(program)
+    statements = list(incremental.statements)
+    quarter = len(cfg.linear_ir) // 4
+    untouched = cfg.linear_ir[quarter]
+    edited = CIf(EBinop("<", EVar("a"), EVar("b")), CAsgnVar("m", EVar("a")), CAsgnVar("m", EVar("b")))
+    for index in (0, len(statements) // 2, len(statements) - 1):
+        incremental.replace(index, index + 1, [edited])
+        incremental.replace(index, index + 1, [statements[index]])
+    index = len(statements) // 2
+    incremental.update(chain(statements[:index] + [edited] + statements[index:]))
+    incremental.update(program)
+    assert cfg.linear_ir[quarter] is untouched
+    fresh = CFGGenerator(iterative=True).generate_cfg(program)
+    assert len(cfg.linear_ir) == len(fresh.linear_ir) and len(cfg.blocks) == len(fresh.blocks)
+    assert cfg.edges.edge_count() == fresh.edges.edge_count()
+
+
+def bench_incremental():
+    """Incremental regeneration after single-statement edits vs. full regeneration."""
+    print("=" * 70)
+    print("Incremental CFG regeneration")
+    print("=" * 70)
+
+    n = 100_000
+    program = main_mix(n)
+    full = best_of(lambda: CFGGenerator(iterative=True).generate_cfg(program), repeat=1)
+    incremental = IncrementalCFGGenerator()
+    cfg = incremental.generate(program)
+    statements = list(incremental.statements)
+    print(f"{len(statements)} top-level statements, {len(cfg.linear_ir)} instructions, {len(cfg.blocks)} blocks")
+    print(f"{'full generate_cfg':<34}{full * 1e3:>10.1f} ms")
+
+    edits = [("replace (start)", 0), ("replace (middle)", len(statements) // 2), ("replace (end)", len(statements) - 1)]
+    edited = CIf(EBinop("<", EVar("a"), EVar("b")), CAsgnVar("m", EVar("a")), CAsgnVar("m", EVar("b")))
+    for name, index in edits:
+        original = statements[index]
+        elapsed = best_of(lambda: (incremental.replace(index, index + 1, [edited]),
+                                   incremental.replace(index, index + 1, [original])), repeat=3) / 2
+        print(f"{name:<34}{elapsed * 1e3:>10.2f} ms{full / elapsed:>9.0f}x")
+
+    index = len(statements) // 2
+    for name, new_statements in [("update (middle, diffed)", statements[:index] + [edited] + statements[index + 1:]),
+                                 ("update (insert, diffed)", statements[:index] + [edited] + statements[index:])]:
+        edited_program = chain(new_statements)
+        elapsed = best_of(lambda: (incremental.update(edited_program), incremental.update(program)), repeat=3) / 2
+        print(f"{name:<34}{elapsed * 1e3:>10.2f} ms{full / elapsed:>9.0f}x")
+    print()
+
+
+def check_stats():
+    """Same graph with and without stats; stats only when asked for, sizes match the graph."""
+    for name, program in main_programs() + [("main_mix", main_mix(200))]:
+        plain = CFGGenerator().generate_cfg(program)
+        cfg = CFGGenerator(collect_stats=True).generate_cfg(program)
+        assert plain.stats is None and str(cfg) == str(plain), name
+        stats = cfg.stats
+        assert [phase.name for phase in stats.phases] == ["lower", "blocks"], name
+        assert stats.instructions == len(cfg.linear_ir) and stats.blocks == len(cfg.blocks), name
+        assert stats.edges == cfg.edges.edge_count(), name
+        assert json.loads(json.dumps(stats.as_dict()))["blocks"] == stats.blocks, name
+
+
+def bench_stats():
+    """Cost of per-phase instrumentation (collect_stats) on generate_cfg."""
+    print("=" * 70)
+    print("Per-phase instrumentation")
+    print("=" * 70)
+
+    print(f"{'statements':>10}{'off':>12}{'on':>12}{'overhead':>10}")
+    for n, repeat in [(10, 300), (1_000, 30), (10_000, 5)]:
+        program = main_mix(n)
+        off, on = best_of_pair(lambda: CFGGenerator(iterative=True).generate_cfg(program),
+                               lambda: CFGGenerator(iterative=True, collect_stats=True).generate_cfg(program),
+                               repeat=repeat, number=1)
+        print(f"{n:>10}{off * 1e3:>10.3f}ms{on * 1e3:>10.3f}ms{on / off - 1:>+10.1%}")
+
+    print()
+    print(CFGGenerator(iterative=True, collect_stats=True).generate_cfg(main_mix(20_000)).stats)
+    print()
+
+
+def check_binary():
+    """Binary CFG files: round trip through bytes and files, damaged files rejected."""
+    def check(cfg: ControlFlowGraph, name: str):
+        with cfg_binary.loads(cfg_binary.dumps(cfg)) as image:
+            loaded = image.to_cfg()
+            assert cfg_signature(loaded.blocks) == cfg_signature(cfg.blocks), name
+            assert ir_text(loaded.linear_ir) == ir_text(cfg.linear_ir), name
+            assert ir_text(loaded.bb_ir) == ir_text(cfg.bb_ir), name
+            assert loaded.to_mermaid() == cfg.to_mermaid() and str(loaded) == str(cfg), name
+            assert loaded.label_to_block.keys() == cfg.label_to_block.keys(), name
+            assert cfg_signature([image.block(i) for i in range(image.block_count)]) == \
+                [signature[:4] + ([], []) for signature in cfg_signature(cfg.blocks)], name
+            assert all([block.id for block in cfg.blocks[i].successors]
+                       == [cfg.blocks[j].id for j in image.successors(i)] for i in range(image.block_count)), name
+
+    # Round trip: generated graphs, an incrementally edited one (its edge
+    # store has empty slots), blocks not laid out as the BB IR, an empty graph
+    for name, program in main_programs() + [("main_mix", main_mix(300)), ("nested_if", nested_if(40))]:
+        check(CFGGenerator().generate_cfg(program), name)
+        cfg = CFGGenerator().generate_cfg(program)
+        cfg.bb_ir = []
+        check(cfg, name + " (blocks only)")
+    incremental = IncrementalCFGGenerator()
+    incremental.generate(main_mix(50))
+    incremental.replace(10, 12, [CWhile(EVar("x"), CSkip())])
+    check(incremental.cfg, "incremental")
+    check(ControlFlowGraph([]), "empty")
+
+    # Anything but a CFG file of this version is rejected
+    data = cfg_binary.dumps(CFGGenerator().generate_cfg(main_mix(10)))
+    for damaged in (b"", b"NOPE" + data[4:], data[:4] + b"\xff\xff" + data[6:], data[:len(data) // 2]):
+        try:
+            cfg_binary.loads(damaged)
+        except ValueError:
+            continue
+        raise AssertionError("damaged file accepted")
+
+    # Through a file on disk, read in place with mmap
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.cfg")
+        cfg = CFGGenerator(iterative=True).generate_cfg(parse_program(source_text(10_000)))
+        cfg_binary.dump(cfg, path)
+        with cfg_binary.load(path) as image:
+            assert cfg_signature(image.to_cfg().blocks) == cfg_signature(cfg.blocks)
+            middle = image.block_count // 2
+            assert cfg_signature([image.block(middle)]) == [cfg_signature(cfg.blocks)[middle][:4] + ([], [])]
+
+
+def bench_binary():
+    """Binary CFG files: loading them vs. parsing and regenerating."""
+    print("=" * 70)
+    print("Binary CFG serialisation")
+    print("=" * 70)
+
+    print(f"{'statements':>10}{'file MB':>9}{'B/instr':>9}{'parse+gen':>11}{'dump':>9}"
+          f"{'load':>10}{'one block':>11}{'to_cfg':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.cfg")
+        for size in (100_000, 1_000_000):
+            source = source_text(size)
+            statements = source.count(";") + 1
+            regenerate = best_of(lambda: CFGGenerator(iterative=True).generate_cfg(parse_program(source)), repeat=2)
+            cfg = CFGGenerator(iterative=True).generate_cfg(parse_program(source))
+            dump = best_of(lambda: cfg_binary.dump(cfg, path), repeat=2)
+
+            def lazy():
+                with cfg_binary.load(path) as image:
+                    return image.block(image.block_count // 2)
+
+            def full():
+                with cfg_binary.load(path) as image:
+                    return image.to_cfg()
+
+            load = best_of(lambda: cfg_binary.load(path).close(), repeat=5)
+            one = best_of(lazy, repeat=5)
+            materialise = best_of(full, repeat=2)
+            file_size = os.path.getsize(path)
+            print(f"{statements:>10}{file_size / 2 ** 20:>9.2f}{file_size / len(cfg.linear_ir):>9.1f}"
+                  f"{regenerate:>10.3f}s{dump:>8.3f}s{load * 1e3:>8.3f}ms{one * 1e3:>9.3f}ms{materialise:>8.3f}s")
+    print()
+
+
+def check_ir_parser():
+    """Textual IR round trip: same text, blocks and edges; malformed lines rejected."""
+    # Round trip on random programs: same text, blocks and edges; the linear
+    # IR read with renaming gives the generated BB IR
+    rng = random.Random(17)
+    programs = [("random", random_program(rng)) for _ in range(500)]
+    for name, program in main_programs() + programs + [("main_mix", main_mix(300))]:
+        cfg = CFGGenerator().generate_cfg(program)
+        loaded = parse_cfg(str(cfg))
+        assert str(loaded) == str(cfg) and loaded.to_mermaid() == cfg.to_mermaid(), name
+        assert cfg_signature(loaded.blocks) == cfg_signature(cfg.blocks), name
+        linear = "\n".join(f"{instr.name}:" if isinstance(instr, IRLabel) else f"    {instr}"
+                           for instr in cfg.linear_ir)
+        assert ir_text(parse_ir(linear)) == ir_text(cfg.linear_ir), name
+        assert cfg_signature(parse_cfg(linear, rename_labels=True).blocks) == cfg_signature(cfg.blocks), name
+
+    # Labels are kept as written (an edited graph numbers blocks out of order)
+    incremental = IncrementalCFGGenerator()
+    incremental.generate(main_mix(50))
+    incremental.replace(10, 12, [CWhile(EVar("x"), CSkip())])
+    assert str(parse_cfg(str(incremental.cfg))) == str(incremental.cfg)
+
+    for bad in ("x = ", "    if (! #0) jmp BB_1", "BB_1 BB_2:", "    x = a + b + c"):
+        try:
+            parse_ir("BB_1:\n" + bad)
+        except IRParseError as e:
+            assert e.line == 2, bad
+            continue
+        raise AssertionError(f"accepted {bad!r}")
+
+    # Read line by line from a file
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.ir")
+        cfg = CFGGenerator(iterative=True).generate_cfg(main_mix(1_000))
+        with open(path, "w", encoding="utf-8") as f:
+            write_bb_ir(cfg.blocks, f)
+        with open(path, encoding="utf-8") as f:
+            loaded = read_cfg(f)
+        assert cfg_signature(loaded.blocks) == cfg_signature(cfg.blocks)
+
+
+def bench_ir_parser():
+    """Reading the textual BB IR back vs. regenerating the CFG."""
+    print("=" * 70)
+    print("Textual IR reader")
+    print("=" * 70)
+
+    print(f"{'statements':>10}{'lines':>10}{'MB':>8}{'generate':>10}{'read':>9}{'per line':>10}{'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.ir")
+        for n in (10_000, 100_000):
+            program = main_mix(n)
+            cfg = CFGGenerator(iterative=True).generate_cfg(program)
+            with open(path, "w", encoding="utf-8") as f:
+                write_bb_ir(cfg.blocks, f)
+            lines = len(cfg.bb_ir)
+            generate = best_of(lambda: CFGGenerator(iterative=True).generate_cfg(program), repeat=2)
+
+            def read():
+                with open(path, encoding="utf-8") as f:
+                    return read_cfg(f)
+
+            elapsed = best_of(read, repeat=2)
+            peak = peak_memory(read) if n <= 10_000 else float("nan")
+            print(f"{n:>10}{lines:>10}{os.path.getsize(path) / 2 ** 20:>8.1f}{generate:>9.2f}s{elapsed:>8.2f}s"
+                  f"{elapsed / lines * 1e6:>8.2f}us{peak / 2 ** 20:>9.1f}")
+    print()
+
+
+def reference_liveness(cfg: ControlFlowGraph) -> Dict[int, Tuple[set, set]]:
+    """Live-in/out sets by block id, by round-robin iteration over Python sets."""
+    taken = {instr.var for block in cfg.blocks for instr in block.instructions if isinstance(instr, IRAddrOf)}
+    live = {block.id: (set(), set()) for block in cfg.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(cfg.blocks):
+            out = set().union(*(live[succ.id][0] for succ in block.successors))
+            current = set(out)
+            for instr in reversed(block_instructions(block)):
+                current.discard(defined_variable(instr))
+                current.update(op for op in used_operands(instr) if is_variable(op))
+                if isinstance(instr, IRDeref):
+                    current.update(taken)
+            if (current, out) != live[block.id]:
+                live[block.id] = (current, out)
+                changed = True
+    return live
+
+
+def reference_reaching(cfg: ControlFlowGraph) -> Dict[int, Tuple[set, set]]:
+    """Reaching definitions ((block id, position) sets) by block id, by round-robin iteration."""
+    reaching = {block.id: (set(), set()) for block in cfg.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in cfg.blocks:
+            entry = set().union(*(reaching[pred.id][1] for pred in block.predecessors))
+            current = set(entry)
+            for position, instr in enumerate(block.instructions):
+                dest = defined_variable(instr)
+                if dest is not None:
+                    current = {(b, p) for b, p in current if defined_variable(cfg_block(cfg, b).instructions[p]) != dest}
+                    current.add((block.id, position))
+            if (entry, current) != reaching[block.id]:
+                reaching[block.id] = (entry, current)
+                changed = True
+    return reaching
+
+
+def reference_assigned(cfg: ControlFlowGraph, names: List[str]) -> Dict[int, set]:
+    """Variables assigned on every path to each block (by id), by round-robin iteration."""
+    assigned = {block.id: set(names) for block in cfg.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in cfg.blocks:
+            entry = set(names) if block is not cfg.entry_block else set()
+            for pred in block.predecessors:
+                entry &= assigned[pred.id] | {defined_variable(instr) for instr in pred.instructions}
+            if entry != assigned[block.id]:
+                assigned[block.id] = entry
+                changed = True
+    return assigned
+
+
+def cfg_block(cfg: ControlFlowGraph, block_id: int) -> BasicBlock:
+    """Block of a CFG by id."""
+    return next(block for block in cfg.blocks if block.id == block_id)
+
+
+def check_dataflow():
+    """Liveness, reaching definitions and a must problem agree with naive set-based solvers."""
+    # Same sets as a naive solver, also on an edited graph (with empty
+    # EdgeStore slots and blocks out of id order)
+    rng = random.Random(18)
+    incremental = IncrementalCFGGenerator()
+    incremental.generate(main_mix(20))
+    incremental.replace(3, 5, [CWhile(EVar("x"), CAsgnVar("x", EBinop("-", EVar("x"), EConst(1))))])
+    graphs = [(name, CFGGenerator().generate_cfg(program)) for name, program in main_programs()]
+    graphs += [("random", CFGGenerator().generate_cfg(random_program(rng))) for _ in range(150)]
+    graphs.append(("edited", incremental.cfg))
+    for name, cfg in graphs:
+        live = liveness(cfg)
+        expected = reference_liveness(cfg)
+        for block in cfg.blocks:
+            assert (live.live_in(block), live.live_out(block)) == expected[block.id], name
+        reaching = reaching_definitions(cfg)
+        expected = reference_reaching(cfg)
+        for block in cfg.blocks:
+            assert ({(b.id, p) for b, p in reaching.reaching_in(block)},
+                    {(b.id, p) for b, p in reaching.reaching_out(block)}) == expected[block.id], name
+
+        # A must problem: variables assigned on every path to a block
+        names = sorted({defined_variable(i) for b in cfg.blocks for i in b.instructions} - {None})
+        position = {variable: i for i, variable in enumerate(names)}
+        gen = [0] * len(cfg.edges.blocks)
+        for block in cfg.blocks:
+            for instr in block.instructions:
+                if defined_variable(instr) is not None:
+                    gen[block.index] |= 1 << position[defined_variable(instr)]
+        result = solve(cfg, DataflowProblem(FORWARD, gen, [0] * len(gen), may=False, universe=len(names)))
+        assigned = reference_assigned(cfg, names)
+        for block in cfg.blocks:
+            assert {names[i] for i in range(len(names)) if result.block_in[block.index] >> i & 1} == assigned[block.id], name
+
+
+def bench_dataflow():
+    """Liveness and reaching definitions on large CFGs."""
+    print("=" * 70)
+    print("Dataflow analysis")
+    print("=" * 70)
+
+    print(f"{'statements':>10}{'blocks':>9}{'vars':>8}{'defs':>8}{'order':>9}{'liveness':>10}{'reaching':>10}{'visits':>8}")
+    for n in (10_000, 30_000):
+        cfg = CFGGenerator(iterative=True).generate_cfg(main_mix(n))
+        order_time = best_of(lambda: block_order(cfg), repeat=3)
+        order = block_order(cfg)
+        live_time = best_of(lambda: liveness(cfg, order), repeat=3)
+        reaching_time = best_of(lambda: reaching_definitions(cfg, order), repeat=3)
+        live = liveness(cfg, order)
+        reaching = reaching_definitions(cfg, order)
+        print(f"{n:>10}{len(cfg.blocks):>9}{len(live.variables):>8}{len(reaching.definitions):>8}"
+              f"{order_time * 1e3:>7.1f}ms{live_time:>9.2f}s{reaching_time:>9.2f}s"
+              f"{reaching.result.visits / len(cfg.blocks):>7.2f}x")
+    print()
+
+
+class Address:
+    """Address of a variable, as produced by &x in execute_ir."""
+    __slots__ = ("var",)
+
+    def __init__(self, var: str):
+        self.var = var
+
+    def __eq__(self, other):
+        return isinstance(other, Address) and other.var == self.var
+
+    def __hash__(self):
+        return hash(self.var)
+
+
+def execute_ir(instructions: List[Instruction], env: Dict[str, int], max_steps: int = 10_000,
+               memory: Optional[Dict[int, int]] = None) -> object:
+    """Run linear IR on a copy of env; the final variables (no temporaries), "error" or "timeout".
+
+    &x is an Address (no arithmetic); *p reads or writes the variable p
+    points to, or a memory cell for an integer p (memory: initial cells).
+    """
+    env = dict(env)
+    memory = dict(memory or {})
+    labels = {instr.name: i for i, instr in enumerate(instructions) if isinstance(instr, IRLabel)}
+    binops = {"+": lambda a, b: a + b, "-": lambda a, b: a - b, "*": lambda a, b: a * b,
+              "/": lambda a, b: a // b, "%": lambda a, b: a % b, "<": lambda a, b: int(a < b),
+              "<=": lambda a, b: int(a <= b), ">": lambda a, b: int(a > b), ">=": lambda a, b: int(a >= b),
+              "==": lambda a, b: int(a == b), "!=": lambda a, b: int(a != b),
+              "&&": lambda a, b: int(bool(a) and bool(b)), "||": lambda a, b: int(bool(a) or bool(b))}
+
+    def value(operand):
+        return env.get(operand, 0) if is_variable(operand) else int(operand)
+
+    def load(addr):
+        return env.get(addr.var, 0) if isinstance(addr, Address) else memory.get(addr, 0)
+
+    pc = steps = 0
+    try:
+        while pc < len(instructions):
+            steps += 1
+            if steps > max_steps:
+                return "timeout"
+            instr = instructions[pc]
+            pc += 1
+            if isinstance(instr, IRAssign):
+                env[instr.dest] = value(instr.source)
+            elif isinstance(instr, IRBinOp):
+                env[instr.dest] = binops[instr.op](value(instr.left), value(instr.right))
+            elif isinstance(instr, IRUnOp):
+                operand = value(instr.operand)
+                env[instr.dest] = -operand if instr.op == "-" else int(not operand)
+            elif isinstance(instr, IRDeref):
+                env[instr.dest] = load(value(instr.addr))
+            elif isinstance(instr, IRAddrOf):
+                env[instr.dest] = Address(instr.var)
+            elif isinstance(instr, IRStoreDeref):
+                addr = value(instr.addr)
+                if isinstance(addr, Address):
+                    env[addr.var] = value(instr.value)
+                else:
+                    memory[addr] = value(instr.value)
+            elif isinstance(instr, IRJump):
+                pc = labels[instr.label]
+            elif isinstance(instr, IRCondJump) and not value(instr.cond):
+                pc = labels[instr.label]
+    except (TypeError, ZeroDivisionError, KeyError):
+        return "error"
+    return {name: v for name, v in env.items() if not name.startswith("#")}, memory
+
+
+def max_live_temps(cfg: ControlFlowGraph) -> int:
+    """Largest number of temporaries live at once at a block boundary."""
+    live = liveness(cfg)
+    temps = sum(1 << bit for name, bit in live.variable_bits.items() if name.startswith("#"))
+    return max([bin(value & temps).count("1") for value in live.result.block_in + live.result.block_out] + [0])
+
+
+def check_temps():
+    """Temporary reuse keeps results, sizes and lowering modes in agreement, with fewer live temporaries."""
+    # Same results as without reuse; recursive and iterative lowering agree
+    rng = random.Random(19)
+    for _ in range(300):
+        program = random_program(rng)
+        plain = CFGGenerator().process_statement(program)
+        reused = CFGGenerator(reuse_temps=True).process_statement(program)
+        assert ir_text(reused) == ir_text(CFGGenerator(iterative=True, reuse_temps=True).process_statement_iterative(program))
+        env = {name: rng.randint(-3, 9) for name in "abcde"}
+        assert execute_ir(reused, env) == execute_ir(plain, env)
+    for name, program in main_programs():
+        assert str(CFGGenerator(reuse_temps=True).generate_cfg(program)) == \
+            str(CFGGenerator(iterative=True, reuse_temps=True).generate_cfg(program)), name
+
+    # Same shape of graph, never more temporaries live at once
+    corpus = main_programs() + [("main_mix", main_mix(500)), ("long_expr", long_expr(500))]
+    corpus += [(case, generator(size // 1000)) for case, generator, size in SUITE_CASES]
+    for name, program in corpus:
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        cfg_r = CFGGenerator(iterative=True, reuse_temps=True).generate_cfg(program)
+        assert len(cfg.linear_ir) == len(cfg_r.linear_ir) and len(cfg.blocks) == len(cfg_r.blocks), name
+        assert max_live_temps(cfg_r) <= max_live_temps(cfg), name
+
+
+def bench_temps():
+    """Temporary reuse (reuse_temps) vs. a fresh temporary per intermediate."""
+    print("=" * 70)
+    print("Temporary reuse")
+    print("=" * 70)
+
+    corpus = main_programs() + [("main_mix", main_mix(10_000)), ("long_expr", long_expr(10_000))]
+    corpus += [(case, generator(size // 10)) for case, generator, size in SUITE_CASES]
+    print(f"{'program':<34}{'temps':>9}{'reused':>8}{'live vars':>11}{'reused':>8}"
+          f"{'liveness':>10}{'reused':>9}{'lower':>9}{'reused':>9}")
+    for name, program in corpus:
+        row = []
+        for reuse in (False, True):
+            generator = CFGGenerator(iterative=True, reuse_temps=reuse)
+            cfg = generator.generate_cfg(program)
+            variables = len(liveness(cfg).variables)
+            analysis = best_of(lambda: liveness(cfg), repeat=3)
+            lower = best_of(lambda: CFGGenerator(iterative=True, reuse_temps=reuse).process_statement_iterative(program),
+                            repeat=3)
+            row.append((generator.temp_counter, variables, analysis, lower))
+        (temps, variables, analysis, lower), (temps_r, variables_r, analysis_r, lower_r) = row
+        print(f"{name:<34}{temps:>9}{temps_r:>8}{variables:>11}{variables_r:>8}"
+              f"{analysis * 1e3:>8.1f}ms{analysis_r * 1e3:>7.1f}ms{lower * 1e3:>7.1f}ms{lower_r * 1e3:>7.1f}ms")
+    print()
+
+
+def layout_edges(cfg: ControlFlowGraph) -> List[List[int]]:
+    """Successors of each block by position in cfg.blocks, for comparing graphs with other block ids."""
+    position = {block.id: i for i, block in enumerate(cfg.blocks)}
+    return [[position[succ.id] for succ in block.successors] for block in cfg.blocks]
+
+
+def constant_program(n: int) -> Com:
+    """CSeq chain of n statements with constant subexpressions and conditions."""
+    stmts: List[Com] = []
+    for i in range(n):
+        stmts.append(CAsgnVar("k", EBinop("+", EBinop("*", EConst(3), EConst(4)), EVar("y"))))
+        stmts.append(CAsgnVar("n", EConst(i % 5)))
+        stmts.append(CIf(EBinop("<", EVar("n"), EConst(3)), CAsgnVar("y", EBinop("-", EVar("y"), EVar("n"))),
+                         CAsgnVar("y", EBinop("+", EVar("y"), EConst(1)))))
+        stmts.append(CWhile(EBinop("<", EVar("y"), EBinop("*", EVar("n"), EConst(10))),
+                            CAsgnVar("y", EBinop("+", EVar("y"), EVar("n")))))
+    return chain(stmts)
+
+
+def check_constants():
+    """Constant folding keeps the results of random programs and reaches a fixed point."""
+    # Same results as the unoptimised program; blocks, edges and text agree
+    rng = random.Random(20)
+    for i in range(300):
+        program = random_program(rng)
+        cfg = CFGGenerator(reuse_temps=i % 2 == 1).generate_cfg(program)
+        before = list(cfg.bb_ir)
+        fold_constants(cfg)
+        env = {name: rng.randint(-3, 9) for name in "abcde"}
+        expected = execute_ir(before, env)
+        assert execute_ir(cfg.bb_ir, env) == expected or expected == "timeout"
+        assert layout_edges(parse_cfg(str(cfg))) == layout_edges(cfg)
+        assert fold_constants(cfg).instructions_removed == 0
+        cfg.to_mermaid()
+
+
+def bench_constants():
+    """Constant folding and propagation: removed instructions and blocks, and pass time."""
+    print("=" * 70)
+    print("Constant folding and propagation")
+    print("=" * 70)
+
+    rng = random.Random(20)
+    corpus = main_programs() + [("main_mix", main_mix(3_000)), ("constant_program", constant_program(1_000)),
+                                ("random", chain([random_program(rng) for _ in range(200)]))]
+    print(f"{'program':<34}{'instrs':>8}{'removed':>9}{'blocks':>8}{'removed':>9}"
+          f"{'folded':>8}{'propag.':>9}{'branches':>9}{'time':>10}")
+    for name, program in corpus:
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        instructions, blocks = instruction_count(cfg), len(cfg.blocks)
+        start = time.perf_counter()
+        stats = fold_constants(cfg)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<34}{instructions:>8}{stats.instructions_removed:>9}{blocks:>8}{stats.blocks_removed:>9}"
+              f"{stats.counts['folded']:>8}{stats.counts['propagated']:>9}{stats.counts['branches']:>9}"
+              f"{elapsed * 1e3:>8.1f}ms")
+    print()
+
+
+def empty_blocks(cfg: ControlFlowGraph) -> int:
+    """Number of blocks shown as (empty) in to_mermaid: no instructions and no conditional jump."""
+    return sum(not block.instructions and not isinstance(block.terminator, IRCondJump) for block in cfg.blocks)
+
+
+def check_simplify():
+    """Simplification keeps results and reaches a fixed point; its counts match the graph."""
+    # Same results as before; blocks, edges and text agree; a second run changes nothing
+    rng = random.Random(21)
+    for i in range(300):
+        program = random_program(rng)
+        cfg = CFGGenerator(reuse_temps=i % 2 == 1).generate_cfg(program)
+        before = list(cfg.bb_ir)
+        if i % 3 == 0:
+            fold_constants(cfg)
+        simplify_cfg(cfg)
+        env = {name: rng.randint(-3, 9) for name in "abcde"}
+        expected = execute_ir(before, env)
+        assert execute_ir(cfg.bb_ir, env) == expected or expected == "timeout"
+        assert layout_edges(parse_cfg(str(cfg))) == layout_edges(cfg)
+        assert [block.id for block in cfg.blocks] == list(range(len(cfg.blocks)))
+        assert all(cfg.jump_target(block) is not None for block in cfg.blocks if block.terminator is not None)
+        again = simplify_cfg(cfg)
+        assert (again.blocks_removed, again.instructions_removed, again.counts) == \
+            (0, 0, {"threaded": 0, "jumps": 0, "edges": 0})
+        cfg.to_mermaid()
+
+    corpus = main_programs() + [("main_mix", main_mix(300))]
+    corpus += [(case, generator(size // 1000)) for case, generator, size in SUITE_CASES]
+    for name, program in corpus:
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        blocks, edges = len(cfg.blocks), cfg.edges.edge_count()
+        stats = simplify_cfg(cfg)
+        assert stats.blocks_removed == blocks - len(cfg.blocks), name
+        assert stats.counts["edges"] == edges - cfg.edges.edge_count(), name
+
+
+def bench_simplify():
+    """Empty-block elimination and jump threading: blocks and edges saved, and pass time."""
+    print("=" * 70)
+    print("CFG simplification")
+    print("=" * 70)
+
+    corpus = main_programs() + [("main_mix", main_mix(3_000))]
+    corpus += [(case, generator(size // 10)) for case, generator, size in SUITE_CASES]
+    print(f"{'program':<34}{'blocks':>8}{'after':>8}{'empty':>7}{'after':>7}"
+          f"{'edges':>8}{'after':>8}{'threaded':>10}{'time':>10}")
+    for name, program in corpus:
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        blocks, edges, empty = len(cfg.blocks), cfg.edges.edge_count(), empty_blocks(cfg)
+        start = time.perf_counter()
+        stats = simplify_cfg(cfg)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<34}{blocks:>8}{len(cfg.blocks):>8}{empty:>7}{empty_blocks(cfg):>7}"
+              f"{edges:>8}{cfg.edges.edge_count():>8}{stats.counts['threaded']:>10}{elapsed * 1e3:>8.1f}ms")
+    print()
+
+
+def mergeable_pairs(cfg: ControlFlowGraph) -> int:
+    """Blocks that are the only successor of their only predecessor and follow it in the layout."""
+    return sum(len(block.successors) == 1 and following is not cfg.entry_block and block.successors[0] is following
+               and len(following.predecessors) == 1
+               and (block.terminator is None or cfg.jump_target(block) is following)
+               for block, following in zip(cfg.blocks, cfg.blocks[1:]))
+
+
+def check_merge():
+    """Block merging keeps results and leaves nothing to merge."""
+    # Same results as before; blocks, edges and text agree; nothing is left to merge
+    rng = random.Random(22)
+    for i in range(300):
+        program = random_program(rng)
+        cfg = CFGGenerator(reuse_temps=i % 2 == 1).generate_cfg(program)
+        before = list(cfg.bb_ir)
+        if i % 3 != 0:
+            fold_constants(cfg)
+        if i % 3 == 2:
+            simplify_cfg(cfg)
+        merge_blocks(cfg)
+        env = {name: rng.randint(-3, 9) for name in "abcde"}
+        expected = execute_ir(before, env)
+        assert execute_ir(cfg.bb_ir, env) == expected or expected == "timeout"
+        assert layout_edges(parse_cfg(str(cfg))) == layout_edges(cfg)
+        assert mergeable_pairs(cfg) == 0
+        again = merge_blocks(cfg)
+        assert (again.blocks_removed, again.instructions_removed) == (0, 0)
+        cfg.to_mermaid()
+
+
+def bench_merge():
+    """Straight-line block merging, alone and after the other passes: blocks and edges saved, and pass time."""
+    print("=" * 70)
+    print("Block merging")
+    print("=" * 70)
+
+    rng = random.Random(22)
+    passes = [("merge", [merge_blocks]), ("constants+merge", [fold_constants, merge_blocks]),
+              ("constants+simplify+merge", [fold_constants, simplify_cfg, merge_blocks])]
+    corpus = [("main_mix", main_mix(3_000)), ("constant_program", constant_program(1_000)),
+              ("random", chain([random_program(rng) for _ in range(200)]))]
+    print(f"{'program':<20}{'passes':<28}{'blocks':>8}{'merged':>8}{'edges':>8}{'removed':>9}{'time':>10}")
+    for name, program in corpus:
+        for label, pipeline in passes:
+            cfg = CFGGenerator(iterative=True).generate_cfg(program)
+            for optimise in pipeline[:-1]:
+                optimise(cfg)
+            blocks, edges = len(cfg.blocks), cfg.edges.edge_count()
+            start = time.perf_counter()
+            stats = merge_blocks(cfg)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<20}{label:<28}{blocks:>8}{stats.blocks_removed:>8}{edges:>8}"
+                  f"{stats.counts['edges']:>9}{elapsed * 1e3:>8.1f}ms")
+    print()
+
+
+def nested_loops(depth: int) -> Com:
+    """CIf and CWhile alternately nested depth levels deep, with a statement after each."""
+    program: Com = CAsgnVar("x", EBinop("+", EVar("x"), EConst(1)))
+    for i in range(depth):
+        if i % 2:
+            program = CIf(EBinop("<", EVar("x"), EConst(i)), program, CSkip())
+        else:
+            program = CWhile(EBinop("<", EVar("x"), EVar("n")), program)
+        program = CSeq(program, CAsgnVar("y", EVar("x")))
+    return program
+
+
+def reference_dominators(cfg: ControlFlowGraph, post: bool = False) -> Dict[int, set]:
+    """Dominator sets by block index, from the set equations (reachable blocks only)."""
+    edges = cfg.edges
+    succ, pred = (edges.pred, edges.succ) if post else (edges.succ, edges.pred)
+    indices = [i for i, block in enumerate(edges.blocks) if block is not None]
+    roots = [i for i in indices if not edges.succ[i]] if post else [cfg.entry_block.index]
+    reached, stack = set(roots), list(roots)
+    while stack:
+        for target in succ[stack.pop()]:
+            if target not in reached:
+                reached.add(target)
+                stack.append(target)
+    dom = {i: ({i} if i in roots else set(reached)) for i in reached}
+    changed = True
+    while changed:
+        changed = False
+        for i in reached:
+            if i in roots:
+                continue
+            new = set(reached)
+            for source in pred[i]:
+                if source in reached:
+                    new &= dom[source]
+            new.add(i)
+            if new != dom[i]:
+                dom[i], changed = new, True
+    return dom
+
+
+def check_dominance():
+    """Dominator trees and frontiers agree with the set equations; trees are cached until edges change."""
+    # Same as the set equations on small programs (also after the optimisation passes)
+    rng = random.Random(23)
+    for i in range(300):
+        cfg = CFGGenerator().generate_cfg(random_program(rng))
+        if cfg.entry_block is None:
+            assert dominators(cfg).order == post_dominators(cfg).order == []
+            continue
+        if i % 2:
+            fold_constants(cfg)
+            simplify_cfg(cfg)
+        edges = cfg.edges
+        for post, tree in ((False, dominators(cfg)), (True, post_dominators(cfg))):
+            dom = reference_dominators(cfg, post)
+            sources = edges.succ if post else edges.pred
+            assert sorted(tree.order) == sorted(dom)
+            for b in dom:
+                strict = dom[b] - {b}
+                expected = max(strict, key=lambda a: len(dom[a])) if strict else -1
+                assert tree.idom[b] == expected
+                assert {a for a in dom if tree.dominates_index(a, b)} == dom[b]
+            for a in dom:
+                frontier = {b for b in dom if any(s in dom and a in dom[s] for s in sources[b])
+                            and not (a in dom[b] and a != b)}
+                assert sorted(tree.frontiers[a]) == sorted(frontier)
+
+    # Cached until the edges or the entry block change
+    cfg = CFGGenerator().generate_cfg(nested_loops(20))
+    tree = dominators(cfg)
+    assert dominators(cfg) is tree
+    cfg.edges.add_edge(cfg.entry_block.index, cfg.blocks[-1].index)
+    assert dominators(cfg) is not tree
+    assert post_dominators(cfg) is post_dominators(cfg)
+    simplify_cfg(cfg)
+    assert dominators(cfg).cfg is cfg and dominators(cfg).idom is not tree.idom
+
+
+def bench_dominance():
+    """Dominator and post-dominator trees and dominance frontiers on large CFGs."""
+    print("=" * 70)
+    print("Dominance")
+    print("=" * 70)
+
+    corpus = [("nested_if", nested_if(33_000)), ("nested_while", nested_while(50_000)),
+              ("nested_loops", nested_loops(40_000)), ("main_mix", main_mix(33_000))]
+    print(f"{'program':<16}{'blocks':>9}{'edges':>9}{'dominators':>12}{'frontiers':>11}"
+          f"{'post-dom':>10}{'frontiers':>11}{'cached':>9}")
+    for name, program in corpus:
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        times = []
+        for analysis in (dominators, post_dominators):
+            def build():
+                cfg.analyses.clear()
+                return analysis(cfg)
+            times.append(best_of(build, repeat=3))
+            tree = analysis(cfg)
+            def frontiers():
+                tree._frontiers = None
+                return tree.frontiers
+            times.append(best_of(frontiers, repeat=3))
+        cached = best_of(lambda: dominators(cfg), repeat=3, number=1000) / 1000
+        print(f"{name:<16}{len(cfg.blocks):>9}{cfg.edges.edge_count():>9}" +
+              "".join(f"{t * 1e3:>{w - 2}.1f}ms" for t, w in zip(times, (12, 11, 10, 11))) +
+              f"{cached * 1e6:>7.2f}us")
+    print()
+
+
+def swap_loop(n: int) -> Com:
+    """n loops swapping x and y through t: the copies of the phi functions form a cycle after copy propagation."""
+    body = chain([CAsgnVar("t", EVar("x")), CAsgnVar("x", EVar("y")), CAsgnVar("y", EVar("t")),
+                  CAsgnVar("i", EBinop("+", EVar("i"), EConst(1)))])
+    return chain([CWhile(EBinop("<", EVar("i"), EVar("n")), body) for _ in range(n)])
+
+
+def lost_copy(n: int) -> Com:
+    """n loops keeping the previous x in y: after copy propagation, two versions of x are live at once."""
+    body = chain([CAsgnVar("y", EVar("x")), CAsgnVar("x", EBinop("+", EVar("x"), EConst(1)))])
+    loop = CWhile(EBinop("<", EVar("x"), EVar("n")), body)
+    return chain([chain([loop, CAsgnVar("z", EBinop("+", EVar("z"), EVar("y")))]) for _ in range(n)])
+
+
+def check_ssa_form(ssa: SSAForm):
+    """Every SSA name is defined once, and its definition dominates its uses."""
+    cfg = ssa.cfg
+    tree = dominators(cfg)
+    defined: Dict[str, Tuple[int, int]] = {}
+    for block in cfg.blocks:
+        for position, instr in enumerate(block.instructions):
+            dest = instr.dest if isinstance(instr, IRPhi) else defined_variable(instr)
+            if dest is not None and dest not in ssa.memory:
+                assert dest in ssa.original and dest not in defined, dest
+                defined[dest] = (block.index, position)
+
+    def check(operand: str, index: int, position: int):
+        if operand in ssa.original:
+            block, where = defined[operand]
+            assert (block, where) < (index, position) if block == index else tree.dominates_index(block, index)
+
+    for block in cfg.blocks:
+        for position, instr in enumerate(block_instructions(block)):
+            if isinstance(instr, IRPhi):
+                for source, value in instr.sources.items():
+                    check(value, source, len(cfg.edges.blocks[source].instructions) + 1)
+            else:
+                for operand in used_operands(instr):
+                    check(operand, block.index, position)
+    for index, values in ssa.exit_values.items():
+        for value in values.values():
+            check(value, index, len(cfg.edges.blocks[index].instructions) + 1)
+
+
+def ssa_copy_propagation(ssa: SSAForm) -> int:
+    """Replace the uses of copies x.2 = y.1 by their source and drop the copies (an optimisation on SSA form).
+
+    Copies of address-taken variables are kept. Returns the number of copies removed.
+    """
+    cfg = ssa.cfg
+    copies = {instr.dest: instr.source for block in cfg.blocks for instr in block.instructions
+              if isinstance(instr, IRAssign) and instr.dest in ssa.original and instr.source not in ssa.memory}
+
+    def resolve(operand: str) -> str:
+        while operand in copies:
+            operand = copies[operand]
+        return operand
+
+    for block in cfg.blocks:
+        instructions = []
+        for instr in block.instructions:
+            if isinstance(instr, IRPhi):
+                instr.sources = {source: resolve(value) for source, value in instr.sources.items()}
+            elif isinstance(instr, IRAssign) and instr.dest in copies:
+                continue
+            else:
+                instr = rename_instruction(instr, resolve)
+            instructions.append(instr)
+        block.instructions = instructions
+        if block.terminator is not None:
+            block.terminator = rename_instruction(block.terminator, resolve)
+    for values in ssa.exit_values.values():
+        for name, value in values.items():
+            values[name] = resolve(value)
+    return len(copies)
+
+
+def program_results(result: object) -> object:
+    """Results of execute_ir without SSA versions (names with a dot) left by destruct_ssa."""
+    if isinstance(result, tuple):
+        env, memory = result
+        return {name: v for name, v in env.items() if "." not in name}, memory
+    return result
+
+
+def check_ssa():
+    """In and out of SSA gives the same program back, also after copy propagation; SSA form is not serialised."""
+    # In and out of SSA gives the same program back; after copy propagation
+    # on SSA form, the same results
+    rng = random.Random(24)
+    programs = [random_program(rng) for _ in range(300)] + [swap_loop(1), swap_loop(3), lost_copy(2)]
+    # Threading the empty else branch leaves a critical edge into the join (odd index: simplified)
+    programs.append(parse_program("x = a; if (c) then x = 1 else skip; y = x"))
+    totals = {"split": 0, "versions": 0}
+    for i, program in enumerate(programs):
+        cfg = CFGGenerator(reuse_temps=i % 2 == 1).generate_cfg(program)
+        if i % 3 == 2:
+            fold_constants(cfg)
+            simplify_cfg(cfg)
+        before = str(cfg)
+        ssa = construct_ssa(cfg)
+        check_ssa_form(ssa)
+        cfg.to_mermaid()
+        destruct_ssa(ssa)
+        assert str(cfg) == before and not any(phi_functions(block) for block in cfg.blocks)
+
+        # Jump threading leaves critical edges for the copies
+        cfg = CFGGenerator().generate_cfg(program)
+        if i % 2 == 1:
+            fold_constants(cfg)
+            simplify_cfg(cfg)
+        ssa = construct_ssa(cfg)
+        ssa_copy_propagation(ssa)
+        check_ssa_form(ssa)
+        stats = destruct_ssa(ssa)
+        for key in totals:
+            totals[key] += stats.counts[key]
+        assert layout_edges(parse_cfg(str(cfg))) == layout_edges(cfg)
+        env = {name: rng.randint(-3, 9) for name in "abcdexyzn"}
+        expected = execute_ir(CFGGenerator().process_statement(program), env)
+        assert program_results(execute_ir(cfg.bb_ir, env)) == expected or expected == "timeout"
+    assert totals["split"] and totals["versions"], totals
+
+    # Phi functions have no binary or textual reader: both reject SSA form clearly
+    cfg = CFGGenerator().generate_cfg(swap_loop(1))
+    construct_ssa(cfg)
+    for reject in (cfg_binary.dumps, lambda cfg: parse_cfg(str(cfg))):
+        try:
+            reject(cfg)
+            raise AssertionError("SSA form accepted")
+        except ValueError as e:
+            assert "destruct_ssa" in str(e), e
+
+
+def bench_ssa():
+    """SSA construction and destruction: phi functions, copies and time on large programs."""
+    print("=" * 70)
+    print("SSA form")
+    print("=" * 70)
+
+    rng = random.Random(24)
+    corpus = [("main_mix", main_mix(10_000)), ("nested_loops", nested_loops(10_000)),
+              ("deep_if", nested_if(10_000)), ("or_chain", logic_chain(10_000, "||")),
+              ("constant_program", constant_program(2_000)), ("swap_loop", swap_loop(2_000)),
+              ("lost_copy", lost_copy(2_000)), ("random", chain([random_program(rng) for _ in range(1_000)]))]
+    print(f"{'program':<18}{'blocks':>8}{'instrs':>9}{'phis':>8}{'to SSA':>10}{'from SSA':>10}"
+          f"{'propag.':>9}{'copies':>8}{'split':>7}{'versions':>10}{'from SSA':>10}")
+    for name, program in corpus:
+        generator = CFGGenerator(iterative=True)
+        cfg = generator.generate_cfg(program)
+        blocks, instructions = len(cfg.blocks), instruction_count(cfg)
+
+        def round_trip():
+            copy = generator.generate_cfg(program)
+            start = time.perf_counter()
+            ssa = construct_ssa(copy)
+            middle = time.perf_counter()
+            destruct_ssa(ssa)
+            return ssa, middle - start, time.perf_counter() - middle
+
+        runs = [round_trip() for _ in range(3)]
+        ssa = runs[0][0]
+        construct = min(run[1] for run in runs)
+        destruct = min(run[2] for run in runs)
+        # After copy propagation, copies come back and versions may interfere
+        ssa = construct_ssa(cfg)
+        propagated = ssa_copy_propagation(ssa)
+        start = time.perf_counter()
+        stats = destruct_ssa(ssa)
+        optimised = time.perf_counter() - start
+        print(f"{name:<18}{blocks:>8}{instructions:>9}{ssa.phis:>8}{construct * 1e3:>8.1f}ms{destruct * 1e3:>8.1f}ms"
+              f"{propagated:>9}{stats.counts['copies']:>8}{stats.counts['split']:>7}{stats.counts['versions']:>10}"
+              f"{optimised * 1e3:>8.1f}ms")
+    print()
+
+
+def flat_results(result: object, interpreter: Interpreter) -> Tuple[Dict[str, int], Dict[int, int]]:
+    """Results of execute_ir in the interpreter's memory model: &x is x's address, heap cells by address."""
+    env, memory = result
+
+    def flat(value):
+        return interpreter.addresses.get(value.var, -1) if isinstance(value, Address) else value
+
+    return ({name: flat(env.get(name, 0)) for name in interpreter.addresses if not name.startswith("#")},
+            {address: flat(value) for address, value in memory.items() if flat(value)})
+
+
+def interpreter_cases(size: int, rng: random.Random) -> List[tuple]:
+    """Loop-heavy programs over size (even) elements: (name, program, env, memory, check of the final variables)."""
+    programs = dict(main_programs())
+    values = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(size)]
+    array = {1 + k: value for k, value in enumerate(values)}
+    return [
+        ("array_max", programs["test10_comprehensive"], {"arr": 1, "n": size, "max": -10 ** 7}, array,
+         lambda result: result["max"] == max(values)),
+        ("sum_loop", programs["test5_while_loop"], {"n": size}, {},
+         lambda result: result["s"] == size * (size - 1) // 2),
+        ("swap_loop", swap_loop(1), {"n": size, "x": 1, "y": 2}, {},
+         lambda result: (result["x"], result["y"]) == (1, 2)),
+        ("nested_loops", nested_loops(20), {"n": size}, {},
+         lambda result: result["y"] == size),
+    ]
+
+
+def check_interpreter():
+    """The interpreter gives the same results as execute_ir; memory model, errors, 64-bit wrapping."""
+    # Same final variables and memory as execute_ir on the linear IR, also
+    # after optimisations and a round trip through SSA form
+    rng = random.Random(25)
+    compared = 0
+    for i in range(300):
+        program = random_program(rng)
+        env = {name: rng.randint(-3, 9) for name in "abcde"}
+        expected = execute_ir(CFGGenerator().process_statement(program), env)
+        cfg = CFGGenerator(reuse_temps=i % 2 == 1).generate_cfg(program)
+        variants = [Interpreter(cfg)]
+        if i % 3 == 1:
+            fold_constants(cfg)
+            simplify_cfg(cfg)
+            merge_blocks(cfg)
+            variants.append(Interpreter(cfg))
+        elif i % 3 == 2:
+            ssa = construct_ssa(cfg)
+            ssa_copy_propagation(ssa)
+            destruct_ssa(ssa)
+            variants.append(Interpreter(cfg))
+        if expected in ("error", "timeout"):
+            continue
+        for interpreter in variants:
+            try:
+                result = interpreter.run(env, max_steps=100_000)
+            except StepLimitExceeded:
+                raise
+            except ExecutionError:
+                # A negative address: a memory cell for execute_ir, outside the flat memory
+                continue
+            heap = {address: value for address, value in enumerate(result.memory[:interpreter.heap_size]) if value}
+            assert (result.variables, heap) == flat_results(expected, interpreter), i
+            compared += 1
+    assert compared > 150, compared
+
+    # Pointers into the variables, runtime errors, the step limit
+    programs = dict(main_programs())
+    result = run_cfg(CFGGenerator().generate_cfg(programs["test7_pointer_operations"]), {"x": 3})
+    assert result.variables["x"] == 10 and result.steps == 2
+    pointer = CSeq(CAsgnVar("p", EAddrOf(EVar("x"))),
+                   CAsgnDeref(EBinop("+", EVar("p"), EConst(1)), EConst(7)))
+    interpreter = Interpreter(CFGGenerator().generate_cfg(pointer))
+    assert interpreter.run().memory[interpreter.addresses["x"] + 1] == 7
+    for bad in (CAsgnVar("x", EBinop("/", EVar("x"), EConst(0))), CAsgnDeref(EConst(-1), EConst(1)),
+                CAsgnVar("x", EDeref(EConst(1 << 20)))):
+        try:
+            run_cfg(CFGGenerator().generate_cfg(bad))
+            raise AssertionError(f"no error for {bad}")
+        except ExecutionError as e:
+            assert not isinstance(e, StepLimitExceeded) and e.block is not None
+    try:
+        run_cfg(CFGGenerator().generate_cfg(CWhile(EConst(1), CSkip())), max_steps=1000)
+        raise AssertionError("infinite loop ended")
+    except StepLimitExceeded:
+        pass
+    # Values wrap to 64 bits, so squaring forever stays cheap until the step limit
+    squaring = parse_program("a = 2; while (1) do { a = a * a }")
+    start = time.perf_counter()
+    try:
+        run_cfg(CFGGenerator().generate_cfg(squaring), max_steps=200)
+        raise AssertionError("infinite loop ended")
+    except StepLimitExceeded:
+        assert time.perf_counter() - start < 1
+    wrapping = parse_program("a = a * 2; b = b - 1; c = c / -1; d = -d; e = 7 / -2; f = -7 % 2")
+    result = run_cfg(CFGGenerator().generate_cfg(wrapping),
+                     {"a": 1 << 62, "b": -2 ** 63, "c": -2 ** 63, "d": -2 ** 63, "f": 0})
+    assert result.variables == {"a": -2 ** 63, "b": 2 ** 63 - 1, "c": -2 ** 63, "d": -2 ** 63,
+                                "e": -4, "f": 1}, result.variables
+    assert run_cfg(CFGGenerator().generate_cfg(CAsgnVar("x", EVar("x"))), {"x": 2 ** 64 + 5}).variables["x"] == 5
+    try:
+        run_cfg(parse_cfg("BB_1:\n  x = 1\n  jmp BB_9\n"))
+        raise AssertionError("jump to a missing block decoded")
+    except ValueError as e:
+        assert str(e) == "Jump to unknown label BB_9", e
+
+    # The benchmark programs, small, with and without the optimisation passes
+    size = 200
+    for name, program, env, memory, check in interpreter_cases(size, rng):
+        for optimised in (False, True):
+            cfg = CFGGenerator().generate_cfg(program)
+            if optimised:
+                fold_constants(cfg)
+                simplify_cfg(cfg)
+                merge_blocks(cfg)
+            assert check(Interpreter(cfg, heap_size=size + 1).run(env, memory).variables), name
+        linear = CFGGenerator().process_statement(program)
+        assert check(execute_ir(linear, env, max_steps=10 ** 6, memory=memory)[0]), name
+
+
+def bench_interpreter():
+    """IR interpreter: instructions per second on loop-heavy programs, against execute_ir."""
+    print("=" * 70)
+    print("IR interpreter")
+    print("=" * 70)
+
+    # Instructions per second: the interpreter on the CFG against execute_ir
+    # (an isinstance chain) on the linear IR
+    size = 200_000
+    print(f"{'program':<20}{'blocks':>8}{'steps':>10}{'decode':>10}{'run':>10}{'Minstr/s':>10}"
+          f"{'execute_ir':>12}{'speedup':>9}")
+    for name, program, env, memory, _ in interpreter_cases(size, random.Random(25)):
+        for optimised in (False, True):
+            cfg = CFGGenerator().generate_cfg(program)
+            if optimised:
+                fold_constants(cfg)
+                simplify_cfg(cfg)
+                merge_blocks(cfg)
+                name += " (opt)"
+            start = time.perf_counter()
+            interpreter = Interpreter(cfg, heap_size=size + 1)
+            decode = time.perf_counter() - start
+            result = None
+
+            def run():
+                nonlocal result
+                result = interpreter.run(env, memory)
+
+            elapsed = best_of(run, 3)
+            rate = result.steps / elapsed / 1e6
+            if optimised:
+                print(f"{name:<20}{len(cfg.blocks):>8}{result.steps:>10}{decode * 1e3:>8.2f}ms"
+                      f"{elapsed * 1e3:>8.1f}ms{rate:>10.2f}")
+                continue
+            linear = CFGGenerator().process_statement(program)
+            start = time.perf_counter()
+            execute_ir(linear, env, max_steps=10 ** 9, memory=memory)
+            reference = time.perf_counter() - start
+            print(f"{name:<20}{len(cfg.blocks):>8}{result.steps:>10}{decode * 1e3:>8.2f}ms"
+                  f"{elapsed * 1e3:>8.1f}ms{rate:>10.2f}{reference * 1e3:>10.0f}ms{reference / elapsed:>8.1f}x")
+
+    # Decoding is linear in the size of the program
+    cfg = CFGGenerator(iterative=True).generate_cfg(main_mix(30_000))
+    interpreter = None
+
+    def decode():
+        nonlocal interpreter
+        interpreter = Interpreter(cfg)
+
+    elapsed = best_of(decode, 3)
+    result = interpreter.run({"x": 1, "y": 2, "n": 3})
+    print(f"decode main_mix(30000): {len(cfg.blocks)} blocks, {instruction_count(cfg)} instructions in "
+          f"{elapsed * 1e3:.1f}ms; run {result.steps} steps in {best_of(lambda: interpreter.run(), 3) * 1e3:.1f}ms")
+    print()
+
+
+# Regression suite: (case, program generator, size at scale 1.0)
+SUITE_CASES: List[Tuple[str, Callable[[int], Com], int]] = [
+    ("wide_seq", seq_chain, 100_000),
+    ("deep_if", nested_if, 10_000),
+    ("and_chain", lambda n: logic_chain(n, "&&"), 20_000),
+    ("or_chain", lambda n: logic_chain(n, "||"), 20_000),
+    ("nested_while", nested_while, 10_000),
+    ("pointers", pointer_code, 30_000),
+]
+SUITE_PHASES = ("lower", "blocks", "mermaid", "total")
+SUITE_FORMAT = 1
+
+
+def calibration_time() -> float:
+    """Time (seconds) of a fixed pure-Python workload that does not use the generator.
+
+    Suite timings are compared after dividing by this, so a baseline taken
+    on a faster or slower machine still gives meaningful ratios.
+    """
+    def workload():
+        table: Dict[int, str] = {}
+        for i in range(200_000):
+            table[i & 4095] = f"#{i}"
+        return sorted(table.values())
+    return best_of(workload, repeat=5)
+
+
+def phase_times(program: Com, repeat: int) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """Best time of each generate_cfg phase plus to_mermaid, and the output sizes.
+
+    Phases: lower and blocks (as recorded in cfg.stats, see GenerationStats),
+    mermaid (to_mermaid), total.
+    """
+    best = dict.fromkeys(SUITE_PHASES, float("inf"))
+    for _ in range(repeat):
+        # Start each run from a clean heap: the previous graph would
+        # otherwise be rescanned by every collection inside the run
+        cfg = mermaid = None
+        gc.collect()
+        cfg = CFGGenerator(iterative=True, collect_stats=True).generate_cfg(program)
+        start = time.perf_counter()
+        mermaid = cfg.to_mermaid()
+        seconds = {phase.name: phase.seconds for phase in cfg.stats.phases}
+        seconds["mermaid"] = time.perf_counter() - start
+        seconds["total"] = cfg.stats.total_seconds + seconds["mermaid"]
+        for phase in SUITE_PHASES:
+            best[phase] = min(best[phase], seconds[phase])
+    sizes = {"instructions": cfg.stats.instructions, "blocks": cfg.stats.blocks,
+             "edges": cfg.stats.edges, "mermaid_chars": len(mermaid)}
+    return best, sizes
+
+
+def run_suite(scale: float = 1.0, repeat: int = 3) -> dict:
+    """Run every suite case and return the results (the JSON document)."""
+    results = {
+        "format": SUITE_FORMAT,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": scale,
+        "calibration": calibration_time(),
+        "cases": {},
+    }
+    for name, generate, size in SUITE_CASES:
+        n = max(1, int(size * scale))
+        seconds, sizes = phase_times(generate(n), repeat)
+        results["cases"][name] = {"size": n, **sizes, "seconds": seconds}
+    return results
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float,
+                        min_seconds: float = 0.005) -> List[str]:
+    """Regressions of results against a baseline, as messages (empty if none).
+
+    A phase regresses when its calibrated time (seconds / calibration) is
+    more than threshold times the baseline's. Phases faster than min_seconds
+    in the baseline are too noisy to judge. Output sizes must match exactly:
+    a change there is a change of the generated code, not of its speed.
+    """
+    if baseline.get("format") != SUITE_FORMAT or baseline.get("scale") != results["scale"]:
+        return [f"baseline is not comparable (format {baseline.get('format')}, scale {baseline.get('scale')})"]
+    failures = []
+    speed = results["calibration"] / baseline["calibration"]
+    for name, case in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        for key in ("size", "instructions", "blocks", "edges", "mermaid_chars"):
+            if case[key] != base[key]:
+                failures.append(f"{name}: {key} is {case[key]}, baseline {base[key]}")
+        for phase in SUITE_PHASES:
+            before = base["seconds"][phase]
+            if before < min_seconds:
+                continue
+            ratio = case["seconds"][phase] / (before * speed)
+            if ratio > threshold:
+                failures.append(f"{name}: {phase} is {ratio:.2f}x the baseline (limit {threshold:.2f}x)")
+    return failures
+
+
+def bench_suite(json_path: Optional[str] = None, baseline_path: Optional[str] = None,
+                threshold: float = 1.5, scale: float = 1.0, save_baseline: Optional[str] = None) -> bool:
+    """Regression suite: per-phase timings of stress-shaped programs.
+
+    Returns:
+        False if a regression against the baseline was found
+    """
+    print("=" * 70)
+    print(f"Regression suite (scale {scale})")
+    print("=" * 70)
+
+    results = run_suite(scale)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    speed = results["calibration"] / baseline["calibration"] if baseline else 1.0
+
+    header = f"{'case':<14}{'size':>8}{'instrs':>9}{'blocks':>8}"
+    header += "".join(f"{phase:>10}" for phase in SUITE_PHASES)
+    print(header + ("   vs. baseline (total)" if baseline else ""))
+    for name, case in results["cases"].items():
+        line = f"{name:<14}{case['size']:>8}{case['instructions']:>9}{case['blocks']:>8}"
+        line += "".join(f"{case['seconds'][phase] * 1e3:>8.1f}ms" for phase in SUITE_PHASES)
+        base = baseline["cases"].get(name) if baseline else None
+        if base is not None:
+            line += f"{case['seconds']['total'] / (base['seconds']['total'] * speed):>12.2f}x"
+        print(line)
+    print(f"calibration {results['calibration'] * 1e3:.1f} ms"
+          + (f" (baseline {baseline['calibration'] * 1e3:.1f} ms)" if baseline else ""))
+
+    for path in (json_path, save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+            print(f"results written to {path}")
+
+    failures = compare_to_baseline(results, baseline, threshold) if baseline else []
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if baseline:
+        print(f"{len(failures)} regressions (threshold {threshold:.2f}x)")
+    print()
+    return not failures
+
+
+def check_streaming():
+    """The streaming writers print the materialised CFG's text and Mermaid; the label index stays small."""
+    for name, program in main_programs() + [("main_mix", main_mix(200)), ("nested_if", nested_if(50))]:
+        cfg = CFGGenerator().generate_cfg(program)
+        text, mermaid = StringIO(), StringIO()
+        write_bb_ir(CFGGenerator().iter_blocks(program, chunk_size=7), text)
+        write_mermaid(CFGGenerator().iter_blocks(program, chunk_size=7), mermaid)
+        assert text.getvalue() == str(cfg) + "\n", name
+        # Edges follow their block's nodes
+        lines = ["flowchart TD"]
+        for block in cfg.blocks:
+            lines += mermaid_node_lines(block) + mermaid_edge_lines(block, cfg.jump_target(block))
+        lines += mermaid_style_lines(cfg.entry_block.id)
+        assert mermaid.getvalue() == "\n".join(lines), name
+        assert sorted(filter(None, lines)) == sorted(filter(None, cfg.to_mermaid().split("\n"))), name
+
+    # Labels are forgotten once their jump is wired: the index does not grow with the program
+    instructions = [IRLabel("LABEL_entry")] + CFGGenerator(iterative=True).process_statement_iterative(main_mix(2_000))
+    builder = BlockBuilder(streaming=True, single_use_labels=True)
+    largest = 0
+    for _ in builder.stream(instructions, chunk_size=64):
+        largest = max(largest, len(builder.label_map) + len(builder.label_to_block) + len(builder.released_labels))
+    assert builder.bb_counter > 1_000 and largest < 50, largest
+
+
+def bench_streaming():
+    """Streaming pipeline (iter_blocks + writers) vs. generate_cfg."""
+    print("=" * 70)
+    print("Streaming pipeline vs. materialised CFG")
+    print("=" * 70)
+
+    def materialised(program, writer):
+        out = NullWriter()
+        cfg = CFGGenerator(iterative=True).generate_cfg(program)
+        writer(cfg.blocks, out)
+        return out
+
+    def streamed(program, writer):
+        out = NullWriter()
+        writer(CFGGenerator().iter_blocks(program), out)
+        return out
+
+    print(f"{'statements':>10}  {'writer':<8}{'pipeline':<14}{'time':>9}{'first out':>11}{'peak MB':>10}")
+    for n in (10_000, 100_000):
+        program = main_mix(n)
+        for writer_name, writer in [("text", write_bb_ir), ("mermaid", write_mermaid)]:
+            for pipeline_name, pipeline in [("materialised", materialised), ("streaming", streamed)]:
+                out = pipeline(program, writer)
+                elapsed = time.perf_counter() - out.start
+                peak = peak_memory(lambda: pipeline(program, writer))
+                print(f"{n:>10}  {writer_name:<8}{pipeline_name:<14}{elapsed:>8.2f}s"
+                      f"{out.first_write * 1e3:>9.1f}ms{peak / 2 ** 20:>10.1f}")
+    print()
+
+
+BENCHMARKS = {
+    "iterative": bench_iterative,
+    "emitter": bench_emitter,
+    "blocks": bench_block_builder,
+    "streaming": bench_streaming,
+    "fanin": bench_fan_in,
+    "export": bench_export,
+    "table": bench_table,
+    "symbols": bench_symbols,
+    "ast": bench_ast,
+    "parser": bench_parser,
+    "batch": bench_batch,
+    "cache": bench_cache,
+    "incremental": bench_incremental,
+    "stats": bench_stats,
+    "binary": bench_binary,
+    "irparser": bench_ir_parser,
+    "dataflow": bench_dataflow,
+    "temps": bench_temps,
+    "constants": bench_constants,
+    "simplify": bench_simplify,
+    "merge": bench_merge,
+    "dominance": bench_dominance,
+    "ssa": bench_ssa,
+    "interpreter": bench_interpreter,
+    "suite": bench_suite,
+}
+
+# Correctness checks at small sizes, by benchmark name (python benchmark.py --check)
+CHECKS = {
+    "iterative": check_iterative,
+    "blocks": check_block_builder,
+    "streaming": check_streaming,
+    "fanin": check_fan_in,
+    "export": check_export,
+    "table": check_table,
+    "symbols": check_symbols,
+    "ast": check_ast,
+    "parser": check_parser,
+    "batch": check_batch,
+    "cache": check_cache,
+    "incremental": check_incremental,
+    "stats": check_stats,
+    "binary": check_binary,
+    "irparser": check_ir_parser,
+    "dataflow": check_dataflow,
+    "temps": check_temps,
+    "constants": check_constants,
+    "simplify": check_simplify,
+    "merge": check_merge,
+    "dominance": check_dominance,
+    "ssa": check_ssa,
+    "interpreter": check_interpreter,
+}
+
+
+def run_checks(names: List[str]) -> bool:
+    """Run the correctness checks of the named benchmarks; False if one failed."""
+    failed = []
+    for name in names:
+        start = time.perf_counter()
+        try:
+            CHECKS[name]()
+        except AssertionError as e:
+            failed.append(name)
+            print(f"{name:<14}FAILED  {e!r}")
+            continue
+        print(f"{name:<14}ok {time.perf_counter() - start:>8.2f}s")
+    print(f"{len(names) - len(failed)} of {len(names)} checks passed")
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the WhileD CFG generator")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--json", metavar="PATH", help="suite: write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="suite: compare against a stored JSON baseline")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="suite: slowdown ratio that counts as a regression (default 1.5)")
+    parser.add_argument("--scale", type=float, default=1.0, help="suite: program size factor (default 1.0)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="suite: store the results as the new baseline")
+    parser.add_argument("--check", action="store_true",
+                        help="run the correctness checks of the benchmarks (small sizes, no timing)")
+    args = parser.parse_args()
+
+    if args.check:
+        names = args.names or list(CHECKS)
+        unknown = [name for name in names if name not in CHECKS]
+        if unknown:
+            print(f"No check for: {', '.join(unknown)} (available: {', '.join(CHECKS)})")
+            sys.exit(1)
+        sys.exit(0 if run_checks(names) else 1)
+
+    ok = True
+    for name in args.names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        if name == "suite":
+            ok = bench_suite(args.json, args.baseline, args.threshold, args.scale, args.save_baseline) and ok
+        else:
+            BENCHMARKS[name]()
+    sys.exit(0 if ok else 1)
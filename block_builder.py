@@ -0,0 +1,243 @@
+"""
+Single-Pass Basic Block Builder
+
+This module builds the basic block graph from linear IR in one pass:
+1. LABEL_ labels are renamed to BB_ labels (in order of appearance)
+2. Basic blocks are opened at every label and after every jump
+3. Edges are wired as blocks are closed; jumps to labels that have not been
+   seen yet are recorded in a pending-fixup table and patched when the label
+   appears
+
+The result is the same as CFGGenerator._convert_labels_to_bb followed by
+CFGGenerator.build_cfg, for IR where every label is a jump target or starts
+the program (which is always the case for generate_cfg output).
+
+In streaming mode, finished blocks are handed out as soon as no later
+instruction can change them, so the whole program never has to be in memory.
+"""
+
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from ir_representation import *
+
+
+class BlockBuilder:
+    """Builds basic blocks, BB_ IR and edges from linear IR in a single pass.
+
+    Usage:
+        builder = BlockBuilder()
+        builder.feed(instructions)
+        blocks = builder.finish()
+        builder.bb_instructions   # BB_ version of the IR
+
+    Streaming usage:
+        for block in BlockBuilder(streaming=True).stream(instructions):
+            ...
+
+    Args:
+        streaming: If True, blocks are not accumulated in self.blocks and
+            bb_instructions is discarded as it goes; use stream() to receive
+            the blocks. Blocks are standalone (not in an EdgeStore) in this
+            mode, predecessor lists are not tracked, and backward jump edges
+            point to a stand-in block carrying the target's id and label,
+            because backward references would keep released blocks alive.
+        rename_labels: If False, labels keep their names (for IR whose labels
+            are already BB_ labels, e.g. IR read back from text by ir_parser.py).
+        single_use_labels: Promise that every label is the target of at most
+            one jump (true of CFGGenerator output). In streaming mode a label
+            is then forgotten as soon as its jump has been wired, so the label
+            index stays bounded by the open blocks; ignored otherwise.
+    """
+
+    def __init__(self, streaming: bool = False, rename_labels: bool = True,
+                 single_use_labels: bool = False):
+        self.streaming = streaming
+        self.rename_labels = rename_labels
+        self.forget_labels = streaming and single_use_labels
+        self.blocks: List[BasicBlock] = []
+        self.edges = EdgeStore()    # edges of self.blocks (unused in streaming mode)
+        self.bb_instructions: List[Instruction] = []
+        self.label_map: Dict[str, str] = {}                 # LABEL_ name -> BB_ name (seen labels)
+        self.label_to_block: Dict[str, BasicBlock] = {}     # BB_ name -> block
+        # Forward jumps waiting for their label: LABEL_ name -> [(block, converted jump)]
+        self.pending: Dict[str, List[Tuple[BasicBlock, Instruction]]] = {}
+        self.current: Optional[BasicBlock] = None
+        self.last_block: Optional[BasicBlock] = None
+        self.block_count = 0
+        self.bb_counter = 0
+
+        # Streaming state
+        self.window: Deque[BasicBlock] = deque()    # blocks not yet released, in order
+        self.unresolved: Set[int] = set()           # ids of blocks with a pending jump
+        # Labels of released blocks: BB_ name -> block id
+        self.released_labels: Dict[str, int] = {}
+
+    def build(self, instructions: Iterable[Instruction]) -> Tuple[List[Instruction], List[BasicBlock]]:
+        """Convenience wrapper: feed all instructions and finish.
+
+        Returns:
+            (bb_instructions, blocks)
+        """
+        self.feed(instructions)
+        return (self.bb_instructions, self.finish())
+
+    def stream(self, instructions: Iterable[Instruction], chunk_size: int = 1024) -> Iterator[BasicBlock]:
+        """Consume an instruction stream, yielding blocks in order as soon as they are final.
+
+        A block is final once the next block has been opened (its fall-through
+        edge is known) and its jump target label has been seen. Blocks after a
+        block that is still waiting for a forward jump target are held back to
+        keep the output order, so memory is bounded by the blocks of the
+        innermost unfinished if/while constructs rather than by the program.
+        The label index is bounded the same way only with single_use_labels;
+        otherwise it keeps one entry per label seen.
+        """
+        iterator = iter(instructions)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            self.feed(chunk)
+            self.bb_instructions.clear()
+            yield from self._release(final=False)
+        self.finish()
+        yield from self._release(final=True)
+
+    def feed(self, instructions: Iterable[Instruction]):
+        """Consume linear IR instructions (LABEL_ version)."""
+        bb_instructions = self.bb_instructions
+        for instr in instructions:
+            if isinstance(instr, IRLabel):
+                self._open_label(instr.name)
+
+            elif isinstance(instr, (IRJump, IRCondJump)):
+                block = self.current if self.current is not None else self._open_block()
+
+                # Jumps to labels already seen (backward) are resolved now,
+                # the rest wait in the pending-fixup table
+                target_name = self.label_map.get(instr.label)
+                if isinstance(instr, IRJump):
+                    converted = IRJump(target_name if target_name else instr.label)
+                else:
+                    converted = IRCondJump(instr.cond, target_name if target_name else instr.label)
+
+                if target_name:
+                    self._add_edge(block, self._block_for_label(target_name))
+                    if self.forget_labels:
+                        self._forget_label(instr.label, target_name)
+                else:
+                    self.pending.setdefault(instr.label, []).append((block, converted))
+                    self.unresolved.add(block.id)
+
+                bb_instructions.append(converted)
+                block.set_terminator(converted)
+
+                # The instruction after a jump starts a new block
+                self.current = None
+
+            else:
+                block = self.current if self.current is not None else self._open_block()
+                block.instructions.append(instr)
+                bb_instructions.append(instr)
+
+    def finish(self) -> List[BasicBlock]:
+        """Finish construction and return the blocks.
+
+        Jumps whose label never appeared keep their original label and get no edge.
+        """
+        self.current = None
+        self.unresolved.clear()
+        return self.blocks
+
+    def _open_block(self) -> BasicBlock:
+        """Start a new unlabeled block."""
+        return self._start_block(self._new_block())
+
+    def _open_label(self, name: str):
+        """Handle a label: rename it, start its block and patch pending jumps."""
+        bb_name = self.label_map.get(name)
+        if bb_name is None:
+            if self.rename_labels:
+                self.bb_counter += 1
+                bb_name = f"BB_{self.bb_counter}"
+            else:
+                bb_name = name
+            self.label_map[name] = bb_name
+        self.bb_instructions.append(IRLabel(bb_name))
+
+        block = self._new_block()
+        block.label = bb_name
+        self.label_to_block[bb_name] = block
+
+        # Edges from earlier jumps come before the fall-through edge,
+        # in the same order as build_cfg adds them
+        jumps = self.pending.pop(name, ())
+        for source, jump in jumps:
+            jump.label = bb_name
+            self.unresolved.discard(source.id)
+            # The jump target precedes the fall-through successor
+            source.add_successor(block, first=True, link_back=not self.streaming)
+        if jumps and self.forget_labels:
+            self._forget_label(name, bb_name)
+
+        self._start_block(block)
+
+    def _forget_label(self, name: str, bb_name: str):
+        """Drop a label whose only jump has been wired (single_use_labels)."""
+        del self.label_map[name]
+        self.label_to_block.pop(bb_name, None)
+        self.released_labels.pop(bb_name, None)
+
+    def _new_block(self) -> BasicBlock:
+        """Create the next block, registering it in the edge store."""
+        block = BasicBlock(self.block_count)
+        if not self.streaming:
+            self.edges.add_block(block)
+        return block
+
+    def _start_block(self, block: BasicBlock) -> BasicBlock:
+        """Append a block, wiring the fall-through edge from the previous one."""
+        previous = self.last_block
+        # No terminator or conditional jump: control falls through
+        if previous is not None and not isinstance(previous.terminator, IRJump):
+            self._add_edge(previous, block)
+        if self.streaming:
+            self.window.append(block)
+        else:
+            self.blocks.append(block)
+        self.current = self.last_block = block
+        self.block_count += 1
+        return block
+
+    def _add_edge(self, source: BasicBlock, target: BasicBlock):
+        """Add a control flow edge (successor only in streaming mode)."""
+        source.add_successor(target, link_back=not self.streaming)
+
+    def _block_for_label(self, bb_name: str) -> BasicBlock:
+        """Find the block of a label that has already been seen (backward jump target).
+
+        In streaming mode a lightweight stand-in with the same id and label is
+        returned instead: a real back edge would form a reference cycle through
+        the loop's blocks and keep them alive until the cyclic GC runs.
+        """
+        if not self.streaming:
+            return self.label_to_block[bb_name]
+
+        block = self.label_to_block.get(bb_name)
+        target = BasicBlock(block.id if block is not None else self.released_labels[bb_name])
+        target.label = bb_name
+        return target
+
+    def _release(self, final: bool) -> Iterator[BasicBlock]:
+        """Yield blocks from the front of the window that can no longer change."""
+        window = self.window
+        while window:
+            block = window[0]
+            if not final and (block is self.last_block or block.id in self.unresolved):
+                break
+            window.popleft()
+            if block.label is not None and self.label_to_block.get(block.label) is block:
+                del self.label_to_block[block.label]
+                self.released_labels[block.label] = block.id
+            yield block
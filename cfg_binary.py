@@ -0,0 +1,387 @@
+"""
+Binary Serialisation of Control Flow Graphs
+
+This module stores a ControlFlowGraph in a compact, versioned binary file
+that other tools can load without running the generator:
+1. String table: the interned operand names of a SymbolTable (temporaries
+   and numbered labels are encoded in their ids and take no space)
+2. Instructions: the linear IR and the BB IR as InstructionTable columns
+   (one opcode byte and four int32 operands each)
+3. Blocks: id, label and instruction range of every block; the ranges
+   point into the BB IR when the blocks are laid out as in it (as generated),
+   otherwise into a separate table of block bodies
+4. Edges: successor and predecessor lists in CSR form (offsets + targets),
+   by position in cfg.blocks, in the graph's own order
+
+Phi functions have no opcode: a CFG in SSA form (ssa.construct_ssa) is
+rejected with ValueError and must be written after ssa.destruct_ssa.
+
+A file is written with one write call and loaded with mmap: the sections are
+memoryviews into the mapping, and instruction objects are only built when
+they are read (CFGImage.linear_ir[i], CFGImage.to_cfg(), ...).
+
+File layout (little-endian):
+    header       magic "WCFG", format version, section count, flags, entry block
+    directory    (offset, element count) of every section, in _SECTIONS order
+    sections     each aligned to 8 bytes
+
+Usage:
+    dump(cfg, "program.cfg")
+    with load("program.cfg") as image:
+        print(image.block_count, image.successors(0))
+        cfg = image.to_cfg()
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+from ir_representation import *
+from instruction_table import InstructionTable
+from symbol_table import SymbolTable, NAME, numbered
+
+
+MAGIC = b"WCFG"
+
+# Version of the file layout; load() rejects other versions
+FORMAT_VERSION = 1
+
+# (section name, array typecode), in file order
+_SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ("name_offsets", "i"),      # byte offset of each name in name_data, plus the end
+    ("name_data", "B"),         # UTF-8 names, concatenated
+    *((f"linear_{column}", code) for column, code in
+      (("opcodes", "B"), ("arg0", "i"), ("arg1", "i"), ("arg2", "i"), ("arg3", "i"))),
+    *((f"bb_{column}", code) for column, code in
+      (("opcodes", "B"), ("arg0", "i"), ("arg1", "i"), ("arg2", "i"), ("arg3", "i"))),
+    *((f"body_{column}", code) for column, code in
+      (("opcodes", "B"), ("arg0", "i"), ("arg1", "i"), ("arg2", "i"), ("arg3", "i"))),
+    ("block_ids", "i"),         # BasicBlock.id
+    ("block_labels", "i"),      # label symbol, NO_LABEL if none
+    ("block_starts", "i"),      # range of block i: block_starts[i]..block_starts[i+1]
+                                # (label first if labeled, terminator last if terminated)
+    ("block_terminated", "B"),  # 1 if the block has a terminator
+    ("succ_starts", "i"),       # CSR offsets into succ_targets
+    ("succ_targets", "i"),      # successor block positions
+    ("pred_starts", "i"),       # CSR offsets into pred_sources
+    ("pred_sources", "i"),      # predecessor block positions
+    ("jump_labels", "i"),       # label_to_block keys (label symbols)
+    ("jump_blocks", "i"),       # label_to_block values (block positions)
+)
+
+_HEADER = struct.Struct("<4sHHIi")
+_DIRECTORY_ENTRY = struct.Struct("<QQ")
+_ALIGNMENT = 8
+
+# block_labels value of an unlabeled block
+NO_LABEL = -1
+# Entry of an empty graph
+NO_BLOCK = -1
+
+# Header flag: block ranges point into the BB IR (the body sections are empty)
+BODY_IN_BB_IR = 1
+
+_COLUMNS = ("opcodes", "arg0", "arg1", "arg2", "arg3")
+
+
+# =======================
+# Writing
+# =======================
+
+def _column_bytes(values: array) -> bytes:
+    """Little-endian bytes of an array."""
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _laid_out_as(blocks: List[BasicBlock], instructions: List[Instruction]) -> bool:
+    """Check whether the blocks, in order, are exactly the given instructions."""
+    position = 0
+    for block in blocks:
+        if block.label is not None:
+            if position >= len(instructions) or not (isinstance(instructions[position], IRLabel)
+                                                     and instructions[position].name == block.label):
+                return False
+            position += 1
+        for instr in block.instructions:
+            if position >= len(instructions) or instructions[position] is not instr:
+                return False
+            position += 1
+        if block.terminator is not None:
+            if position >= len(instructions) or instructions[position] is not block.terminator:
+                return False
+            position += 1
+    return position == len(instructions)
+
+
+def dumps(cfg: ControlFlowGraph) -> bytes:
+    """Serialise a CFG (blocks, edges, label index, linear and BB IR).
+
+    Blocks are stored in cfg.blocks order and edges by position in that
+    list, so a CFG whose EdgeStore has empty slots (see incremental.py) is
+    stored compacted. cfg.stats is not stored.
+
+    Raises:
+        ValueError: If the CFG is in SSA form (call ssa.destruct_ssa first)
+    """
+    symbols = SymbolTable()
+    linear = InstructionTable(cfg.linear_ir, symbols)
+    bb = InstructionTable(cfg.bb_ir, symbols)
+    body = InstructionTable(symbols=symbols)
+    body_in_bb = _laid_out_as(cfg.blocks, cfg.bb_ir)
+    body_instructions: List[Instruction] = []
+    size = 0
+
+    positions = {block.index: i for i, block in enumerate(cfg.blocks)}
+    edges = cfg.edges
+    columns: Dict[str, array] = {name: array(code) for name, code in _SECTIONS}
+    block_starts, succ_starts, pred_starts = columns["block_starts"], columns["succ_starts"], columns["pred_starts"]
+    block_starts.append(0)
+    succ_starts.append(0)
+    pred_starts.append(0)
+    for block in cfg.blocks:
+        columns["block_ids"].append(block.id)
+        columns["block_labels"].append(symbols.intern(block.label) if block.label is not None else NO_LABEL)
+        size += (block.label is not None) + len(block.instructions) + (block.terminator is not None)
+        if not body_in_bb:
+            if block.label is not None:
+                body_instructions.append(IRLabel(block.label))
+            body_instructions += block.instructions
+            if block.terminator is not None:
+                body_instructions.append(block.terminator)
+        block_starts.append(size)
+        columns["block_terminated"].append(block.terminator is not None)
+        columns["succ_targets"].extend(positions[dst] for dst in edges.succ[block.index])
+        succ_starts.append(len(columns["succ_targets"]))
+        columns["pred_sources"].extend(positions[src] for src in edges.pred[block.index])
+        pred_starts.append(len(columns["pred_sources"]))
+
+    for label, block in cfg.label_to_block.items():
+        if block.index in positions and block.graph is edges:
+            columns["jump_labels"].append(symbols.intern(label))
+            columns["jump_blocks"].append(positions[block.index])
+
+    body.extend(body_instructions)
+    for prefix, table in (("linear", linear), ("bb", bb), ("body", body)):
+        for column in _COLUMNS:
+            columns[f"{prefix}_{column}"] = getattr(table, column)
+
+    # The string table last: every operand and label is interned by now
+    encoded = [name.encode("utf-8") for name in symbols.names]
+    offsets = columns["name_offsets"]
+    offsets.append(0)
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    name_data = b"".join(encoded)
+
+    entry = positions.get(cfg.entry_block.index, NO_BLOCK) if cfg.entry_block is not None else NO_BLOCK
+    flags = BODY_IN_BB_IR if body_in_bb else 0
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(_SECTIONS), flags, entry)]
+    offset = _HEADER.size + _DIRECTORY_ENTRY.size * len(_SECTIONS)
+    directory, payload = [], []
+    for name, _ in _SECTIONS:
+        data = name_data if name == "name_data" else _column_bytes(columns[name])
+        padding = -offset % _ALIGNMENT
+        payload.append(bytes(padding))
+        offset += padding
+        count = len(data) if name == "name_data" else len(columns[name])
+        directory.append(_DIRECTORY_ENTRY.pack(offset, count))
+        payload.append(data)
+        offset += len(data)
+    return b"".join(parts + directory + payload)
+
+
+def dump(cfg: ControlFlowGraph, path: str):
+    """Write a CFG to a file (one write call)."""
+    data = dumps(cfg)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+# =======================
+# Loading
+# =======================
+
+class CFGImage:
+    """A serialised CFG, read in place from a buffer (bytes or an mmap).
+
+    Nothing is decoded up front except the string table: the instruction
+    tables are InstructionTables over memoryviews of the buffer, and blocks
+    and edges are read from their sections on request. to_cfg() builds the
+    full ControlFlowGraph.
+
+    Close the image (or use it as a context manager) to release the mapping;
+    tables taken from it cannot be read afterwards.
+
+    Raises:
+        ValueError: If the buffer is not a CFG file of this format version
+    """
+
+    def __init__(self, buffer, mapping: Optional[mmap.mmap] = None):
+        self._mapping = mapping
+        self._views: List[memoryview] = []
+        base = self._view(memoryview(buffer))
+        if len(base) < _HEADER.size:
+            raise ValueError("not a CFG file: too short")
+        magic, version, section_count, flags, entry = _HEADER.unpack_from(base)
+        if magic != MAGIC:
+            raise ValueError("not a CFG file: bad magic")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported CFG format version {version} (expected {FORMAT_VERSION})")
+        if section_count != len(_SECTIONS) or len(base) < _HEADER.size + _DIRECTORY_ENTRY.size * section_count:
+            raise ValueError("corrupt CFG file: bad section directory")
+
+        sections: Dict[str, Sequence[int]] = {}
+        for i, (name, code) in enumerate(_SECTIONS):
+            offset, count = _DIRECTORY_ENTRY.unpack_from(base, _HEADER.size + _DIRECTORY_ENTRY.size * i)
+            size = count * array(code).itemsize
+            if offset + size > len(base):
+                raise ValueError(f"corrupt CFG file: section {name} out of bounds")
+            sections[name] = self._column(base[offset:offset + size], code)
+        self._sections = sections
+        self.flags = flags
+        self.entry = entry
+
+        offsets, data = sections["name_offsets"], sections["name_data"]
+        symbols = self.symbols = SymbolTable()
+        symbols.names = [bytes(data[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(len(offsets) - 1)]
+        symbols.ids = {name: numbered(NAME, i) for i, name in enumerate(symbols.names)}
+
+        self.linear_ir = self._table("linear")
+        self.bb_ir = self._table("bb")
+        # Table the block ranges point into
+        self.body = self.bb_ir if flags & BODY_IN_BB_IR else self._table("body")
+
+    def _view(self, view: memoryview) -> memoryview:
+        """Track a memoryview so that close() can release it."""
+        self._views.append(view)
+        return view
+
+    def _column(self, raw: memoryview, code: str) -> Sequence[int]:
+        """A section as a sequence of ints (a view where possible, else a copy)."""
+        self._view(raw)
+        if code == "B":
+            return raw
+        if sys.byteorder == "big":
+            values = array(code, raw)
+            values.byteswap()
+            return values
+        return self._view(raw.cast(code))
+
+    def _table(self, prefix: str) -> InstructionTable:
+        columns = self._sections
+        return InstructionTable.from_buffers(*(columns[f"{prefix}_{column}"] for column in _COLUMNS),
+                                             symbols=self.symbols)
+
+    # ==================
+    # Lazy Access
+    # ==================
+
+    @property
+    def block_count(self) -> int:
+        return len(self._sections["block_ids"])
+
+    def block_range(self, position: int) -> Tuple[int, int]:
+        """Range of self.body holding the block (label first, terminator last)."""
+        starts = self._sections["block_starts"]
+        return starts[position], starts[position + 1]
+
+    def block(self, position: int) -> BasicBlock:
+        """Standalone copy of one block (instructions and label, no edges)."""
+        sections = self._sections
+        block = BasicBlock(sections["block_ids"][position])
+        label = sections["block_labels"][position]
+        if label != NO_LABEL:
+            block.label = self.symbols.name(label)
+        start, end = self.block_range(position)
+        body = self.body
+        block.instructions = [body[i] for i in range(start + (label != NO_LABEL), end)]
+        if sections["block_terminated"][position]:
+            block.terminator = block.instructions.pop()
+        return block
+
+    def successors(self, position: int) -> List[int]:
+        """Positions of a block's successors (jump target first)."""
+        starts = self._sections["succ_starts"]
+        return self._sections["succ_targets"][starts[position]:starts[position + 1]].tolist()
+
+    def predecessors(self, position: int) -> List[int]:
+        """Positions of a block's predecessors, in insertion order."""
+        starts = self._sections["pred_starts"]
+        return self._sections["pred_sources"][starts[position]:starts[position + 1]].tolist()
+
+    # ==================
+    # Full Load
+    # ==================
+
+    def to_cfg(self) -> ControlFlowGraph:
+        """Build the ControlFlowGraph (all blocks, edges and both IR lists)."""
+        sections = self._sections
+        name = self.symbols.name
+        bb_ir = self.bb_ir.to_list()
+        # Blocks laid out as the BB IR share its instruction objects, as generated
+        body = bb_ir if self.body is self.bb_ir else self.body.to_list()
+        starts = sections["block_starts"].tolist()
+        terminated = sections["block_terminated"]
+
+        edges = EdgeStore()
+        blocks = []
+        for position, (block_id, label) in enumerate(zip(sections["block_ids"], sections["block_labels"])):
+            block = BasicBlock(block_id)
+            start = starts[position]
+            if label != NO_LABEL:
+                block.label = name(label)
+                start += 1
+            block.instructions = body[start:starts[position + 1]]
+            if terminated[position]:
+                block.terminator = block.instructions.pop()
+            edges.add_block(block)
+            blocks.append(block)
+
+        succ_starts, targets = sections["succ_starts"].tolist(), sections["succ_targets"].tolist()
+        pred_starts, sources = sections["pred_starts"].tolist(), sections["pred_sources"].tolist()
+        edges.succ = [targets[succ_starts[i]:succ_starts[i + 1]] for i in range(len(blocks))]
+        edges.pred = [dict.fromkeys(sources[pred_starts[i]:pred_starts[i + 1]]) for i in range(len(blocks))]
+
+        label_to_block = {name(label): blocks[position]
+                          for label, position in zip(sections["jump_labels"], sections["jump_blocks"])}
+        cfg = ControlFlowGraph(blocks, edges, label_to_block)
+        cfg.entry_block = blocks[self.entry] if self.entry != NO_BLOCK else None
+        cfg.linear_ir = self.linear_ir.to_list(like=(self.bb_ir, bb_ir))
+        cfg.bb_ir = bb_ir
+        return cfg
+
+    def close(self):
+        """Release the buffer (and unmap the file, if loaded with load())."""
+        self._sections = {}
+        self.linear_ir = self.bb_ir = self.body = None
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self) -> 'CFGImage':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"CFGImage({self.block_count} blocks, {len(self.linear_ir)} instrs)"
+
+
+def loads(data: bytes) -> CFGImage:
+    """Read a serialised CFG from bytes (sections are views into data)."""
+    return CFGImage(data)
+
+
+def load(path: str) -> CFGImage:
+    """Map a CFG file into memory and read it in place."""
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return CFGImage(mapping, mapping)
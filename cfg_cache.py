@@ -0,0 +1,373 @@
+"""
+Content-Addressed Cache for Generated CFG Artifacts
+
+This module keeps the results of CFG generation on disk between runs:
+1. Key: SHA-256 of a canonical serialisation of the AST plus the generator
+   version and the generator options that change the output, so an
+   unchanged program maps to the same entry in every process
+2. Value: the linear IR, BB IR and Mermaid text (everything the Markdown
+   reports need, so a hit skips lowering entirely)
+3. Size bound: least recently used entries are evicted once the cache grows
+   past max_bytes
+4. Atomic writes: entries are written to a temporary file and renamed into
+   place, so concurrent workers never read a partial entry
+
+Usage:
+    cache = CFGCache(".cfg_cache")
+    artifacts = cache.get_or_build(program)     # generates on a miss
+    reuse = CFGCache(".cfg_cache", options={"reuse_temps": True})    # separate entries
+    print(artifacts.mermaid, cache.stats)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from ast_definition import *
+from ir_representation import *
+from cfg_generator import CFGGenerator, GENERATOR_VERSION, OUTPUT_OPTIONS
+
+
+DEFAULT_CACHE_DIR = ".cfg_cache"
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+
+# Layout of an entry file; part of the key, so a change invalidates old entries
+CACHE_FORMAT = 1
+
+# Eviction removes entries until the cache is below this fraction of max_bytes,
+# so that a full cache is not rescanned on every write
+_LOW_WATER = 0.9
+
+# Temporary files older than this (seconds) were left by a crashed writer
+_STALE_TEMP_AGE = 3600
+
+_TEMP_PREFIX = ".tmp-"
+_ENTRY_SUFFIX = ".json"
+
+# Artifact fields of an entry and their JSON types; an entry missing one is damaged
+_ENTRY_FIELDS = {"linear_ir": str, "bb_ir": str, "mermaid": str, "instructions": int, "blocks": int}
+
+
+# =======================
+# Canonical AST Digest
+# =======================
+
+# Per node type: (type name, plain value fields, sub-node fields in reverse order)
+_LAYOUTS: Dict[type, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {}
+
+
+def _layout(cls: type) -> Tuple[str, Tuple[str, ...], Tuple[str, ...]]:
+    """Serialisation layout of a node type, from its field annotations."""
+    layout = _LAYOUTS.get(cls)
+    if layout is None:
+        fields = cls.__match_args__
+        values = tuple(f for f in fields if cls.__dataclass_fields__[f].type in (int, str))
+        nodes = tuple(reversed([f for f in fields if f not in values]))
+        layout = _LAYOUTS[cls] = (cls.__name__, values, nodes)
+    return layout
+
+
+def ast_digest(root: Node) -> str:
+    """SHA-256 (hex) of a canonical serialisation of an AST.
+
+    Node._hash cannot be used as a cache key: string hashing is randomised
+    per process. The serialisation lists the tree in pre-order: each node
+    contributes its type name and the repr of its plain fields (so 1 and
+    "1" differ), then its sub-nodes follow. Every node type has a fixed
+    number of fields, so the token sequence determines the tree. Shared
+    (hash-consed) subtrees are serialised at every use, as the lowering
+    visits them. The walk uses an explicit stack, so deep trees work.
+    """
+    digest = hashlib.sha256()
+    parts: List[str] = []
+    add = parts.append
+    stack: List[Node] = [root]
+    pop, push = stack.pop, stack.append
+    layouts = _LAYOUTS
+    while stack:
+        node = pop()
+        name, values, nodes = layouts.get(type(node)) or _layout(type(node))
+        add(name)
+        for field_name in values:
+            add(repr(getattr(node, field_name)))
+        for field_name in nodes:
+            push(getattr(node, field_name))
+        if len(parts) >= 65536:
+            # repr never contains a raw NUL, so it separates tokens unambiguously
+            digest.update("\0".join(parts).encode())
+            digest.update(b"\0")
+            parts.clear()
+    digest.update("\0".join(parts).encode())
+    return digest.hexdigest()
+
+
+def output_options(options: Optional[Mapping[str, object]]) -> Dict[str, object]:
+    """CFGGenerator options that change the output and differ from their defaults.
+
+    Raises:
+        ValueError: For an option that is not in OUTPUT_OPTIONS
+    """
+    unknown = sorted(set(options or ()) - set(OUTPUT_OPTIONS))
+    if unknown:
+        raise ValueError(f"Unknown generator options: {', '.join(unknown)}")
+    return {name: value for name, value in sorted((options or {}).items()) if value != OUTPUT_OPTIONS[name]}
+
+
+def cache_key(program: Node, version: str = GENERATOR_VERSION,
+              options: Optional[Mapping[str, object]] = None) -> str:
+    """Cache key of a program: digest of its AST, the generator version and options, and the entry format."""
+    prefix = f"{CACHE_FORMAT}:{version}:"
+    changed = output_options(options)
+    if changed:
+        prefix += json.dumps(changed, sort_keys=True) + ":"
+    return hashlib.sha256(prefix.encode() + ast_digest(program).encode()).hexdigest()
+
+
+# =======================
+# Cached Artifacts
+# =======================
+
+def ir_listing(instructions: Iterable[Instruction]) -> str:
+    """IR as printed in the Markdown reports: labels flush left, other instructions indented."""
+    return "".join(f"{instr.name}:\n" if isinstance(instr, IRLabel) else f"    {instr}\n"
+                   for instr in instructions)
+
+
+@dataclass
+class CFGArtifacts:
+    """Text outputs of one CFG generation."""
+    linear_ir: str    # ir_listing of the linear IR (LABEL_ names)
+    bb_ir: str        # ir_listing of the BB IR (BB_ names)
+    mermaid: str      # ControlFlowGraph.to_mermaid()
+    instructions: int = 0   # length of the linear IR
+    blocks: int = 0         # number of basic blocks
+
+    @classmethod
+    def from_cfg(cls, cfg: ControlFlowGraph) -> 'CFGArtifacts':
+        return cls(ir_listing(cfg.linear_ir), ir_listing(cfg.bb_ir), cfg.to_mermaid(),
+                   len(cfg.linear_ir), len(cfg.blocks))
+
+
+@dataclass
+class CacheStats:
+    """Counters of one CFGCache instance (not shared between processes)."""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    errors: int = 0       # unreadable or mismatching entries (treated as misses)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), "
+                f"{self.writes} writes, {self.evictions} evictions, {self.errors} errors")
+
+
+# =======================
+# Cache
+# =======================
+
+class CFGCache:
+    """On-disk cache of CFGArtifacts, keyed by cache_key.
+
+    Entries are JSON files in two-character shard directories
+    (directory/ab/abcd....json). A hit refreshes the entry's modification
+    time, which is the recency used for eviction. Several processes may use
+    the same directory at once: writes are atomic renames, readers treat a
+    vanished or damaged entry as a miss, and evictors ignore files another
+    process already removed.
+
+    Args:
+        directory: Cache directory (created on first write)
+        max_bytes: Size bound for all entries together
+        version: Generator version mixed into every key
+        options: CFGGenerator options that change the output (see
+            OUTPUT_OPTIONS), used by get_or_build and mixed into every key
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 version: str = GENERATOR_VERSION, options: Optional[Mapping[str, object]] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self.options = output_options(options)
+        self.stats = CacheStats()
+        # Estimated total size of the entries; None until the first write scans the directory
+        self._size: Optional[int] = None
+
+    def key(self, program: Node) -> str:
+        """Cache key of a program under this cache's generator version and options."""
+        return cache_key(program, self.version, self.options)
+
+    def path(self, key: str) -> str:
+        """Entry file of a key."""
+        return os.path.join(self.directory, key[:2], key + _ENTRY_SUFFIX)
+
+    # ==================
+    # Lookup and Store
+    # ==================
+
+    def get(self, key: str) -> Optional[CFGArtifacts]:
+        """Artifacts stored under key, or None (counted as a hit or a miss)."""
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        except (OSError, ValueError):
+            self.stats.errors += 1
+            self.stats.misses += 1
+            return None
+
+        if (not isinstance(entry, dict) or entry.get("key") != key or entry.get("version") != self.version
+                or not all(isinstance(entry.get(name), kind) for name, kind in _ENTRY_FIELDS.items())):
+            self.stats.errors += 1
+            self.stats.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.hits += 1
+        return CFGArtifacts(entry["linear_ir"], entry["bb_ir"], entry["mermaid"],
+                            entry["instructions"], entry["blocks"])
+
+    def put(self, key: str, artifacts: CFGArtifacts):
+        """Store artifacts under key, evicting old entries if the cache is over its bound."""
+        path = self.path(key)
+        shard = os.path.dirname(path)
+        os.makedirs(shard, exist_ok=True)
+        data = json.dumps({
+            "key": key,
+            "version": self.version,
+            "linear_ir": artifacts.linear_ir,
+            "bb_ir": artifacts.bb_ir,
+            "mermaid": artifacts.mermaid,
+            "instructions": artifacts.instructions,
+            "blocks": artifacts.blocks,
+        }, ensure_ascii=False).encode("utf-8")
+
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        # Write next to the target and rename: readers see the old entry, no
+        # entry, or the complete new one
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=shard)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self.stats.writes += 1
+
+        if self._size is None:
+            self._size = self.size_bytes()
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def get_or_build(self, program: Com) -> CFGArtifacts:
+        """Cached artifacts of a program, generating and storing them on a miss.
+
+        A miss runs CFGGenerator(iterative=True) with this cache's options,
+        so the entry always matches its key.
+        """
+        key = self.key(program)
+        artifacts = self.get(key)
+        if artifacts is None:
+            generator = CFGGenerator(iterative=True, **self.options)
+            artifacts = CFGArtifacts.from_cfg(generator.generate_cfg(program))
+            self.put(key, artifacts)
+        return artifacts
+
+    # ==================
+    # Size Management
+    # ==================
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """(modification time, size, path) of every entry, oldest first.
+
+        Temporary files of crashed writers are removed along the way.
+        """
+        found = []
+        now = time.time()
+        try:
+            shards = os.listdir(self.directory)
+        except FileNotFoundError:
+            return found
+        for shard in shards:
+            shard_dir = os.path.join(self.directory, shard)
+            try:
+                names = os.listdir(shard_dir)
+            except (NotADirectoryError, FileNotFoundError):
+                continue
+            for name in names:
+                path = os.path.join(shard_dir, name)
+                try:
+                    st = os.stat(path)
+                    if name.startswith(_TEMP_PREFIX):
+                        if now - st.st_mtime > _STALE_TEMP_AGE:
+                            os.unlink(path)
+                    elif name.endswith(_ENTRY_SUFFIX):
+                        found.append((st.st_mtime, st.st_size, path))
+                except FileNotFoundError:
+                    continue
+        found.sort()
+        return found
+
+    def size_bytes(self) -> int:
+        """Total size of all entries."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache is below its bound.
+
+        Returns:
+            Number of entries this call removed
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _LOW_WATER if total > self.max_bytes else total
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass    # evicted by another process
+            total -= size
+        self._size = total
+        self.stats.evictions += removed
+        return removed
+
+    def clear(self):
+        """Remove every entry."""
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+    def __repr__(self):
+        return (f"CFGCache({self.directory!r}, max_bytes={self.max_bytes}, version={self.version!r}, "
+                f"options={self.options!r})")
@@ -8,17 +8,163 @@ This module implements the core transformation logic:
 4. Basic block construction from linear IR
 """
 
-from typing import List, Tuple, Dict, Optional
+import gc
+import sys
+import time
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import chain
+from typing import Callable, List, Tuple, Dict, Iterator, Optional
 from ast_definition import *
 from ir_representation import *
+from block_builder import BlockBuilder
+from instruction_table import InstructionTable
+
+
+# Version of the generated output (IR and Mermaid text). Bump it whenever a
+# change alters the output for some program: it is part of the cfg_cache keys.
+GENERATOR_VERSION = "2"
+
+# CFGGenerator options that change the output, with their defaults: the
+# cfg_cache keys include those set to another value (iterative lowering and
+# collect_stats give the same output)
+OUTPUT_OPTIONS: Dict[str, object] = {"reuse_temps": False}
+
+
+# Task kinds for the iterative lowering worklist (see CFGGenerator._run_worklist)
+_STMT = 0                 # (_STMT, stmt)
+_EXPR = 1                 # (_EXPR, expr, dest)
+_BINOP = 2                # (_BINOP, op, dest)                        pops right, left
+_BINOP_SIMPLE_RIGHT = 3   # (_BINOP_SIMPLE_RIGHT, op, dest, right_var) pops left
+_COND_JUMP = 4            # (_COND_JUMP, label)                       pops the condition variable
+_EMIT_TWO = 5             # (_EMIT_TWO, instr1, instr2)
+_EMIT = 6                 # (_EMIT, instr)
+_UNOP = 7                 # (_UNOP, op, dest)                         pops operand
+_DEREF = 8                # (_DEREF, dest)                            pops address
+_ADDROF = 9               # (_ADDROF, dest)                           pops inner operand
+_STORE = 10               # (_STORE,)                                 pops value, address
+_AND_LEFT = 11            # (_AND_LEFT, result, false_label, end_label, right)
+_AND_RIGHT = 12           # (_AND_RIGHT, result, false_label, end_label, left_var)
+_OR_LEFT = 13             # (_OR_LEFT, result, false_label, end_label, right)
+_OR_RIGHT = 14            # (_OR_RIGHT, result, end_label)
+_BINOP_SWAPPED = 15       # (_BINOP_SWAPPED, op, dest)                pops left, right (reuse_temps only)
+
+_STORE_TASK = (_STORE,)
+_SIMPLE_OPERANDS = (EVar, EConst)
+
+
+# =======================
+# Generation Statistics
+# =======================
+
+@dataclass
+class PhaseStats:
+    """Cost of one generate_cfg phase."""
+    name: str
+    seconds: float = 0.0          # wall-clock time
+    allocated_blocks: int = 0     # net change in allocated memory blocks (sys.getallocatedblocks)
+    gc_collections: int = 0       # garbage collector runs during the phase (all generations)
+
+
+@dataclass
+class GenerationStats:
+    """Per-phase costs and output sizes of one generate_cfg call.
+    
+    Attached to the returned ControlFlowGraph as cfg.stats when the
+    generator was created with collect_stats=True.
+    
+    Phases:
+        lower: Phase 1, AST -> linear IR (including the entry label)
+        blocks: Phases 2 and 3, LABEL_ -> BB_ renaming, blocks and edges
+            (one pass in BlockBuilder)
+    """
+    phases: List[PhaseStats] = field(default_factory=list)
+    temps: int = 0
+    labels: int = 0
+    instructions: int = 0
+    blocks: int = 0
+    edges: int = 0
+    
+    def measure(self, name: str, func: Callable, *args):
+        """Run func(*args) as the phase called name and return its result."""
+        collections = _gc_collections()
+        allocated = sys.getallocatedblocks()
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        self.phases.append(PhaseStats(name, seconds, sys.getallocatedblocks() - allocated,
+                                      _gc_collections() - collections))
+        return result
+    
+    def phase(self, name: str) -> Optional[PhaseStats]:
+        """Statistics of the phase with the given name (None if not recorded)."""
+        return next((phase for phase in self.phases if phase.name == name), None)
+    
+    @property
+    def total_seconds(self) -> float:
+        return sum(phase.seconds for phase in self.phases)
+    
+    def as_dict(self) -> dict:
+        """Plain dict (JSON-serialisable), e.g. for metrics dashboards."""
+        return {
+            "phases": {phase.name: {"seconds": phase.seconds,
+                                    "allocated_blocks": phase.allocated_blocks,
+                                    "gc_collections": phase.gc_collections}
+                       for phase in self.phases},
+            "total_seconds": self.total_seconds,
+            "temps": self.temps,
+            "labels": self.labels,
+            "instructions": self.instructions,
+            "blocks": self.blocks,
+            "edges": self.edges,
+        }
+    
+    def __str__(self):
+        lines = [f"{phase.name:<8}{phase.seconds * 1e3:>10.3f} ms{phase.allocated_blocks:>12} blocks"
+                 f"{phase.gc_collections:>6} gc" for phase in self.phases]
+        lines.append(f"{'total':<8}{self.total_seconds * 1e3:>10.3f} ms")
+        lines.append(f"{self.instructions} instructions, {self.temps} temps, {self.labels} labels, "
+                     f"{self.blocks} blocks, {self.edges} edges")
+        return "\n".join(lines)
+
+
+def _gc_collections() -> int:
+    """Total number of garbage collector runs so far."""
+    return sum(generation["collections"] for generation in gc.get_stats())
 
 
 class CFGGenerator:
-    """Generates Control Flow Graph from WhileD AST."""
+    """Generates Control Flow Graph from WhileD AST.
+    
+    Args:
+        iterative: If True, Phase 1 uses the explicit-worklist lowering
+            (process_statement_iterative), which never recurses and can
+            handle programs nested millions of levels deep. The generated
+            IR is identical to the recursive lowering.
+        collect_stats: If True, generate_cfg measures each phase and attaches
+            a GenerationStats to the CFG (cfg.stats). Off by default; when
+            off, nothing is measured.
+        reuse_temps: If True, a temporary is handed out again once the
+            instruction reading it has been emitted (lowest free number
+            first), and the operand of a binary operation needing more
+            temporaries is evaluated first (Sethi-Ullman order). Every
+            temporary is dead at the end of its statement, so numbering
+            restarts at #0 for each statement. temp_counter then counts
+            distinct temporaries. Off by default.
+    """
     
-    def __init__(self):
+    def __init__(self, iterative: bool = False, collect_stats: bool = False,
+                 reuse_temps: bool = False):
         self.temp_counter = 0
         self.label_counter = 0
+        self.iterative = iterative
+        self.collect_stats = collect_stats
+        self.reuse_temps = reuse_temps
+        self.free_temps: List[int] = []         # heap of released temporary numbers
+        self._temp_needs: Dict[Expr, int] = {}  # expression -> temporaries it needs
+        # Append-only buffer that all Phase 1 lowering routines emit into
+        # (a list, or an InstructionTable in lower_to_table)
+        self.emitter: List[Instruction] = []
     
     # ==================
     # Helper Functions
@@ -27,12 +173,62 @@ class CFGGenerator:
     def fresh_temp(self) -> str:
         """Generate a new unique temporary variable.
         
-        Returns: "#0", "#1", "#2", etc.
+        Returns: "#0", "#1", "#2", etc. (a released one if reuse_temps is set)
         """
+        if self.free_temps:
+            return f"#{heappop(self.free_temps)}"
         temp = f"#{self.temp_counter}"
         self.temp_counter += 1
         return temp
     
+    def release_temp(self, var: str):
+        """Mark a temporary as dead after its last use (reuse_temps only).
+        
+        Each temporary produced for a subexpression is read by exactly one
+        parent instruction (the left operand of && / || by two), so it is
+        released right after that instruction has been emitted.
+        """
+        if self.reuse_temps and var[0] == "#":
+            heappush(self.free_temps, int(var[1:]))
+    
+    def temp_need(self, expr: Expr) -> int:
+        """Number of temporaries live at once while evaluating an expression.
+        
+        Sethi-Ullman numbering: simple operands need none; an operation needs
+        as many as its hungriest operand, one more if both operands need the
+        same number. Computed without recursion and memoised per node.
+        """
+        needs = self._temp_needs
+        need = needs.get(expr)
+        if need is not None:
+            return need
+        
+        # Post-order walk: a node is computed when popped the second time
+        stack = [(expr, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in needs:
+                continue
+            if isinstance(node, _SIMPLE_OPERANDS):
+                needs[node] = 0
+            elif not expanded:
+                stack.append((node, True))
+                if isinstance(node, EBinop):
+                    stack.append((node.left, False))
+                    stack.append((node.right, False))
+                else:
+                    stack.append((node.expr, False))
+            elif isinstance(node, EBinop):
+                left, right = needs[node.left], needs[node.right]
+                if node.op in ('&&', '||'):
+                    # The left value stays live while the right operand runs
+                    needs[node] = max(left, min(left, 1) + right, 1)
+                else:
+                    needs[node] = max(1, left + 1 if left == right else max(left, right))
+            else:
+                needs[node] = max(1, needs[node.expr])
+        return needs[expr]
+    
     def fresh_label(self) -> str:
         """Generate a new unique label.
         
@@ -48,6 +244,20 @@ class CFGGenerator:
         """
         return isinstance(expr, (EConst, EVar))
     
+    def _capture(self, lower, *args) -> Tuple[List[Instruction], object]:
+        """Run a lowering routine with a fresh emitter buffer.
+        
+        Returns:
+            (instructions, result): Everything the routine emitted, and its return value
+        """
+        saved = self.emitter
+        self.emitter = instructions = []
+        try:
+            result = lower(*args)
+        finally:
+            self.emitter = saved
+        return (instructions, result)
+    
     # ==================
     # Expression Flattener
     # ==================
@@ -63,61 +273,76 @@ class CFGGenerator:
             (instructions, result_variable): The list of IR instructions
             and the variable holding the final result
         """
+        return self._capture(self._lower_expr, expr, dest)
+    
+    def _lower_expr(self, expr: Expr, dest: Optional[str] = None) -> str:
+        """Flatten an expression, appending its instructions to the emitter.
         
+        Returns:
+            The variable holding the final result
+        """
         if isinstance(expr, EConst):
             # Constants can be used directly as operands
-            return ([], str(expr.value))
+            return str(expr.value)
         
         elif isinstance(expr, EVar):
             # Variables can be used directly
-            return ([], expr.name)
+            return expr.name
         
         elif isinstance(expr, EBinop):
             # Handle short-circuit operators specially
             if expr.op in ['&&', '||']:
-                return self.flatten_shortcircuit(expr.op, expr.left, expr.right, dest)
+                return self._lower_shortcircuit(expr.op, expr.left, expr.right, dest)
             
             # Regular binary operation
-            left_instrs, left_var = self.flatten_expr(expr.left)
-            right_instrs, right_var = self.flatten_expr(expr.right)
+            if self.reuse_temps and not isinstance(expr.left, _SIMPLE_OPERANDS) and \
+                    self.temp_need(expr.right) > self.temp_need(expr.left):
+                # Sethi-Ullman order: the hungrier operand first
+                right_var = self._lower_expr(expr.right)
+                left_var = self._lower_expr(expr.left)
+            else:
+                left_var = self._lower_expr(expr.left)
+                right_var = self._lower_expr(expr.right)
+            self.release_temp(left_var)
+            self.release_temp(right_var)
             
             result_var = dest if dest else self.fresh_temp()
-            result_instr = IRBinOp(result_var, left_var, expr.op, right_var)
-            
-            return (left_instrs + right_instrs + [result_instr], result_var)
+            self.emitter.append(IRBinOp(result_var, left_var, expr.op, right_var))
+            return result_var
         
         elif isinstance(expr, EUnop):
             # Unary operation
-            operand_instrs, operand_var = self.flatten_expr(expr.expr)
+            operand_var = self._lower_expr(expr.expr)
+            self.release_temp(operand_var)
             
             result_var = dest if dest else self.fresh_temp()
-            unop_instr = IRUnOp(result_var, expr.op, operand_var)
-            
-            return (operand_instrs + [unop_instr], result_var)
+            self.emitter.append(IRUnOp(result_var, expr.op, operand_var))
+            return result_var
         
         elif isinstance(expr, EDeref):
             # Dereference: *e
-            addr_instrs, addr_var = self.flatten_expr(expr.expr)
+            addr_var = self._lower_expr(expr.expr)
+            self.release_temp(addr_var)
             
             result_var = dest if dest else self.fresh_temp()
-            deref_instr = IRDeref(result_var, addr_var)
-            
-            return (addr_instrs + [deref_instr], result_var)
+            self.emitter.append(IRDeref(result_var, addr_var))
+            return result_var
         
         elif isinstance(expr, EAddrOf):
             # Address-of: &e
             # Note: e should be an L-value (typically EVar)
             if isinstance(expr.expr, EVar):
                 result_var = dest if dest else self.fresh_temp()
-                addrof_instr = IRAddrOf(result_var, expr.expr.name)
-                return ([addrof_instr], result_var)
+                self.emitter.append(IRAddrOf(result_var, expr.expr.name))
+                return result_var
             else:
                 # For more complex expressions, flatten first
                 # (though semantically this might be invalid)
-                inner_instrs, inner_var = self.flatten_expr(expr.expr)
+                inner_var = self._lower_expr(expr.expr)
+                self.release_temp(inner_var)
                 result_var = dest if dest else self.fresh_temp()
-                addrof_instr2 = IRAddrOf(result_var, inner_var)
-                return (inner_instrs + [addrof_instr2], result_var)
+                self.emitter.append(IRAddrOf(result_var, inner_var))
+                return result_var
         
         else:
             raise ValueError(f"Unknown expression type: {type(expr)}")
@@ -149,9 +374,17 @@ class CFGGenerator:
             #t = 1
             END_LABEL:
         """
+        return self._capture(self._lower_shortcircuit, op, left, right, dest)
+    
+    def _lower_shortcircuit(self, op: str, left: Expr, right: Expr, dest: Optional[str] = None) -> str:
+        """Lower && / || (see flatten_shortcircuit), appending to the emitter.
         
-        result_temp = dest if dest else self.fresh_temp()
-        instructions = []
+        Returns:
+            The variable holding the result
+        """
+        # With reuse_temps, the result temporary is taken once the left
+        # operand has been evaluated, so it can reuse the left operand's temporaries
+        result_temp = dest if dest or self.reuse_temps else self.fresh_temp()
         
         if op == '&&':
             # AND: Short-circuit if left is false
@@ -159,29 +392,28 @@ class CFGGenerator:
             end_label = self.fresh_label()
             
             # Evaluate left
-            left_instrs, left_var = self.flatten_expr(left)
-            instructions.extend(left_instrs)
-            
             # Optimization: Use the returned variable directly, no extra assignment needed
-            cond_var = left_var
+            left_var = self._lower_expr(left)
+            if not result_temp:
+                result_temp = self.fresh_temp()
             
             # If left is false, jump to false_label
-            instructions.append(IRCondJump(cond_var, false_label))
+            self.emitter.append(IRCondJump(left_var, false_label))
             
             # Evaluate right (only if left was true)
             # Optimization: Write result directly to result_temp
-            right_instrs, right_var = self.flatten_expr(right, result_temp)
-            instructions.extend(right_instrs)
+            self._lower_right_operand(right, result_temp)
             
             # Jump to end
-            instructions.append(IRJump(end_label))
+            self.emitter.append(IRJump(end_label))
             
             # False label: result is left (which is false)
-            instructions.append(IRLabel(false_label))
-            instructions.append(IRAssign(result_temp, left_var))
+            self.emitter.append(IRLabel(false_label))
+            self.emitter.append(IRAssign(result_temp, left_var))
+            self.release_temp(left_var)
             
             # End label
-            instructions.append(IRLabel(end_label))
+            self.emitter.append(IRLabel(end_label))
         
         elif op == '||':
             # OR: Short-circuit if left is true
@@ -190,29 +422,38 @@ class CFGGenerator:
             end_label = self.fresh_label()
             
             # Evaluate left
-            left_instrs, left_var = self.flatten_expr(left)
-            instructions.extend(left_instrs)
-            
             # Optimization: Use the returned variable directly, no extra assignment needed
-            cond_var = left_var
+            left_var = self._lower_expr(left)
+            if not result_temp:
+                result_temp = self.fresh_temp()
             
             # If left is false, evaluate right
-            instructions.append(IRCondJump(cond_var, false_label))
+            self.emitter.append(IRCondJump(left_var, false_label))
             
             # Left is true: result is left (which is true)
-            instructions.append(IRAssign(result_temp, left_var))
-            instructions.append(IRJump(end_label))
+            self.emitter.append(IRAssign(result_temp, left_var))
+            self.release_temp(left_var)
+            self.emitter.append(IRJump(end_label))
             
             # False label: evaluate right
-            instructions.append(IRLabel(false_label))
+            self.emitter.append(IRLabel(false_label))
             # Optimization: Write result directly to result_temp
-            right_instrs, right_var = self.flatten_expr(right, result_temp)
-            instructions.extend(right_instrs)
+            self._lower_right_operand(right, result_temp)
             
             # End label
-            instructions.append(IRLabel(end_label))
+            self.emitter.append(IRLabel(end_label))
         
-        return (instructions, result_temp)
+        return result_temp
+    
+    def _lower_right_operand(self, right: Expr, result_temp: str):
+        """Evaluate the right operand of && / || into result_temp.
+        
+        A simple operand is not written to the destination by _lower_expr,
+        so it is copied explicitly.
+        """
+        right_var = self._lower_expr(right, result_temp)
+        if right_var != result_temp:
+            self.emitter.append(IRAssign(result_temp, right_var))
     
     # ==================
     # Statement Processor (Phase 1: AST → Linear IR)
@@ -227,66 +468,36 @@ class CFGGenerator:
         Returns:
             List of IR instructions (linear, with labels and jumps)
         """
-        
+        instructions, _ = self._capture(self._lower_statement, stmt)
+        return instructions
+    
+    def _lower_statement(self, stmt: Com):
+        """Process a statement, appending its linear IR to the emitter."""
         if isinstance(stmt, CSkip):
             # Empty statement
-            return []
+            pass
         
         elif isinstance(stmt, CAsgnVar):
             # Variable assignment: x = e
-            expr = stmt.expr
-            
-            # Optimization: Simple expressions generate a single instruction without splitting
-            if isinstance(expr, (EConst, EVar)):
-                # x = 5 or x = y (direct assignment)
-                source = str(expr.value) if isinstance(expr, EConst) else expr.name
-                return [IRAssign(stmt.var, source)]
-            
-            elif isinstance(expr, EUnop) and self.is_simple_operand(expr.expr):
-                # x = -y or x = !flag (simple unary operation)
-                inner = expr.expr
-                operand = str(inner.value) if isinstance(inner, EConst) else (inner.name if isinstance(inner, EVar) else str(inner))
-                return [IRUnOp(stmt.var, expr.op, operand)]
-            
-            elif isinstance(expr, EBinop) and expr.op not in ['&&', '||'] and \
-                 self.is_simple_operand(expr.left) and self.is_simple_operand(expr.right):
-                # x = y + z (simple binary operation, excluding short-circuit operators)
-                left_expr = expr.left
-                right_expr = expr.right
-                left = str(left_expr.value) if isinstance(left_expr, EConst) else (left_expr.name if isinstance(left_expr, EVar) else str(left_expr))
-                right = str(right_expr.value) if isinstance(right_expr, EConst) else (right_expr.name if isinstance(right_expr, EVar) else str(right_expr))
-                return [IRBinOp(stmt.var, left, expr.op, right)]
-            
-            elif isinstance(expr, EDeref) and self.is_simple_operand(expr.expr):
-                # x = *p (simple dereference)
-                inner = expr.expr
-                addr = str(inner.value) if isinstance(inner, EConst) else (inner.name if isinstance(inner, EVar) else str(inner))
-                return [IRDeref(stmt.var, addr)]
-            
-            elif isinstance(expr, EAddrOf) and isinstance(expr.expr, EVar):
-                # x = &y (simple address-of)
-                return [IRAddrOf(stmt.var, expr.expr.name)]
-            
+            simple_instr = self._lower_simple_assignment(stmt)
+            if simple_instr is not None:
+                self.emitter.append(simple_instr)
             else:
                 # Complex expression: write directly to target variable
-                expr_instrs, expr_var = self.flatten_expr(expr, dest=stmt.var)
-                return expr_instrs
+                self._lower_expr(stmt.expr, dest=stmt.var)
         
         elif isinstance(stmt, CAsgnDeref):
             # Pointer assignment: *e1 = e2
-            addr_instrs, addr_var = self.flatten_expr(stmt.addr)
-            value_instrs, value_var = self.flatten_expr(stmt.value)
-            
-            store_instr = IRStoreDeref(addr_var, value_var)
-            
-            return addr_instrs + value_instrs + [store_instr]
+            addr_var = self._lower_expr(stmt.addr)
+            value_var = self._lower_expr(stmt.value)
+            self.emitter.append(IRStoreDeref(addr_var, value_var))
+            self.release_temp(addr_var)
+            self.release_temp(value_var)
         
         elif isinstance(stmt, CSeq):
             # Sequential composition: c1; c2
-            first_instrs = self.process_statement(stmt.first)
-            second_instrs = self.process_statement(stmt.second)
-            
-            return first_instrs + second_instrs
+            self._lower_statement(stmt.first)
+            self._lower_statement(stmt.second)
         
         elif isinstance(stmt, CIf):
             # If-else statement
@@ -302,31 +513,25 @@ class CFGGenerator:
             else_label = self.fresh_label()
             end_label = self.fresh_label()
             
-            instructions = []
-            
             # Condition evaluation
-            cond_instrs, cond_var = self.flatten_expr(stmt.cond)
-            instructions.extend(cond_instrs)
+            cond_var = self._lower_expr(stmt.cond)
             
             # If condition is false, jump to else
-            instructions.append(IRCondJump(cond_var, else_label))
+            self.emitter.append(IRCondJump(cond_var, else_label))
+            self.release_temp(cond_var)
             
             # Then branch
-            then_instrs = self.process_statement(stmt.then_branch)
-            instructions.extend(then_instrs)
+            self._lower_statement(stmt.then_branch)
             
             # Jump to end (skip else)
-            instructions.append(IRJump(end_label))
+            self.emitter.append(IRJump(end_label))
             
             # Else label and branch
-            instructions.append(IRLabel(else_label))
-            else_instrs = self.process_statement(stmt.else_branch)
-            instructions.extend(else_instrs)
+            self.emitter.append(IRLabel(else_label))
+            self._lower_statement(stmt.else_branch)
             
             # End label
-            instructions.append(IRLabel(end_label))
-            
-            return instructions
+            self.emitter.append(IRLabel(end_label))
         
         elif isinstance(stmt, CWhile):
             # While loop
@@ -341,33 +546,396 @@ class CFGGenerator:
             start_label = self.fresh_label()
             end_label = self.fresh_label()
             
-            instructions = []
-            
             # Start label
-            instructions.append(IRLabel(start_label))
+            self.emitter.append(IRLabel(start_label))
             
             # Condition evaluation
-            cond_instrs, cond_var = self.flatten_expr(stmt.cond)
-            instructions.extend(cond_instrs)
+            cond_var = self._lower_expr(stmt.cond)
             
             # If condition is false, exit loop
-            instructions.append(IRCondJump(cond_var, end_label))
+            self.emitter.append(IRCondJump(cond_var, end_label))
+            self.release_temp(cond_var)
             
             # Body
-            body_instrs = self.process_statement(stmt.body)
-            instructions.extend(body_instrs)
+            self._lower_statement(stmt.body)
             
             # Jump back to start
-            instructions.append(IRJump(start_label))
+            self.emitter.append(IRJump(start_label))
             
             # End label
-            instructions.append(IRLabel(end_label))
-            
-            return instructions
+            self.emitter.append(IRLabel(end_label))
         
         else:
             raise ValueError(f"Unknown statement type: {type(stmt)}")
     
+    def _lower_simple_assignment(self, stmt: CAsgnVar) -> Optional[Instruction]:
+        """Lower an assignment whose right-hand side needs no splitting.
+        
+        Optimization: Simple expressions generate a single instruction without splitting.
+        
+        Returns:
+            The single IR instruction, or None if the expression is complex
+        """
+        expr = stmt.expr
+        
+        if isinstance(expr, (EConst, EVar)):
+            # x = 5 or x = y (direct assignment)
+            source = str(expr.value) if isinstance(expr, EConst) else expr.name
+            return IRAssign(stmt.var, source)
+        
+        elif isinstance(expr, EUnop) and self.is_simple_operand(expr.expr):
+            # x = -y or x = !flag (simple unary operation)
+            inner = expr.expr
+            operand = str(inner.value) if isinstance(inner, EConst) else (inner.name if isinstance(inner, EVar) else str(inner))
+            return IRUnOp(stmt.var, expr.op, operand)
+        
+        elif isinstance(expr, EBinop) and expr.op not in ['&&', '||'] and \
+             self.is_simple_operand(expr.left) and self.is_simple_operand(expr.right):
+            # x = y + z (simple binary operation, excluding short-circuit operators)
+            left_expr = expr.left
+            right_expr = expr.right
+            left = str(left_expr.value) if isinstance(left_expr, EConst) else (left_expr.name if isinstance(left_expr, EVar) else str(left_expr))
+            right = str(right_expr.value) if isinstance(right_expr, EConst) else (right_expr.name if isinstance(right_expr, EVar) else str(right_expr))
+            return IRBinOp(stmt.var, left, expr.op, right)
+        
+        elif isinstance(expr, EDeref) and self.is_simple_operand(expr.expr):
+            # x = *p (simple dereference)
+            inner = expr.expr
+            addr = str(inner.value) if isinstance(inner, EConst) else (inner.name if isinstance(inner, EVar) else str(inner))
+            return IRDeref(stmt.var, addr)
+        
+        elif isinstance(expr, EAddrOf) and isinstance(expr.expr, EVar):
+            # x = &y (simple address-of)
+            return IRAddrOf(stmt.var, expr.expr.name)
+        
+        return None
+    
+    # ==================
+    # Iterative Lowering (Phase 1 without recursion)
+    # ==================
+    
+    def flatten_expr_iterative(self, expr: Expr, dest: Optional[str] = None) -> Tuple[List[Instruction], str]:
+        """Flatten an expression using an explicit worklist instead of recursion.
+        
+        Produces exactly the same instructions, temporaries and labels as
+        flatten_expr, but works for arbitrarily deep expressions.
+        
+        Returns:
+            (instructions, result_variable)
+        """
+        instructions, values = self._capture(self._run_worklist, [(_EXPR, expr, dest)])
+        return (instructions, values[-1])
+    
+    def process_statement_iterative(self, stmt: Com) -> List[Instruction]:
+        """Process a statement using an explicit worklist instead of recursion.
+        
+        Produces exactly the same linear IR as process_statement, but works
+        for arbitrarily deep CSeq/CIf/CWhile nesting.
+        """
+        instructions, _ = self._capture(self._run_worklist, [(_STMT, stmt)])
+        return instructions
+    
+    def lower_to_table(self, stmt: Com, table: Optional[InstructionTable] = None) -> InstructionTable:
+        """Phase 1 into a compact InstructionTable instead of a list.
+        
+        The lowering routines emit straight into the table, so the linear IR
+        is never held as one object per instruction. The instructions are the
+        same as process_statement's (recursive or iterative, per self.iterative).
+        
+        Args:
+            stmt: The statement to lower
+            table: Table to append to (a new one if omitted)
+        """
+        if table is None:
+            table = InstructionTable()
+        saved = self.emitter
+        self.emitter = table
+        try:
+            if self.iterative:
+                self._run_worklist([(_STMT, stmt)])
+            else:
+                self._lower_statement(stmt)
+        finally:
+            self.emitter = saved
+        return table
+    
+    def iter_statement(self, stmt: Com, chunk_size: int = 1024) -> Iterator[Instruction]:
+        """Lazily generate the linear IR of a statement.
+        
+        The worklist is run in slices that stop once about chunk_size
+        instructions have been emitted, so only one slice of the program's IR
+        is materialised at a time. Yields the same instructions as
+        process_statement_iterative.
+        """
+        tasks: list = [(_STMT, stmt)]
+        values: List[str] = []
+        while tasks:
+            chunk, _ = self._capture(self._run_worklist, tasks, values, chunk_size)
+            yield from chunk
+    
+    def _run_worklist(self, tasks: list, values: Optional[List[str]] = None,
+                      flush_at: Optional[int] = None) -> List[str]:
+        """Drive the lowering worklist until it is empty, appending to the emitter.
+        
+        Each task is a tuple whose first element is a task kind:
+        - _STMT / _EXPR: lower an AST node (pushes its sub-tasks in reverse order)
+        - the remaining kinds are continuations that run after the operands
+          of a node have been lowered, popping operand variables from the
+          value stack and emitting the node's own instructions
+        
+        Simple operands (EVar/EConst) never get a task of their own: their
+        variable is computed in place, which keeps the worklist short.
+        
+        Fresh temporaries and labels are requested at the same points as in the
+        recursive lowering, so the numbering is identical.
+        
+        Args:
+            tasks: The worklist (consumed in place)
+            values: The value stack to continue from (a new one if None)
+            flush_at: If given, stop before the next statement once the emitter
+                holds at least this many instructions; call again with the same
+                tasks and values to resume
+        
+        Returns:
+            The value stack (result variables of lowered expressions)
+        """
+        instructions = self.emitter
+        if values is None:
+            values = []
+        
+        while tasks:
+            task = tasks.pop()
+            kind = task[0]
+            
+            if kind == _STMT:
+                if flush_at is not None and len(instructions) >= flush_at:
+                    tasks.append(task)
+                    break
+                
+                stmt = task[1]
+                
+                # Walk down the left spine of a CSeq chain without extra tasks
+                while isinstance(stmt, CSeq):
+                    tasks.append((_STMT, stmt.second))
+                    stmt = stmt.first
+                
+                if isinstance(stmt, CAsgnVar):
+                    simple_instr = self._lower_simple_assignment(stmt)
+                    if simple_instr is None:
+                        # Complex expression: lower it right away, writing to the variable.
+                        # The value stack can only hold the unused result of an earlier
+                        # assignment here, so drop it.
+                        values.clear()
+                        kind, task = _EXPR, (_EXPR, stmt.expr, stmt.var)
+                    else:
+                        instructions.append(simple_instr)
+                
+                elif isinstance(stmt, CSkip):
+                    pass
+                
+                elif isinstance(stmt, CIf):
+                    else_label = self.fresh_label()
+                    end_label = self.fresh_label()
+                    tasks.append((_EMIT, IRLabel(end_label)))
+                    tasks.append((_STMT, stmt.else_branch))
+                    tasks.append((_EMIT_TWO, IRJump(end_label), IRLabel(else_label)))
+                    tasks.append((_STMT, stmt.then_branch))
+                    tasks.append((_COND_JUMP, else_label))
+                    kind, task = _EXPR, (_EXPR, stmt.cond, None)
+                
+                elif isinstance(stmt, CWhile):
+                    start_label = self.fresh_label()
+                    end_label = self.fresh_label()
+                    instructions.append(IRLabel(start_label))
+                    tasks.append((_EMIT_TWO, IRJump(start_label), IRLabel(end_label)))
+                    tasks.append((_STMT, stmt.body))
+                    tasks.append((_COND_JUMP, end_label))
+                    kind, task = _EXPR, (_EXPR, stmt.cond, None)
+                
+                elif isinstance(stmt, CAsgnDeref):
+                    tasks.append(_STORE_TASK)
+                    tasks.append((_EXPR, stmt.value, None))
+                    kind, task = _EXPR, (_EXPR, stmt.addr, None)
+                
+                else:
+                    raise ValueError(f"Unknown statement type: {type(stmt)}")
+                
+                if kind == _STMT:
+                    continue
+            
+            if kind == _EXPR:
+                expr, dest = task[1], task[2]
+                
+                # Descend along the first operand to be evaluated without extra tasks;
+                # the operands evaluated later are pushed as tasks
+                while True:
+                    if isinstance(expr, EVar):
+                        values.append(expr.name)
+                        break
+                    
+                    elif isinstance(expr, EConst):
+                        values.append(str(expr.value))
+                        break
+                    
+                    elif isinstance(expr, EBinop):
+                        left, right = expr.left, expr.right
+                        if expr.op in ['&&', '||']:
+                            # Same allocation order as flatten_shortcircuit: result, then labels
+                            result_temp = dest if dest or self.reuse_temps else self.fresh_temp()
+                            false_label = self.fresh_label()
+                            end_label = self.fresh_label()
+                            after_left = _AND_LEFT if expr.op == '&&' else _OR_LEFT
+                            tasks.append((after_left, result_temp, false_label, end_label, right))
+                        elif isinstance(right, _SIMPLE_OPERANDS):
+                            right_var = right.name if isinstance(right, EVar) else str(right.value)
+                            if isinstance(left, _SIMPLE_OPERANDS):
+                                # Both operands are simple: emit immediately
+                                left_var = left.name if isinstance(left, EVar) else str(left.value)
+                                result_var = dest if dest else self.fresh_temp()
+                                instructions.append(IRBinOp(result_var, left_var, expr.op, right_var))
+                                values.append(result_var)
+                                break
+                            tasks.append((_BINOP_SIMPLE_RIGHT, expr.op, dest, right_var))
+                        elif self.reuse_temps and not isinstance(left, _SIMPLE_OPERANDS) and \
+                                self.temp_need(right) > self.temp_need(left):
+                            # Sethi-Ullman order: the hungrier operand first
+                            tasks.append((_BINOP_SWAPPED, expr.op, dest))
+                            tasks.append((_EXPR, left, None))
+                            expr, dest = right, None
+                            continue
+                        else:
+                            tasks.append((_BINOP, expr.op, dest))
+                            tasks.append((_EXPR, right, None))
+                        expr, dest = left, None
+                    
+                    elif isinstance(expr, EUnop):
+                        tasks.append((_UNOP, expr.op, dest))
+                        expr, dest = expr.expr, None
+                    
+                    elif isinstance(expr, EDeref):
+                        tasks.append((_DEREF, dest))
+                        expr, dest = expr.expr, None
+                    
+                    elif isinstance(expr, EAddrOf):
+                        if isinstance(expr.expr, EVar):
+                            result_var = dest if dest else self.fresh_temp()
+                            instructions.append(IRAddrOf(result_var, expr.expr.name))
+                            values.append(result_var)
+                            break
+                        tasks.append((_ADDROF, dest))
+                        expr, dest = expr.expr, None
+                    
+                    else:
+                        raise ValueError(f"Unknown expression type: {type(expr)}")
+            
+            elif kind == _COND_JUMP:
+                cond_var = values.pop()
+                instructions.append(IRCondJump(cond_var, task[1]))
+                self.release_temp(cond_var)
+            
+            elif kind == _EMIT_TWO:
+                instructions.append(task[1])
+                instructions.append(task[2])
+            
+            elif kind == _EMIT:
+                instructions.append(task[1])
+            
+            elif kind == _BINOP or kind == _BINOP_SWAPPED:
+                if kind == _BINOP:
+                    right_var = values.pop()
+                    left_var = values.pop()
+                else:
+                    left_var = values.pop()
+                    right_var = values.pop()
+                self.release_temp(left_var)
+                self.release_temp(right_var)
+                result_var = task[2] if task[2] else self.fresh_temp()
+                instructions.append(IRBinOp(result_var, left_var, task[1], right_var))
+                values.append(result_var)
+            
+            elif kind == _BINOP_SIMPLE_RIGHT:
+                left_var = values.pop()
+                self.release_temp(left_var)
+                result_var = task[2] if task[2] else self.fresh_temp()
+                instructions.append(IRBinOp(result_var, left_var, task[1], task[3]))
+                values.append(result_var)
+            
+            elif kind == _UNOP:
+                operand_var = values.pop()
+                self.release_temp(operand_var)
+                result_var = task[2] if task[2] else self.fresh_temp()
+                instructions.append(IRUnOp(result_var, task[1], operand_var))
+                values.append(result_var)
+            
+            elif kind == _DEREF:
+                addr_var = values.pop()
+                self.release_temp(addr_var)
+                result_var = task[1] if task[1] else self.fresh_temp()
+                instructions.append(IRDeref(result_var, addr_var))
+                values.append(result_var)
+            
+            elif kind == _ADDROF:
+                inner_var = values.pop()
+                self.release_temp(inner_var)
+                result_var = task[1] if task[1] else self.fresh_temp()
+                instructions.append(IRAddrOf(result_var, inner_var))
+                values.append(result_var)
+            
+            elif kind == _STORE:
+                value_var = values.pop()
+                addr_var = values.pop()
+                instructions.append(IRStoreDeref(addr_var, value_var))
+                self.release_temp(addr_var)
+                self.release_temp(value_var)
+            
+            elif kind == _AND_LEFT:
+                # Left operand done: if it is false, skip the right operand
+                _, result_temp, false_label, end_label, right = task
+                left_var = values.pop()
+                if not result_temp:
+                    result_temp = self.fresh_temp()
+                instructions.append(IRCondJump(left_var, false_label))
+                tasks.append((_AND_RIGHT, result_temp, false_label, end_label, left_var))
+                tasks.append((_EXPR, right, result_temp))
+            
+            elif kind == _AND_RIGHT:
+                _, result_temp, false_label, end_label, left_var = task
+                right_var = values.pop()
+                if right_var != result_temp:
+                    instructions.append(IRAssign(result_temp, right_var))
+                instructions.append(IRJump(end_label))
+                instructions.append(IRLabel(false_label))
+                instructions.append(IRAssign(result_temp, left_var))
+                self.release_temp(left_var)
+                instructions.append(IRLabel(end_label))
+                values.append(result_temp)
+            
+            elif kind == _OR_LEFT:
+                # Left operand done: if it is true, it is the result
+                _, result_temp, false_label, end_label, right = task
+                left_var = values.pop()
+                if not result_temp:
+                    result_temp = self.fresh_temp()
+                instructions.append(IRCondJump(left_var, false_label))
+                instructions.append(IRAssign(result_temp, left_var))
+                self.release_temp(left_var)
+                instructions.append(IRJump(end_label))
+                instructions.append(IRLabel(false_label))
+                tasks.append((_OR_RIGHT, result_temp, end_label))
+                tasks.append((_EXPR, right, result_temp))
+            
+            elif kind == _OR_RIGHT:
+                right_var = values.pop()
+                if right_var != task[1]:
+                    instructions.append(IRAssign(task[1], right_var))
+                instructions.append(IRLabel(task[2]))
+                values.append(task[1])
+            
+            else:
+                raise ValueError(f"Unknown worklist task: {kind}")
+        
+        return values
+    
     # ==================
     # CFG Construction (Phase 2: Linear IR → Basic Block Graph)
     # ==================
@@ -524,8 +1092,12 @@ class CFGGenerator:
             instructions: List of instructions using LABEL_ labels
             
         Returns:
-            List of instructions using BB_ labels
+            List of instructions using BB_ labels (an InstructionTable if
+            given one, renamed by symbol id instead of by string)
         """
+        if isinstance(instructions, InstructionTable):
+            return instructions.convert_labels_to_bb()
+        
         # Build mapping from LABEL_ to BB_
         label_map: dict[str, str] = {}
         bb_counter = 0
@@ -558,29 +1130,69 @@ class CFGGenerator:
         Phase 2: Convert to BB_ format (basic blocks)
         Phase 3: Build CFG structure
         
+        Phases 2 and 3 are done together in a single pass by BlockBuilder.
+        
         Args:
             program: WhileD program (AST)
             
         Returns:
-            Control Flow Graph
+            Control Flow Graph (with cfg.stats if collect_stats is set)
         """
-        # Phase 1: Generate linear IR with LABEL_
-        instructions = self.process_statement(program)
+        if not self.collect_stats:
+            return self._build_graph(self._lower_program(program))
+        
+        stats = GenerationStats()
+        instructions = stats.measure("lower", self._lower_program, program)
+        cfg = stats.measure("blocks", self._build_graph, instructions)
+        stats.temps = self.temp_counter
+        stats.labels = self.label_counter
+        stats.instructions = len(instructions)
+        stats.blocks = len(cfg.blocks)
+        stats.edges = cfg.edges.edge_count()
+        cfg.stats = stats
+        return cfg
+    
+    def _lower_program(self, program: Com) -> List[Instruction]:
+        """Phase 1: Generate linear IR with LABEL_, starting with a label."""
+        if self.iterative:
+            instructions = self.process_statement_iterative(program)
+        else:
+            instructions = self.process_statement(program)
         
         # Ensure there's an entry label before the first instruction
         if instructions and not isinstance(instructions[0], IRLabel):
             instructions.insert(0, IRLabel("LABEL_entry"))
-        
-        # Phase 2: Convert LABEL_ to BB_
-        bb_instructions = self._convert_labels_to_bb(instructions)
-        
-        # Phase 3: Build CFG
-        blocks = self.build_cfg(bb_instructions)
+        return instructions
+    
+    def _build_graph(self, instructions: List[Instruction]) -> ControlFlowGraph:
+        """Phase 2 + 3: Convert LABEL_ to BB_ and build the CFG in one pass."""
+        builder = BlockBuilder()
+        bb_instructions, blocks = builder.build(instructions)
         
         # Return CFG, saving both IR versions
-        cfg = ControlFlowGraph(blocks)
+        cfg = ControlFlowGraph(blocks, builder.edges, builder.label_to_block)
         cfg.linear_ir = instructions  # LABEL version
         cfg.bb_ir = bb_instructions   # BB version
         
         return cfg
-
+    
+    def iter_blocks(self, program: Com, chunk_size: int = 1024) -> Iterator[BasicBlock]:
+        """Streaming pipeline: AST → basic blocks, yielded as soon as they are final.
+        
+        Linear IR is generated lazily (iter_statement) and consumed by a
+        streaming BlockBuilder, so neither linear_ir nor bb_ir is materialised.
+        The blocks are the same as those of generate_cfg(program), except that
+        predecessor lists are not tracked. Use write_bb_ir / write_mermaid
+        (ir_representation) to write them out incrementally.
+        """
+        instructions = self.iter_statement(program, chunk_size)
+        first = next(instructions, None)
+        if first is None:
+            return
+        
+        # Ensure there's an entry label before the first instruction
+        head = [first] if isinstance(first, IRLabel) else [IRLabel("LABEL_entry"), first]
+        
+        # Every generated label is the target of at most one jump
+        builder = BlockBuilder(streaming=True, single_use_labels=True)
+        yield from builder.stream(chain(head, instructions), chunk_size)
@@ -0,0 +1,392 @@
+"""
+Bit-Vector Dataflow Analysis over the CFG
+
+This module solves dataflow problems on a ControlFlowGraph:
+1. Sets (of variables, of definitions, ...) are Python ints used as bitsets,
+   so union, intersection and comparison are single integer operations
+2. A problem gives, for every block, the gen and kill sets of its transfer
+   function out = gen | (in & ~kill), a direction and a meet (union for
+   "may" problems, intersection for "must" problems)
+3. The solver takes blocks from a worklist in reverse postorder (forward
+   problems) or postorder (backward problems), so acyclic regions settle in
+   one pass and each loop is iterated to its fixed point before the code
+   after it is revisited
+
+Built-in clients:
+    liveness(cfg)               live variables at block entry and exit
+    reaching_definitions(cfg)   definitions that reach block entry and exit
+
+Blocks are identified by block.index in cfg.edges; removed slots of the
+EdgeStore (see incremental.py) are skipped.
+
+Memory accessed through pointers is not tracked by variable: a load *p
+counts as a use of every variable whose address is taken (&x) somewhere in
+the graph, and a store *p = v defines no variable.
+"""
+
+from heapq import heappop, heappush
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from ir_representation import *
+
+
+FORWARD = "forward"
+BACKWARD = "backward"
+
+
+# =======================
+# Instruction Operands
+# =======================
+
+def is_variable(operand: str) -> bool:
+    """Check whether an IR operand names a variable or temporary (not a constant)."""
+    first = operand[0]
+    return not (first.isdigit() or first == "-")
+
+
+def defined_variable(instr: Instruction) -> Optional[str]:
+    """Variable an instruction assigns (None for stores, labels and jumps)."""
+    if isinstance(instr, (IRAssign, IRBinOp, IRUnOp, IRDeref, IRAddrOf)):
+        return instr.dest
+    return None
+
+
+def used_operands(instr: Instruction) -> Tuple[str, ...]:
+    """Operands an instruction reads, constants included (&x does not read x)."""
+    if isinstance(instr, IRBinOp):
+        return (instr.left, instr.right)
+    if isinstance(instr, IRAssign):
+        return (instr.source,)
+    if isinstance(instr, IRUnOp):
+        return (instr.operand,)
+    if isinstance(instr, IRDeref):
+        return (instr.addr,)
+    if isinstance(instr, IRStoreDeref):
+        return (instr.addr, instr.value)
+    if isinstance(instr, IRCondJump):
+        return (instr.cond,)
+    return ()
+
+
+def block_instructions(block: BasicBlock) -> List[Instruction]:
+    """Instructions of a block in execution order, terminator included."""
+    if block.terminator is None:
+        return block.instructions
+    return block.instructions + [block.terminator]
+
+
+# =======================
+# Problems and Solver
+# =======================
+
+class DataflowProblem:
+    """A gen/kill bit-vector dataflow problem.
+
+    Args:
+        direction: FORWARD (facts flow along edges) or BACKWARD
+        gen, kill: Bitsets of every EdgeStore slot (unused for empty slots)
+        may: Meet is union if True, intersection if False
+        boundary: Value entering the boundary blocks (the entry block for
+            FORWARD, blocks without successors for BACKWARD)
+        universe: Number of bits; the initial value of the other blocks is
+            0 for may problems and all universe bits for must problems
+    """
+
+    def __init__(self, direction: str, gen: Sequence[int], kill: Sequence[int],
+                 may: bool = True, boundary: int = 0, universe: int = 0):
+        if direction not in (FORWARD, BACKWARD):
+            raise ValueError(f"Unknown dataflow direction: {direction}")
+        self.direction = direction
+        self.gen = gen
+        self.kill = kill
+        self.may = may
+        self.boundary = boundary
+        self.universe = universe
+
+    @property
+    def top(self) -> int:
+        """Initial value of non-boundary blocks (identity of the meet)."""
+        return 0 if self.may else (1 << self.universe) - 1
+
+
+class DataflowResult:
+    """Solution of a dataflow problem, in program order whatever the direction.
+
+    - block_in[i]: Bitset at the entry of the block with index i
+    - block_out[i]: Bitset at the exit of the block with index i
+    - visits: Number of transfer function evaluations (for benchmarks)
+    """
+
+    def __init__(self, block_in: List[int], block_out: List[int], visits: int):
+        self.block_in = block_in
+        self.block_out = block_out
+        self.visits = visits
+
+
+def block_order(cfg: ControlFlowGraph) -> List[int]:
+    """Block indices in reverse postorder from the entry block.
+
+    Blocks unreachable from the entry follow, in index order.
+    """
+    edges = cfg.edges
+    succ = edges.succ
+    seen = [False] * len(edges.blocks)
+    postorder: List[int] = []
+
+    if cfg.entry_block is not None:
+        # Iterative DFS: (block index, position of the next successor to visit)
+        entry = cfg.entry_block.index
+        seen[entry] = True
+        stack = [(entry, 0)]
+        while stack:
+            index, position = stack[-1]
+            successors = succ[index]
+            if position < len(successors):
+                stack[-1] = (index, position + 1)
+                target = successors[position]
+                if not seen[target]:
+                    seen[target] = True
+                    stack.append((target, 0))
+            else:
+                stack.pop()
+                postorder.append(index)
+
+    postorder.reverse()
+    for index, block in enumerate(edges.blocks):
+        if block is not None and not seen[index]:
+            postorder.append(index)
+    return postorder
+
+
+def solve(cfg: ControlFlowGraph, problem: DataflowProblem,
+          order: Optional[List[int]] = None) -> DataflowResult:
+    """Solve a dataflow problem with a worklist to its maximal fixed point.
+
+    Args:
+        cfg: The graph
+        problem: Gen/kill sets, direction and meet
+        order: Reverse postorder of the blocks (block_order(cfg) if omitted),
+            so it can be shared between problems on the same graph
+    """
+    edges = cfg.edges
+    if order is None:
+        order = block_order(cfg)
+    if problem.direction == FORWARD:
+        # Facts come from the predecessors and go to the successors
+        sources: Sequence = edges.pred
+        targets: Sequence = edges.succ
+        boundary = {cfg.entry_block.index} if cfg.entry_block is not None else set()
+    else:
+        sources, targets = edges.succ, edges.pred
+        order = order[::-1]
+        boundary = {index for index in order if not edges.succ[index]}
+
+    gen, kill, may = problem.gen, problem.kill, problem.may
+    top = problem.top
+    size = len(edges.blocks)
+    before = [top] * size    # meet of the sources' values
+    after = [top] * size     # value after the transfer function
+    boundary_value = problem.boundary
+
+    # The worklist is a heap of positions in the order, so the blocks of a
+    # loop settle before the code after it is revisited
+    rank = [0] * size
+    for position, index in enumerate(order):
+        rank[index] = position
+    queued = [False] * size
+    for index in order:
+        queued[index] = True
+    worklist = list(range(len(order)))
+    visits = 0
+    while worklist:
+        index = order[heappop(worklist)]
+        queued[index] = False
+        visits += 1
+
+        # The meet starts from its identity, or from the boundary value
+        value = boundary_value if index in boundary else top
+        if may:
+            for source in sources[index]:
+                value |= after[source]
+        else:
+            for source in sources[index]:
+                value &= after[source]
+        before[index] = value
+
+        value = gen[index] | (value & ~kill[index])
+        if value != after[index]:
+            after[index] = value
+            for target in targets[index]:
+                if not queued[target]:
+                    queued[target] = True
+                    heappush(worklist, rank[target])
+
+    if problem.direction == FORWARD:
+        return DataflowResult(before, after, visits)
+    return DataflowResult(after, before, visits)
+
+
+def bits(value: int) -> List[int]:
+    """Positions of the set bits of a bitset, in increasing order."""
+    positions = []
+    while value:
+        low = value & -value
+        positions.append(low.bit_length() - 1)
+        value ^= low
+    return positions
+
+
+# =======================
+# Liveness
+# =======================
+
+class Liveness:
+    """Live variables at the entry and exit of every block.
+
+    A variable is live at a point if some path from there reads it before
+    assigning it. Nothing is live at the program exit.
+    """
+
+    def __init__(self, cfg: ControlFlowGraph, result: DataflowResult,
+                 variables: List[str], variable_bits: Dict[str, int]):
+        self.cfg = cfg
+        self.result = result
+        self.variables = variables          # bit position -> variable name
+        self.variable_bits = variable_bits  # variable name -> bit position
+
+    def names(self, value: int) -> Set[str]:
+        """Variable names of a bitset."""
+        variables = self.variables
+        return {variables[i] for i in bits(value)}
+
+    def live_in(self, block: BasicBlock) -> Set[str]:
+        """Variables live at the entry of a block."""
+        return self.names(self.result.block_in[block.index])
+
+    def live_out(self, block: BasicBlock) -> Set[str]:
+        """Variables live at the exit of a block."""
+        return self.names(self.result.block_out[block.index])
+
+
+def liveness(cfg: ControlFlowGraph, order: Optional[List[int]] = None,
+             live_at_exit: Iterable[str] = ()) -> Liveness:
+    """Compute the live variables of a CFG (backward, may).
+
+    live_at_exit names variables read after the program ends (its results).
+    """
+    variable_bits: Dict[str, int] = {}
+    variables: List[str] = []
+    address_taken = 0
+    blocks = cfg.edges.blocks
+
+    def bit(name: str) -> int:
+        position = variable_bits.get(name)
+        if position is None:
+            position = variable_bits[name] = len(variables)
+            variables.append(name)
+        return 1 << position
+
+    # Number the variables, and find those a load through a pointer may read
+    for block in blocks:
+        if block is not None:
+            for instr in block.instructions:
+                if isinstance(instr, IRAddrOf):
+                    address_taken |= bit(instr.var)
+
+    gen = [0] * len(blocks)
+    kill = [0] * len(blocks)
+    for block in blocks:
+        if block is None:
+            continue
+        # Walking backwards, a use is upward-exposed unless an earlier
+        # definition in the block hides it
+        use = defined = 0
+        for instr in reversed(block_instructions(block)):
+            dest = defined_variable(instr)
+            if dest is not None:
+                mask = bit(dest)
+                defined |= mask
+                use &= ~mask
+            for operand in used_operands(instr):
+                if is_variable(operand):
+                    use |= bit(operand)
+            if isinstance(instr, IRDeref):
+                use |= address_taken
+        gen[block.index] = use
+        kill[block.index] = defined
+
+    boundary = 0
+    for name in live_at_exit:
+        boundary |= bit(name)
+    problem = DataflowProblem(BACKWARD, gen, kill, may=True, boundary=boundary, universe=len(variables))
+    return Liveness(cfg, solve(cfg, problem, order), variables, variable_bits)
+
+
+# =======================
+# Reaching Definitions
+# =======================
+
+class ReachingDefinitions:
+    """Definitions that reach the entry and exit of every block.
+
+    Definitions are the instructions that assign a variable, numbered in
+    block order: definitions[d] is (block, position in block.instructions).
+    A definition reaches a point if some path from it gets there without
+    another assignment to the same variable.
+    """
+
+    def __init__(self, cfg: ControlFlowGraph, result: DataflowResult,
+                 definitions: List[Tuple[BasicBlock, int]], variable_definitions: Dict[str, int]):
+        self.cfg = cfg
+        self.result = result
+        self.definitions = definitions
+        self.variable_definitions = variable_definitions    # variable -> bitset of its definitions
+
+    def instructions(self, value: int) -> List[Tuple[BasicBlock, int]]:
+        """Definitions of a bitset, in definition order."""
+        definitions = self.definitions
+        return [definitions[d] for d in bits(value)]
+
+    def reaching_in(self, block: BasicBlock) -> List[Tuple[BasicBlock, int]]:
+        """Definitions reaching the entry of a block."""
+        return self.instructions(self.result.block_in[block.index])
+
+    def reaching_out(self, block: BasicBlock) -> List[Tuple[BasicBlock, int]]:
+        """Definitions reaching the exit of a block."""
+        return self.instructions(self.result.block_out[block.index])
+
+
+def reaching_definitions(cfg: ControlFlowGraph, order: Optional[List[int]] = None) -> ReachingDefinitions:
+    """Compute the reaching definitions of a CFG (forward, may)."""
+    blocks = cfg.edges.blocks
+    definitions: List[Tuple[BasicBlock, int]] = []
+    defined: List[str] = []                 # definition -> variable
+    by_variable: Dict[str, int] = {}        # variable -> bitset of its definitions
+    for block in blocks:
+        if block is None:
+            continue
+        for position, instr in enumerate(block.instructions):
+            dest = defined_variable(instr)
+            if dest is not None:
+                by_variable[dest] = by_variable.get(dest, 0) | (1 << len(definitions))
+                definitions.append((block, position))
+                defined.append(dest)
+
+    gen = [0] * len(blocks)
+    kill = [0] * len(blocks)
+    d = 0
+    for block in blocks:
+        if block is None:
+            continue
+        # A later definition of the same variable replaces an earlier one
+        block_gen = block_kill = 0
+        for instr in block.instructions:
+            if defined_variable(instr) is not None:
+                others = by_variable[defined[d]]
+                block_gen = (block_gen & ~others) | (1 << d)
+                block_kill |= others
+                d += 1
+        gen[block.index] = block_gen
+        kill[block.index] = block_kill
+
+    problem = DataflowProblem(FORWARD, gen, kill, may=True, universe=len(definitions))
+    return ReachingDefinitions(cfg, solve(cfg, problem, order), definitions, by_variable)
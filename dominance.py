@@ -0,0 +1,282 @@
+"""
+Dominators, Post-Dominators and Dominance Frontiers on the CFG
+
+This module computes dominance information for a ControlFlowGraph:
+1. Immediate dominators with the iterative algorithm of Cooper, Harvey and
+   Kennedy ("A Simple, Fast Dominance Algorithm"): blocks are visited in
+   reverse postorder, and the immediate dominator of a block is the common
+   ancestor of its processed predecessors, found by walking up the partial
+   tree by reverse postorder rank; passes repeat until nothing changes
+   (two passes for the reducible graphs the generator produces)
+2. Post-dominators: the same on the reversed graph, rooted at a virtual
+   exit that every block without successors leads to
+3. Dominance frontiers, computed on first use by walking up the tree from
+   the predecessors of each join point
+4. Constant-time dominance tests, from the preorder/postorder numbers of
+   the tree
+
+Results are cached in cfg.analyses: dominators(cfg) and post_dominators(cfg)
+recompute only when the edges (EdgeStore.version) or the entry block changed.
+
+Blocks are identified by block.index in cfg.edges; removed slots of the
+EdgeStore (see incremental.py) are skipped.
+"""
+
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+from ir_representation import *
+
+
+# =======================
+# Dominator Tree
+# =======================
+
+class DominatorTree:
+    """Dominator (or post-dominator) tree of a CFG, by block index.
+
+    - idom[i]: Index of the immediate dominator of block i, or -1 for a
+      root (the entry block; for post-dominators, the blocks only the
+      program exit post-dominates) and for blocks outside the tree
+      (unreachable from the entry; for post-dominators, unable to reach
+      an exit, e.g. inside an infinite loop) or removed
+    - order: Blocks in the tree, in reverse postorder of the graph (of the
+      reversed graph for post-dominators)
+    - children[i]: Blocks block i immediately dominates, in order
+    - preorder: Blocks in the tree, parents before children
+    - post: True for post-dominators
+    """
+
+    def __init__(self, cfg: ControlFlowGraph, idom: List[int], order: List[int], post: bool = False):
+        self.cfg = cfg
+        self.idom = idom
+        self.order = order
+        self.post = post
+        self._frontiers: Optional[List[List[int]]] = None
+
+        size = len(idom)
+        children: List[List[int]] = [[] for _ in range(size)]
+        roots = []
+        for index in order:
+            parent = idom[index]
+            if parent < 0:
+                roots.append(index)
+            else:
+                children[parent].append(index)
+        self.children = children
+
+        # Iterative DFS numbering: a dominates b iff b's interval lies in a's
+        enter = [-1] * size
+        leave = [-1] * size
+        preorder: List[int] = []
+        clock = 0
+        for root in roots:
+            stack = [(root, 0)]
+            enter[root] = clock
+            preorder.append(root)
+            clock += 1
+            while stack:
+                index, position = stack[-1]
+                below = children[index]
+                if position < len(below):
+                    stack[-1] = (index, position + 1)
+                    child = below[position]
+                    enter[child] = clock
+                    preorder.append(child)
+                    clock += 1
+                    stack.append((child, 0))
+                else:
+                    stack.pop()
+                    leave[index] = clock
+                    clock += 1
+        self.preorder = preorder
+        self._enter = enter
+        self._leave = leave
+
+    def contains(self, index: int) -> bool:
+        """Check whether a block (by index) is in the tree."""
+        return self._enter[index] >= 0
+
+    def dominates_index(self, a: int, b: int) -> bool:
+        """Check whether block a dominates block b (by index; every block dominates itself)."""
+        enter = self._enter
+        return enter[b] >= 0 and enter[a] <= enter[b] and self._leave[b] <= self._leave[a]
+
+    def dominates(self, a: BasicBlock, b: BasicBlock) -> bool:
+        """Check whether block a dominates (post-dominates) block b."""
+        return self.dominates_index(a.index, b.index)
+
+    def immediate_dominator(self, block: BasicBlock) -> Optional[BasicBlock]:
+        """Immediate dominator of a block (None for a root or a block outside the tree)."""
+        parent = self.idom[block.index]
+        return self.cfg.edges.blocks[parent] if parent >= 0 else None
+
+    def dominated(self, block: BasicBlock) -> List[BasicBlock]:
+        """Blocks a block immediately dominates (its children in the tree)."""
+        blocks = self.cfg.edges.blocks
+        return [blocks[i] for i in self.children[block.index]]
+
+    @property
+    def frontiers(self) -> List[List[int]]:
+        """Dominance frontier of every block, by index (computed on first use).
+
+        The frontier of a block holds the blocks where its dominance ends:
+        it dominates a predecessor (a successor, for post-dominators) of
+        them but not strictly them. The post-dominance frontier of a block
+        is the set of branches it is control dependent on.
+        """
+        if self._frontiers is None:
+            edges = self.cfg.edges
+            sources = edges.succ if self.post else edges.pred
+            idom = self.idom
+            enter = self._enter
+            frontiers: List[List[int]] = [[] for _ in range(len(idom))]
+            for index in self.order:
+                joined = sources[index]
+                stop = idom[index]
+                # A root is also entered from outside the graph, so one edge makes it a join point
+                if len(joined) < 2 and stop >= 0:
+                    continue
+                for source in joined:
+                    if enter[source] < 0:
+                        continue
+                    runner = source
+                    # index is added once per runner: the walks for it are consecutive
+                    while runner != stop and runner >= 0:
+                        frontier = frontiers[runner]
+                        if frontier and frontier[-1] == index:
+                            break
+                        frontier.append(index)
+                        runner = idom[runner]
+            self._frontiers = frontiers
+        return self._frontiers
+
+    def frontier(self, block: BasicBlock) -> List[BasicBlock]:
+        """Dominance frontier of a block."""
+        blocks = self.cfg.edges.blocks
+        return [blocks[i] for i in self.frontiers[block.index]]
+
+
+# =======================
+# Iterative Algorithm
+# =======================
+
+def _reverse_postorder(root: int, succ: Sequence[Sequence[int]], size: int) -> List[int]:
+    """Nodes reachable from root in reverse postorder (iterative DFS).
+
+    A node is visited when popped; ~node stays below its successors on the
+    stack and marks where the node finishes.
+    """
+    seen = [False] * size
+    postorder: List[int] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node < 0:
+            postorder.append(~node)
+            continue
+        if seen[node]:
+            continue
+        seen[node] = True
+        stack.append(~node)
+        for target in reversed(succ[node]):
+            if not seen[target]:
+                stack.append(target)
+    postorder.reverse()
+    return postorder
+
+
+def immediate_dominators(root: int, succ: Sequence[Sequence[int]],
+                         pred: Sequence[Iterable[int]]) -> Tuple[List[int], List[int]]:
+    """Immediate dominators of a graph given by successor and predecessor lists.
+
+    Returns (idom, order): idom[n] is the immediate dominator of node n (-1
+    for the root and unreachable nodes), order the reachable nodes in
+    reverse postorder.
+    """
+    size = len(succ)
+    order = _reverse_postorder(root, succ, size)
+    rank = [-1] * size
+    for position, node in enumerate(order):
+        rank[node] = position
+
+    idom = [-1] * size
+    idom[root] = root
+    changed = True
+    while changed:
+        changed = False
+        for node in order[1:]:
+            new = -1
+            for source in pred[node]:
+                if idom[source] < 0:
+                    continue    # unreachable, or not processed yet in the first pass
+                if new < 0:
+                    new = source
+                    continue
+                # Intersect: walk both fingers up to their common ancestor
+                a, b = source, new
+                while a != b:
+                    while rank[a] > rank[b]:
+                        a = idom[a]
+                    while rank[b] > rank[a]:
+                        b = idom[b]
+                new = a
+            if idom[node] != new:
+                idom[node] = new
+                changed = True
+    idom[root] = -1
+    return idom, order
+
+
+def _dominator_tree(cfg: ControlFlowGraph) -> DominatorTree:
+    edges = cfg.edges
+    if cfg.entry_block is None:
+        return DominatorTree(cfg, [-1] * len(edges.blocks), [])
+    idom, order = immediate_dominators(cfg.entry_block.index, edges.succ, edges.pred)
+    return DominatorTree(cfg, idom, order)
+
+
+def _post_dominator_tree(cfg: ControlFlowGraph) -> DominatorTree:
+    edges = cfg.edges
+    size = len(edges.blocks)
+    exit_node = size
+    exits = [index for index, block in enumerate(edges.blocks) if block is not None and not edges.succ[index]]
+    # Reversed graph with the virtual exit as root
+    succ: List[Sequence[int]] = list(edges.pred)
+    succ.append(exits)
+    pred: List[Iterable[int]] = list(edges.succ)
+    for index in exits:
+        pred[index] = (exit_node,)
+    pred.append(())
+    idom, order = immediate_dominators(exit_node, succ, pred)
+    idom.pop()
+    order.pop(0)
+    for index in order:
+        if idom[index] == exit_node:
+            idom[index] = -1
+    return DominatorTree(cfg, idom, order, post=True)
+
+
+# =======================
+# Cached Analyses
+# =======================
+
+def _cached(cfg: ControlFlowGraph, name: str, compute: Callable[[ControlFlowGraph], object]) -> object:
+    """Result of an analysis from cfg.analyses, recomputed if the edges or the entry changed."""
+    edges = cfg.edges
+    entry = cfg.analyses.get(name)
+    if entry is not None:
+        cached_edges, version, entry_block, result = entry
+        if cached_edges is edges and version == edges.version and entry_block is cfg.entry_block:
+            return result
+    result = compute(cfg)
+    cfg.analyses[name] = (edges, edges.version, cfg.entry_block, result)
+    return result
+
+
+def dominators(cfg: ControlFlowGraph) -> DominatorTree:
+    """Dominator tree of a CFG (block a dominates b if every path from the entry to b goes through a)."""
+    return _cached(cfg, "dominators", _dominator_tree)
+
+
+def post_dominators(cfg: ControlFlowGraph) -> DominatorTree:
+    """Post-dominator tree of a CFG (block a post-dominates b if every path from b to an exit goes through a)."""
+    return _cached(cfg, "post_dominators", _post_dominator_tree)
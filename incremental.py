@@ -0,0 +1,261 @@
+"""
+Incremental CFG Regeneration
+
+This module updates a CFG after an edit instead of regenerating it:
+1. The program is split into its top-level statements (the leaves of the
+   CSeq spine), and the linear IR of each statement is kept
+2. An edit replaces a range of statements: only the new statements are
+   lowered, with temporaries and labels numbered on from where the last
+   generation stopped, so untouched statements keep their #n and LABEL_n
+3. Only the basic blocks overlapping the edited range are rebuilt; their
+   edges to the rest of the graph are relinked, and new blocks and BB_
+   labels take fresh numbers, so untouched blocks keep theirs (their
+   EdgeStore indices change only when the store drops its empty slots)
+
+The first generation is identical to CFGGenerator.generate_cfg. After an
+edit, the CFG is the graph a fresh generation would produce, up to the
+numbering of temporaries, labels and blocks.
+
+This works because every jump of the linear IR stays inside the top-level
+statement that produced it: the only control flow between statements is
+fall-through.
+"""
+
+from bisect import bisect_right
+from itertools import accumulate, islice
+from typing import Dict, List, Optional, Sequence
+from ast_definition import *
+from ir_representation import *
+from cfg_generator import CFGGenerator
+from block_builder import BlockBuilder
+
+
+def top_level_statements(program: Com) -> List[Com]:
+    """Statements of a program in execution order, with every CSeq taken apart.
+
+    Left- and right-nested sequences give the same list. Only the sequence
+    spine is split; if/while statements stay whole.
+    """
+    statements: List[Com] = []
+    stack: List[Com] = [program]
+    while stack:
+        stmt = stack.pop()
+        if isinstance(stmt, CSeq):
+            stack.append(stmt.second)
+            stack.append(stmt.first)
+        else:
+            statements.append(stmt)
+    return statements
+
+
+def _block_size(block: BasicBlock) -> int:
+    """Number of linear IR instructions a block was built from (label and jump included)."""
+    return (block.label is not None) + len(block.instructions) + (block.terminator is not None)
+
+
+class IncrementalCFGGenerator:
+    """Keeps the CFG of a program up to date while the program is edited.
+
+    Usage:
+        incremental = IncrementalCFGGenerator()
+        cfg = incremental.generate(program)
+        cfg = incremental.update(edited_program)            # diffs the statement lists
+        cfg = incremental.replace(5, 6, [new_statement])    # or names the edited range
+
+    The same ControlFlowGraph object is returned every time and is changed
+    in place. The statement lists are compared by identity first, so an
+    editor that keeps unchanged statement nodes (e.g. through a
+    HashConsTable) makes update() cheap. An edit inside an if/while body
+    re-lowers that whole top-level statement.
+
+    Attributes:
+        statements: Top-level statements of the current program
+        segments: Linear IR of each statement (LABEL_ version)
+        block_sizes: Linear IR length of each block in cfg.blocks, so that
+            IR offsets can be mapped to blocks
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        """Forget the previous program."""
+        # One generator for all lowering: its counters are the next free
+        # temporary and label numbers
+        self.generator = CFGGenerator(iterative=True)
+        self.statements: List[Com] = []
+        self.segments: List[List[Instruction]] = []
+        self.block_sizes: List[int] = []
+        self.label_map: Dict[str, str] = {}     # LABEL_ name -> BB_ name, kept across edits
+        self.bb_counter = 0
+        self.block_counter = 0
+        self.entry = False                      # linear IR starts with an inserted LABEL_entry
+        self.cfg: Optional[ControlFlowGraph] = None
+
+    # ==================
+    # Full Generation
+    # ==================
+
+    def generate(self, program: Com) -> ControlFlowGraph:
+        """Generate the CFG of a program from scratch (same result as CFGGenerator.generate_cfg)."""
+        self._reset()
+        generator = self.generator
+        self.statements = top_level_statements(program)
+        self.segments = [generator.process_statement_iterative(stmt) for stmt in self.statements]
+
+        instructions = [instr for segment in self.segments for instr in segment]
+        if instructions and not isinstance(instructions[0], IRLabel):
+            instructions.insert(0, IRLabel("LABEL_entry"))
+            self.entry = True
+
+        builder = BlockBuilder()
+        bb_instructions, blocks = builder.build(instructions)
+        self.label_map = builder.label_map
+        self.bb_counter = builder.bb_counter
+        self.block_counter = builder.block_count
+        self.block_sizes = [_block_size(block) for block in blocks]
+
+        cfg = self.cfg = ControlFlowGraph(blocks, builder.edges, builder.label_to_block)
+        cfg.linear_ir = instructions
+        cfg.bb_ir = bb_instructions
+        return cfg
+
+    # ==================
+    # Edits
+    # ==================
+
+    def update(self, program: Com) -> ControlFlowGraph:
+        """Bring the CFG up to date with an edited version of the program.
+
+        The changed range is what remains of the statement list after the
+        longest common prefix and suffix with the previous program.
+        """
+        if self.cfg is None:
+            return self.generate(program)
+        old = self.statements
+        new = top_level_statements(program)
+
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and (old[prefix] is new[prefix] or old[prefix] == new[prefix]):
+            prefix += 1
+        suffix = 0
+        limit -= prefix
+        while suffix < limit and (old[-1 - suffix] is new[-1 - suffix] or old[-1 - suffix] == new[-1 - suffix]):
+            suffix += 1
+
+        return self.replace(prefix, len(old) - suffix, new[prefix:len(new) - suffix])
+
+    def replace(self, start: int, end: int, statements: Sequence[Com]) -> ControlFlowGraph:
+        """Replace top-level statements start..end-1 and update the CFG.
+
+        Args:
+            start, end: Range of self.statements to replace (start == end inserts)
+            statements: The new statements (empty deletes)
+
+        Returns:
+            The updated CFG
+        """
+        cfg = self.cfg
+        if cfg is None:
+            raise ValueError("generate() must be called before replace()")
+        if not 0 <= start <= end <= len(self.statements):
+            raise IndexError(f"statement range {start}..{end} out of bounds")
+        if start == end and not statements:
+            return cfg
+
+        # Phase 1 for the new statements only, numbered after everything so far
+        generator = self.generator
+        new_segments = [generator.process_statement_iterative(stmt) for stmt in statements]
+
+        # Linear IR offsets of the replaced statements
+        linear = cfg.linear_ir
+        edit_start = self.entry + sum(map(len, islice(self.segments, start)))
+        edit_end = edit_start + sum(map(len, islice(self.segments, start, end)))
+
+        # Widen to whole blocks: i0..i1-1 are the blocks to rebuild
+        starts = list(accumulate(self.block_sizes, initial=0))
+        block_count = len(self.block_sizes)
+        # New code joins the block of the instruction before it, unless that is a jump
+        anchor = edit_start
+        if 0 < edit_start <= len(linear) and not isinstance(linear[edit_start - 1], (IRJump, IRCondJump)):
+            anchor -= 1
+        i0 = max(bisect_right(starts, anchor, 0, block_count) - 1, 0)
+        if edit_end >= len(linear):
+            i1 = block_count
+        else:
+            j = bisect_right(starts, edit_end, 0, block_count) - 1
+            # A label keeps its block boundary whatever precedes it
+            i1 = j if starts[j] == edit_end and isinstance(linear[edit_end], IRLabel) else j + 1
+        window_start, window_end = starts[i0], starts[i1]
+
+        head = linear[window_start:edit_start]
+        if window_start == 0 and self.entry:
+            head = head[1:]
+        window = head + [instr for segment in new_segments for instr in segment] + linear[edit_end:window_end]
+        if window_start == 0:
+            self.entry = bool(window) and not isinstance(window[0], IRLabel)
+            if self.entry:
+                window.insert(0, IRLabel("LABEL_entry"))
+
+        # Forget the replaced statements' labels and the old blocks
+        for segment in islice(self.segments, start, end):
+            for instr in segment:
+                if isinstance(instr, IRLabel):
+                    self.label_map.pop(instr.name, None)
+        edges = cfg.edges
+        old_blocks = cfg.blocks[i0:i1]
+        old_indices = {block.index for block in old_blocks}
+        # Blocks outside the window with an edge into it (jumps to its first
+        # label), and the block falling through into it
+        outside = {src for block in old_blocks for src in edges.pred[block.index] if src not in old_indices}
+        previous = cfg.blocks[i0 - 1] if i0 > 0 else None
+        for block in old_blocks:
+            if block.label is not None and cfg.label_to_block.get(block.label) is block:
+                del cfg.label_to_block[block.label]
+            edges.remove_block(block.index)
+
+        # Phase 2 + 3 for the window, sharing the graph's labels and edges:
+        # jumps to labels outside the window are resolved against them
+        builder = BlockBuilder()
+        builder.edges = edges
+        builder.label_map = self.label_map
+        builder.label_to_block = cfg.label_to_block
+        builder.bb_counter = self.bb_counter
+        builder.block_count = self.block_counter
+        bb_window, new_blocks = builder.build(window)
+        self.bb_counter = builder.bb_counter
+        self.block_counter = builder.block_count
+
+        # Relink the window with the rest of the graph
+        following = cfg.blocks[i1] if i1 < block_count else None
+        first = new_blocks[0] if new_blocks else following
+        if previous is not None:
+            outside.add(previous.index)
+        for src in outside:
+            block = edges.blocks[src]
+            target = cfg.jump_target(block)
+            if target is not None:
+                edges.add_edge(src, target.index, first=True)
+            if block is previous and first is not None and not isinstance(block.terminator, IRJump):
+                edges.add_edge(src, first.index)
+        if new_blocks and following is not None and not isinstance(new_blocks[-1].terminator, IRJump):
+            edges.add_edge(new_blocks[-1].index, following.index)
+
+        # Splice everything in
+        cfg.blocks[i0:i1] = new_blocks
+        cfg.entry_block = cfg.blocks[0] if cfg.blocks else None
+        self.block_sizes[i0:i1] = [_block_size(block) for block in new_blocks]
+        linear[window_start:window_end] = window
+        cfg.bb_ir[window_start:window_end] = bb_window
+        self.statements[start:end] = statements
+        self.segments[start:end] = new_segments
+        # Removed blocks leave empty slots; renumber once they are the
+        # majority, so repeated edits do not grow the index-sized analyses
+        if edges.removed * 2 > len(edges.blocks):
+            edges.compact()
+        return cfg
+
+    def __repr__(self):
+        return (f"IncrementalCFGGenerator({len(self.statements)} statements, "
+                f"{len(self.block_sizes)} blocks)")
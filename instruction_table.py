@@ -0,0 +1,320 @@
+"""
+Compact Struct-of-Arrays Instruction Store
+
+This module provides InstructionTable, an alternative container for linear IR:
+1. One opcode array ('B') plus four operand arrays ('i') holding symbol ids
+   (see symbol_table.py: temporaries and numbered labels take no storage,
+   other names are stored once)
+2. The IR dataclasses (IRAssign, IRBinOp, ...) as views, built on demand
+3. LABEL_ -> BB_ renaming as integer operations
+
+It behaves like a list of instructions for appending, inserting, iterating and
+indexing, so CFGGenerator can emit into it directly (lower_to_table) and
+BlockBuilder or the printers can consume it unchanged.
+"""
+
+import sys
+from array import array
+from itertools import chain, repeat
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from ir_representation import *
+from symbol_table import SymbolTable
+
+
+# =======================
+# Opcodes
+# =======================
+
+# (opcode, class, operand fields in storage order)
+_LAYOUT: Tuple[Tuple[int, type, Tuple[str, ...]], ...] = (
+    (0, IRAssign, ('dest', 'source')),
+    (1, IRBinOp, ('dest', 'left', 'op', 'right')),
+    (2, IRUnOp, ('dest', 'op', 'operand')),
+    (3, IRDeref, ('dest', 'addr')),
+    (4, IRAddrOf, ('dest', 'var')),
+    (5, IRStoreDeref, ('addr', 'value')),
+    (6, IRLabel, ('name',)),
+    (7, IRCondJump, ('cond', 'label')),
+    (8, IRJump, ('label',)),
+)
+
+OPCODES: Dict[type, int] = {cls: opcode for opcode, cls, _ in _LAYOUT}
+OPCODE_CLASSES: List[type] = [cls for _, cls, _ in _LAYOUT]
+OPERAND_COUNTS: List[int] = [len(fields) for _, _, fields in _LAYOUT]
+
+# Unused operand slots hold NO_OPERAND
+NO_OPERAND = -1
+
+_LABEL_OPCODE = 6
+_COND_JUMP_OPCODE = 7
+_JUMP_OPCODE = 8
+
+# Operand fields of an instruction as a tuple, by class
+_GETTERS: Dict[type, attrgetter] = {cls: attrgetter(*fields) for _, cls, fields in _LAYOUT}
+
+# Operand padding after an instruction with 0..4 operands
+_PADDING = tuple((NO_OPERAND,) * (4 - n) for n in range(5))
+
+
+def _unencodable(instr) -> ValueError:
+    """Error for an instruction without an opcode (phi functions exist only in SSA form)."""
+    if isinstance(instr, IRPhi):
+        return ValueError("CFG is in SSA form; call destruct_ssa first")
+    return ValueError(f"Cannot encode {type(instr).__name__}: {instr}")
+
+
+class _Interned(dict):
+    """Memo of SymbolTable.intern for one batch: text -> symbol id."""
+
+    def __init__(self, symbols: SymbolTable):
+        super().__init__()
+        self.symbols = symbols
+
+    def __missing__(self, text: str) -> int:
+        symbol = self[text] = self.symbols.intern(text)
+        return symbol
+
+
+class _Names(dict):
+    """Memo of SymbolTable.name for one batch: symbol id -> text."""
+
+    def __init__(self, symbols: SymbolTable):
+        super().__init__()
+        self.symbols = symbols
+
+    def __missing__(self, symbol: int) -> str:
+        text = self[symbol] = self.symbols.name(symbol)
+        return text
+
+
+# =======================
+# Instruction Table
+# =======================
+
+class InstructionTable:
+    """Linear IR stored as parallel arrays instead of one object per instruction.
+
+    Instruction i is opcodes[i] with operand symbol ids arg0[i] .. arg3[i]
+    (NO_OPERAND where the instruction has fewer operands); symbols.name(id)
+    is the operand text. An instruction costs 17 bytes plus its share of the
+    interned names, instead of a dataclass instance and a string per
+    temporary and label.
+
+    Args:
+        instructions: Initial instructions
+        symbols: Symbol table to intern operands in (shared between tables
+            so that their ids are comparable); a new one if omitted
+
+    Indexing and iterating return fresh dataclass views: changing a view does
+    not change the table.
+    """
+
+    def __init__(self, instructions: Iterable[Instruction] = (), symbols: Optional[SymbolTable] = None):
+        self.opcodes = array('B')
+        self.arg0 = array('i')
+        self.arg1 = array('i')
+        self.arg2 = array('i')
+        self.arg3 = array('i')
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.extend(instructions)
+
+    @classmethod
+    def from_buffers(cls, opcodes, arg0, arg1, arg2, arg3, symbols: SymbolTable) -> 'InstructionTable':
+        """Table over existing opcode and operand buffers, without copying them.
+
+        The buffers may be arrays or read-only memoryviews (e.g. of an mmap,
+        see cfg_binary.py); a table over memoryviews can be read but not
+        appended to.
+        """
+        table = cls.__new__(cls)
+        table.opcodes = opcodes
+        table.arg0 = arg0
+        table.arg1 = arg1
+        table.arg2 = arg2
+        table.arg3 = arg3
+        table.symbols = symbols
+        return table
+
+    def intern(self, text: str) -> int:
+        """Symbol id of an operand string."""
+        return self.symbols.intern(text)
+
+    def name(self, symbol: int) -> str:
+        """Operand text of a symbol id."""
+        return self.symbols.name(symbol)
+
+    def _encode(self, instr: Instruction) -> Tuple[int, int, int, int, int]:
+        """Opcode and four operand ids of an instruction."""
+        cls = type(instr)
+        try:
+            fields = _GETTERS[cls](instr)
+        except KeyError:
+            raise _unencodable(instr) from None
+        intern = self.symbols.intern
+        if type(fields) is str:
+            return (OPCODES[cls], intern(fields), NO_OPERAND, NO_OPERAND, NO_OPERAND)
+        if len(fields) == 2:
+            return (OPCODES[cls], intern(fields[0]), intern(fields[1]), NO_OPERAND, NO_OPERAND)
+        if len(fields) == 3:
+            return (OPCODES[cls], intern(fields[0]), intern(fields[1]), intern(fields[2]), NO_OPERAND)
+        return (OPCODES[cls], intern(fields[0]), intern(fields[1]), intern(fields[2]), intern(fields[3]))
+
+    def append(self, instr: Instruction):
+        """Add an instruction at the end."""
+        opcode, a0, a1, a2, a3 = self._encode(instr)
+        self.opcodes.append(opcode)
+        self.arg0.append(a0)
+        self.arg1.append(a1)
+        self.arg2.append(a2)
+        self.arg3.append(a3)
+
+    def extend(self, instructions: Iterable[Instruction]):
+        """Add instructions at the end.
+
+        Encodes the whole batch first, interning each distinct operand once,
+        then extends the columns: much faster than appending one by one.
+        """
+        ids = _Interned(self.symbols)
+        getters = _GETTERS
+        opcodes = []
+        args = []
+        try:
+            for instr in instructions:
+                cls = type(instr)
+                fields = getters[cls](instr)
+                opcodes.append(OPCODES[cls])
+                if type(fields) is str:
+                    args += (ids[fields], NO_OPERAND, NO_OPERAND, NO_OPERAND)
+                else:
+                    args += map(ids.__getitem__, fields)
+                    args += _PADDING[len(fields)]
+        except KeyError:
+            if type(instr) not in getters:
+                raise _unencodable(instr) from None
+            raise
+        self.opcodes.extend(opcodes)
+        self.arg0.extend(args[0::4])
+        self.arg1.extend(args[1::4])
+        self.arg2.extend(args[2::4])
+        self.arg3.extend(args[3::4])
+
+    def insert(self, index: int, instr: Instruction):
+        """Insert an instruction before position index."""
+        opcode, a0, a1, a2, a3 = self._encode(instr)
+        self.opcodes.insert(index, opcode)
+        self.arg0.insert(index, a0)
+        self.arg1.insert(index, a1)
+        self.arg2.insert(index, a2)
+        self.arg3.insert(index, a3)
+
+    def opcode(self, index: int) -> int:
+        """Opcode of instruction index, without building a view."""
+        return self.opcodes[index]
+
+    def operand_ids(self, index: int) -> Tuple[int, ...]:
+        """Operand symbol ids of instruction index, in field order."""
+        ids = (self.arg0[index], self.arg1[index], self.arg2[index], self.arg3[index])
+        return ids[:OPERAND_COUNTS[self.opcodes[index]]]
+
+    def operands(self, index: int) -> List[str]:
+        """Operand strings of instruction index, in field order."""
+        return [self.name(i) for i in self.operand_ids(index)]
+
+    def __getitem__(self, index: int) -> Instruction:
+        return OPCODE_CLASSES[self.opcodes[index]](*self.operands(index))
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __iter__(self) -> Iterator[Instruction]:
+        name = self.symbols.name
+        classes = OPCODE_CLASSES
+        counts = OPERAND_COUNTS
+        for opcode, a0, a1, a2, a3 in zip(self.opcodes, self.arg0, self.arg1, self.arg2, self.arg3):
+            ids = (a0, a1, a2, a3)[:counts[opcode]]
+            yield classes[opcode](*[name(i) for i in ids])
+
+    def convert_labels_to_bb(self) -> 'InstructionTable':
+        """Rename LABEL_ labels to BB_1, BB_2, ... in order of appearance.
+
+        Same result as CFGGenerator._convert_labels_to_bb, but the renaming
+        is a mapping between integer symbol ids: no strings are looked up or
+        built. Jumps to labels that never appear keep their label.
+
+        Returns:
+            A new table sharing this table's symbol table
+        """
+        opcodes = self.opcodes
+        label_map: Dict[int, int] = {}
+        bb = self.symbols.bb
+        for opcode, name in zip(opcodes, self.arg0):
+            if opcode == _LABEL_OPCODE and name not in label_map:
+                label_map[name] = bb(len(label_map) + 1)
+
+        converted = InstructionTable(symbols=self.symbols)
+        converted.opcodes = array('B', opcodes)
+        converted.arg0 = array('i', (label_map.get(a0, a0) if op == _LABEL_OPCODE or op == _JUMP_OPCODE else a0
+                                     for op, a0 in zip(opcodes, self.arg0)))
+        converted.arg1 = array('i', (label_map.get(a1, a1) if op == _COND_JUMP_OPCODE else a1
+                                     for op, a1 in zip(opcodes, self.arg1)))
+        converted.arg2 = array('i', self.arg2)
+        converted.arg3 = array('i', self.arg3)
+        return converted
+
+    def labels(self) -> List[int]:
+        """Symbol ids of all labels, in order (LABEL_ kind or not)."""
+        return [name for opcode, name in zip(self.opcodes, self.arg0) if opcode == _LABEL_OPCODE]
+
+    def to_list(self, like: Optional[Tuple['InstructionTable', List[Instruction]]] = None) -> List[Instruction]:
+        """All instructions as dataclass objects.
+
+        Operands with the same symbol share one string object.
+
+        Args:
+            like: Another table (with the same symbols) and its decoded list:
+                where row i of both tables is the same, the object at
+                position i of that list is reused instead of a new one
+                (e.g. the linear IR and the BB IR share everything but
+                labels and jumps)
+        """
+        names = _Names(self.symbols)
+        classes = OPCODE_CLASSES
+        counts = OPERAND_COUNTS
+        result = []
+        append = result.append
+        rows = zip(self.opcodes.tolist(), self.arg0.tolist(), self.arg1.tolist(),
+                   self.arg2.tolist(), self.arg3.tolist())
+        if like is None:
+            shared = repeat((None, None))
+        else:
+            other, decoded = like
+            shared = chain(zip(zip(other.opcodes.tolist(), other.arg0.tolist(), other.arg1.tolist(),
+                                   other.arg2.tolist(), other.arg3.tolist()), decoded),
+                           repeat((None, None)))
+        for row, (other_row, instr) in zip(rows, shared):
+            if row == other_row:
+                append(instr)
+                continue
+            opcode, a0, a1, a2, a3 = row
+            count = counts[opcode]
+            if count == 1:
+                append(classes[opcode](names[a0]))
+            elif count == 2:
+                append(classes[opcode](names[a0], names[a1]))
+            elif count == 3:
+                append(classes[opcode](names[a0], names[a1], names[a2]))
+            else:
+                append(classes[opcode](names[a0], names[a1], names[a2], names[a3]))
+        return result
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the table (arrays and interned names)."""
+        arrays = sum(len(a) * a.itemsize
+                     for a in (self.opcodes, self.arg0, self.arg1, self.arg2, self.arg3))
+        names = self.symbols.names
+        pool = sys.getsizeof(names) + sys.getsizeof(self.symbols.ids)
+        return arrays + pool + sum(sys.getsizeof(name) for name in names)
+
+    def __repr__(self):
+        return f"InstructionTable({len(self)} instrs, {len(self.symbols)} names)"
@@ -0,0 +1,367 @@
+"""
+Interpreter for the Generated CFG
+
+This module runs a ControlFlowGraph:
+1. Decoding (once per Interpreter): every variable and temporary gets a
+   memory address, constants become ints, and each instruction becomes a
+   small function specialised for its operand kinds (variable or
+   constant), chosen from a table by instruction class; each block becomes
+   an entry of the dispatch table: its instruction functions, how it ends
+   (fall through, jump, or conditional jump, with the targets resolved to
+   positions in the table) and its length
+2. Execution: a loop over the dispatch table that calls the instruction
+   functions of a block and picks the next block, without looking at the
+   IR classes again
+
+Memory model: one flat list of integers. Cells 0 .. heap_size-1 are free
+for the program's data (*p reads and writes cell p, e.g. an array whose
+address is passed in a variable); the variables follow, so &x is an
+integer address that *p reads and writes like any other cell, and pointer
+arithmetic works. An address outside the memory, division by zero and
+running longer than max_steps raise ExecutionError.
+
+Values are 64-bit two's complement integers: +, -, *, / and unary -
+wrap around, so a runaway computation stays within max_steps. / and %
+round toward negative infinity (Python's floor division; % takes the
+sign of the divisor). This is the interpreter's own choice: the
+generator does not fold constants, and ir_optimizer.fold_constants
+leaves negative / and % operands unfolded.
+"""
+
+import gc
+import operator
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from ir_representation import *
+from dataflow import is_variable
+
+
+class ExecutionError(RuntimeError):
+    """Error while running a CFG, with the block where it happened."""
+
+    def __init__(self, message: str, block: Optional[BasicBlock] = None):
+        self.block = block
+        where = "" if block is None else f" in block {block.label or block.id}"
+        super().__init__(f"{message}{where}")
+
+
+class StepLimitExceeded(ExecutionError):
+    """The program ran more instructions than max_steps (e.g. an infinite loop)."""
+
+
+@dataclass
+class ExecutionResult:
+    """Final state of a run.
+
+    - variables: Final value of every variable of the program (temporaries
+      excluded; variables never assigned keep their initial value, 0 if
+      env had none)
+    - memory: The whole memory (heap cells, then the variables)
+    - steps: Instructions executed, jumps included
+    """
+    variables: Dict[str, int]
+    memory: List[int]
+    steps: int
+
+
+# =======================
+# Decoding
+# =======================
+
+Step = Callable[[List[int]], None]
+
+# Arithmetic wraps to 64 bits: adding _SIGN maps -2**63 .. 2**63-1 to 0 .. _MASK
+_SIGN = 1 << 63
+_MASK = (1 << 64) - 1
+
+
+def _wrap(value: int) -> int:
+    """value as a 64-bit two's complement integer."""
+    return ((value + _SIGN) & _MASK) - _SIGN
+
+
+# Comparisons and ! give bools, which are ints; run() converts the results.
+# % of 64-bit operands cannot overflow; / only for -2**63 / -1
+_BINARY: Dict[str, Callable[[int, int], int]] = {
+    '+': lambda a, b: ((a + b + _SIGN) & _MASK) - _SIGN,
+    '-': lambda a, b: ((a - b + _SIGN) & _MASK) - _SIGN,
+    '*': lambda a, b: ((a * b + _SIGN) & _MASK) - _SIGN,
+    '/': lambda a, b: ((a // b + _SIGN) & _MASK) - _SIGN,
+    '%': operator.mod,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '&&': lambda a, b: a != 0 and b != 0,
+    '||': lambda a, b: a != 0 or b != 0,
+}
+
+_UNARY: Dict[str, Callable[[int], int]] = {
+    '-': lambda a: ((_SIGN - a) & _MASK) - _SIGN,
+    '!': operator.not_,
+}
+
+# How a block ends
+_FALL, _JUMP, _BRANCH = 0, 1, 2
+
+
+class _Decoder:
+    """Operand and instruction decoding for one Interpreter."""
+
+    def __init__(self, heap_size: int):
+        self.addresses: Dict[str, int] = {}
+        self.next_address = heap_size
+
+    def address(self, name: str) -> int:
+        address = self.addresses.get(name)
+        if address is None:
+            address = self.addresses[name] = self.next_address
+            self.next_address += 1
+        return address
+
+    def operand(self, operand: str) -> Tuple[bool, int]:
+        """(True, address) for a variable, (False, value) for a constant."""
+        if is_variable(operand):
+            return True, self.address(operand)
+        return False, _wrap(int(operand))
+
+    def assign(self, instr: IRAssign) -> Step:
+        dest = self.address(instr.dest)
+        variable, source = self.operand(instr.source)
+        if variable:
+            def step(m):
+                m[dest] = m[source]
+        else:
+            def step(m):
+                m[dest] = source
+        return step
+
+    def binary(self, instr: IRBinOp) -> Step:
+        function = _BINARY.get(instr.op)
+        if function is None:
+            raise ValueError(f"Unknown binary operator: {instr.op}")
+        dest = self.address(instr.dest)
+        left_variable, left = self.operand(instr.left)
+        right_variable, right = self.operand(instr.right)
+        # Constant operands are still computed at run time: 1 / 0 must fail only if executed
+        if left_variable and right_variable:
+            def step(m):
+                m[dest] = function(m[left], m[right])
+        elif left_variable:
+            def step(m):
+                m[dest] = function(m[left], right)
+        elif right_variable:
+            def step(m):
+                m[dest] = function(left, m[right])
+        else:
+            def step(m):
+                m[dest] = function(left, right)
+        return step
+
+    def unary(self, instr: IRUnOp) -> Step:
+        function = _UNARY.get(instr.op)
+        if function is None:
+            raise ValueError(f"Unknown unary operator: {instr.op}")
+        dest = self.address(instr.dest)
+        variable, operand = self.operand(instr.operand)
+        if variable:
+            def step(m):
+                m[dest] = function(m[operand])
+        else:
+            def step(m):
+                m[dest] = function(operand)
+        return step
+
+    # Negative addresses are checked: as list indices they would read from the end
+
+    def deref(self, instr: IRDeref) -> Step:
+        dest = self.address(instr.dest)
+        variable, addr = self.operand(instr.addr)
+        if variable:
+            def step(m):
+                address = m[addr]
+                if address < 0:
+                    raise IndexError
+                m[dest] = m[address]
+        elif addr >= 0:
+            def step(m):
+                m[dest] = m[addr]
+        else:
+            def step(m):
+                raise IndexError
+        return step
+
+    def address_of(self, instr: IRAddrOf) -> Step:
+        dest = self.address(instr.dest)
+        address = self.address(instr.var)
+
+        def step(m):
+            m[dest] = address
+        return step
+
+    def store(self, instr: IRStoreDeref) -> Step:
+        addr_variable, addr = self.operand(instr.addr)
+        value_variable, value = self.operand(instr.value)
+        if not addr_variable and addr < 0:
+            def step(m):
+                raise IndexError
+        elif addr_variable and value_variable:
+            def step(m):
+                address = m[addr]
+                if address < 0:
+                    raise IndexError
+                m[address] = m[value]
+        elif addr_variable:
+            def step(m):
+                address = m[addr]
+                if address < 0:
+                    raise IndexError
+                m[address] = value
+        elif value_variable:
+            def step(m):
+                m[addr] = m[value]
+        else:
+            def step(m):
+                m[addr] = value
+        return step
+
+
+_DECODERS: Dict[type, Callable[[_Decoder, Instruction], Step]] = {
+    IRAssign: _Decoder.assign,
+    IRBinOp: _Decoder.binary,
+    IRUnOp: _Decoder.unary,
+    IRDeref: _Decoder.deref,
+    IRAddrOf: _Decoder.address_of,
+    IRStoreDeref: _Decoder.store,
+}
+
+
+def _decode_blocks(cfg: ControlFlowGraph, decoder: _Decoder) -> List[tuple]:
+    """Dispatch table of a CFG: (steps, kind, condition, target, following, size) per block, in layout order."""
+    position = {id(block): i for i, block in enumerate(cfg.blocks)}
+    table = []
+    for i, block in enumerate(cfg.blocks):
+        steps = []
+        for instr in block.instructions:
+            decode = _DECODERS.get(type(instr))
+            if decode is None:
+                raise ValueError(f"Cannot execute {type(instr).__name__}: {instr}")
+            steps.append(decode(decoder, instr))
+        following = i + 1 if i + 1 < len(cfg.blocks) else -1
+        terminator = block.terminator
+        kind, condition, target = _FALL, 0, -1
+        if terminator is not None:
+            target_block = cfg.jump_target(block)
+            if target_block is None:
+                raise ValueError(f"Jump to unknown label {terminator.label}")
+            target = position[id(target_block)]
+            kind = _JUMP
+            if isinstance(terminator, IRCondJump):
+                variable, condition = decoder.operand(terminator.cond)
+                if variable:
+                    kind = _BRANCH
+                elif condition:
+                    kind = _FALL    # the jump is never taken
+        size = len(steps) + (terminator is not None)
+        table.append((tuple(steps), kind, condition, target, following, size))
+    return table
+
+
+# =======================
+# Interpreter
+# =======================
+
+class Interpreter:
+    """A ControlFlowGraph decoded for execution; run() can be called many times.
+
+    Decoding reads the blocks once: changes to the CFG afterwards need a
+    new Interpreter. The CFG must not be in SSA form (see ssa.destruct_ssa);
+    a jump to a label without a block raises ValueError while decoding.
+
+    - addresses: Variable or temporary -> its memory address
+    - heap_size: Number of cells before the variables
+    - memory_size: Number of cells in total
+    """
+
+    def __init__(self, cfg: ControlFlowGraph, heap_size: int = 4096):
+        self.cfg = cfg
+        self.heap_size = heap_size
+        decoder = _Decoder(heap_size)
+        # Decoding allocates many small objects and no cycles: collections
+        # would only rescan the CFG
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            table = _decode_blocks(cfg, decoder)
+        finally:
+            if collecting:
+                gc.enable()
+        self._table = table
+        self._blocks = list(cfg.blocks)
+        self._entry = self._blocks.index(cfg.entry_block) if cfg.entry_block is not None else -1
+        self.addresses = decoder.addresses
+        self.memory_size = decoder.next_address
+
+    def run(self, env: Optional[Mapping[str, int]] = None, memory: Optional[Mapping[int, int]] = None,
+            max_steps: Optional[int] = None) -> ExecutionResult:
+        """Run the program from its entry block.
+
+        Args:
+            env: Initial values of variables (others start at 0; names the
+                program does not use are ignored), wrapped to 64 bits
+            memory: Initial values of memory cells, by address, wrapped to 64 bits
+            max_steps: Instructions to run at most (None: no limit)
+
+        Raises:
+            ExecutionError: On an address outside the memory or a division by zero
+            StepLimitExceeded: If the program does not end within max_steps
+        """
+        m = [0] * self.memory_size
+        if memory:
+            for address, value in memory.items():
+                if not 0 <= address < self.memory_size:
+                    raise ValueError(f"Address {address} outside the memory (0..{self.memory_size - 1})")
+                m[address] = _wrap(value)
+        if env:
+            addresses = self.addresses
+            for name, value in env.items():
+                if name in addresses:
+                    m[addresses[name]] = _wrap(value)
+
+        table = self._table
+        limit = max_steps if max_steps is not None else sys.maxsize
+        steps = 0
+        pc = self._entry
+        try:
+            while pc >= 0:
+                body, kind, condition, target, following, size = table[pc]
+                steps += size
+                if steps > limit:
+                    raise StepLimitExceeded(f"More than {max_steps} steps", self._blocks[pc])
+                for step in body:
+                    step(m)
+                if kind == _BRANCH:
+                    pc = following if m[condition] else target
+                elif kind == _JUMP:
+                    pc = target
+                else:
+                    pc = following
+        except IndexError:
+            raise ExecutionError(f"Address outside the memory (0..{self.memory_size - 1})",
+                                 self._blocks[pc]) from None
+        except ZeroDivisionError:
+            raise ExecutionError("Division by zero", self._blocks[pc]) from None
+
+        m = list(map(int, m))
+        variables = {name: m[address] for name, address in self.addresses.items() if not name.startswith("#")}
+        return ExecutionResult(variables, m, steps)
+
+
+def run_cfg(cfg: ControlFlowGraph, env: Optional[Mapping[str, int]] = None,
+            memory: Optional[Mapping[int, int]] = None, max_steps: Optional[int] = None,
+            heap_size: int = 4096) -> ExecutionResult:
+    """Decode and run a CFG once (see Interpreter.run)."""
+    return Interpreter(cfg, heap_size).run(env, memory, max_steps)
@@ -0,0 +1,723 @@
+"""
+IR Optimisation Passes on the CFG
+
+This module rewrites a generated ControlFlowGraph in place:
+1. fold_constants: block-local constant folding plus global constant
+   propagation (reaching definitions, see dataflow.py); conditional jumps
+   on known conditions become jumps or fall-through, blocks that can no
+   longer be reached are removed, and assignments to temporaries that are
+   no longer read are dropped
+2. simplify_cfg: jump threading and empty-block elimination
+3. merge_blocks: straight-line block merging (a block joins its unique
+   predecessor when it is that predecessor's only successor)
+
+Passes keep the blocks printable: str(cfg) read back with ir_parser gives
+the same blocks and edges.
+
+Every pass returns a PassStats with the number of instructions (labels not
+counted) and blocks it removed.
+
+Instructions are never changed in place, since they are shared with
+cfg.linear_ir (which keeps the unoptimised Phase 1 IR); rewritten
+instructions are new objects. cfg.bb_ir is rebuilt from the blocks, so
+str(cfg) prints the optimised program. Block ids and labels are kept,
+except by simplify_cfg and merge_blocks (see renumber_blocks).
+
+Variables whose address is taken (&x) may be changed through pointers, so
+their values are never propagated. Division and remainder are only folded
+for non-negative operands and a non-zero divisor, where truncating and
+flooring division agree, and no result outside the 64-bit range is folded.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from ir_representation import *
+from dataflow import (FORWARD, DataflowProblem, bits, block_order, defined_variable, is_variable,
+                      liveness, reaching_definitions, solve, used_operands)
+
+
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+
+_BINARY = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a // b,
+    '%': lambda a, b: a % b,
+    '<': lambda a, b: int(a < b),
+    '<=': lambda a, b: int(a <= b),
+    '>': lambda a, b: int(a > b),
+    '>=': lambda a, b: int(a >= b),
+    '==': lambda a, b: int(a == b),
+    '!=': lambda a, b: int(a != b),
+    '&&': lambda a, b: int(a != 0 and b != 0),
+    '||': lambda a, b: int(a != 0 or b != 0),
+}
+
+
+# =======================
+# Pass Statistics
+# =======================
+
+@dataclass
+class PassStats:
+    """What one optimisation pass changed.
+
+    counts holds pass-specific counters (e.g. folded instructions).
+    """
+    name: str
+    instructions_removed: int = 0
+    blocks_removed: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def __str__(self):
+        details = "".join(f", {count} {key}" for key, count in self.counts.items())
+        return (f"{self.name}: {self.instructions_removed} instructions and "
+                f"{self.blocks_removed} blocks removed{details}")
+
+
+def address_taken_variables(cfg: ControlFlowGraph) -> Set[str]:
+    """Variables whose address is taken (&x) somewhere in a CFG."""
+    return {instr.var for block in cfg.blocks for instr in block.instructions if isinstance(instr, IRAddrOf)}
+
+
+def instruction_count(cfg: ControlFlowGraph) -> int:
+    """Number of instructions in the blocks of a CFG, terminators included."""
+    return sum(len(block.instructions) + (block.terminator is not None) for block in cfg.blocks)
+
+
+def rebuild_bb_ir(cfg: ControlFlowGraph):
+    """Regenerate cfg.bb_ir from the blocks, in block order."""
+    bb_ir: List[Instruction] = []
+    for block in cfg.blocks:
+        if block.label is not None:
+            bb_ir.append(IRLabel(block.label))
+        bb_ir.extend(block.instructions)
+        if block.terminator is not None:
+            bb_ir.append(block.terminator)
+    cfg.bb_ir = bb_ir
+
+
+def remove_unreachable_blocks(cfg: ControlFlowGraph) -> int:
+    """Remove the blocks that cannot be reached from the entry block.
+
+    The fall-through successor of a reachable block is reachable, so the
+    remaining blocks keep their layout. Returns the number of blocks removed.
+    """
+    if cfg.entry_block is None:
+        return 0
+    edges = cfg.edges
+    reachable = {cfg.entry_block.index}
+    stack = [cfg.entry_block.index]
+    while stack:
+        for target in edges.succ[stack.pop()]:
+            if target not in reachable:
+                reachable.add(target)
+                stack.append(target)
+
+    kept: List[BasicBlock] = []
+    for block in cfg.blocks:
+        if block.index in reachable:
+            kept.append(block)
+            continue
+        if block.label is not None and cfg.label_to_block.get(block.label) is block:
+            del cfg.label_to_block[block.label]
+        edges.remove_block(block.index)
+    removed = len(cfg.blocks) - len(kept)
+    cfg.blocks[:] = kept
+    return removed
+
+
+def remove_empty_fallthrough_blocks(cfg: ControlFlowGraph) -> int:
+    """Remove unlabeled blocks without instructions or jump.
+
+    Such a block is only entered by falling through from the block before
+    it and falls through itself, and the textual IR has no way to show it,
+    so its predecessor falls through to its successor instead. Returns the
+    number of blocks removed.
+    """
+    edges = cfg.edges
+    kept: List[BasicBlock] = []
+    for block in cfg.blocks:
+        if (block.label is not None or block.instructions or block.terminator is not None
+                or block is cfg.entry_block):
+            kept.append(block)
+            continue
+        index = block.index
+        sources, targets = list(edges.pred[index]), list(edges.succ[index])
+        edges.remove_block(index)
+        for source in sources:
+            for target in targets:
+                edges.add_edge(source, target)
+    removed = len(cfg.blocks) - len(kept)
+    cfg.blocks[:] = kept
+    return removed
+
+
+# =======================
+# Constant Folding and Propagation
+# =======================
+
+def fold_binary(op: str, left: int, right: int) -> Optional[int]:
+    """Value of left op right, or None if it must not be folded."""
+    if op in ('/', '%') and (left < 0 or right <= 0):
+        return None
+    function = _BINARY.get(op)
+    if function is None:
+        return None
+    value = function(left, right)
+    return value if _INT_MIN <= value <= _INT_MAX else None
+
+
+def fold_unary(op: str, operand: int) -> Optional[int]:
+    """Value of op operand, or None if it must not be folded."""
+    if op == '-':
+        value = -operand
+        return value if value <= _INT_MAX else None
+    if op == '!':
+        return int(operand == 0)
+    return None
+
+
+class _ConstantFolder:
+    """One round of folding and propagation over all blocks (see fold_constants)."""
+
+    def __init__(self, cfg: ControlFlowGraph, stats: PassStats):
+        self.cfg = cfg
+        self.address_taken = address_taken_variables(cfg)
+        self.stats = stats
+        order = block_order(cfg)
+        self.reaching = reaching_definitions(cfg, order)
+
+        # Variables assigned on every path to each block (forward, must)
+        variable_definitions = self.reaching.variable_definitions
+        self.variable_bits = {name: i for i, name in enumerate(variable_definitions)}
+        gen = [0] * len(cfg.edges.blocks)
+        for block, position in self.reaching.definitions:
+            gen[block.index] |= 1 << self.variable_bits[defined_variable(block.instructions[position])]
+        problem = DataflowProblem(FORWARD, gen, [0] * len(gen), may=False, universe=len(self.variable_bits))
+        self.assigned = solve(cfg, problem, order).block_in
+
+    def constant_at_entry(self, block: BasicBlock, name: str) -> Optional[str]:
+        """Constant value of a variable at the entry of a block (None if unknown).
+
+        It is constant if the variable is assigned on every path to the block
+        and every definition reaching the block assigns the same constant.
+        """
+        if name in self.address_taken:
+            return None
+        position = self.variable_bits.get(name)
+        if position is None or not self.assigned[block.index] >> position & 1:
+            return None
+        reaching = self.reaching.result.block_in[block.index] & self.reaching.variable_definitions[name]
+        value = None
+        for d in bits(reaching):
+            source_block, source_position = self.reaching.definitions[d]
+            instr = source_block.instructions[source_position]
+            if not isinstance(instr, IRAssign) or is_variable(instr.source):
+                return None
+            if value is None:
+                value = instr.source
+            elif instr.source != value:
+                return None
+        return value
+
+    def run(self) -> bool:
+        """Rewrite every block; returns True if anything changed."""
+        changed = False
+        for block in list(self.cfg.blocks):
+            # Skip blocks merged into their predecessor by resolve_branch
+            if block.graph is not None:
+                changed = self.rewrite_block(block) or changed
+        return changed
+
+    def rewrite_block(self, block: BasicBlock) -> bool:
+        """Fold and propagate inside one block, then simplify its terminator."""
+        # Variable -> constant text, or None once assigned a non-constant
+        # value in the block; variables not in it have their entry value
+        local: Dict[str, Optional[str]] = {}
+        counts = self.stats.counts
+        changed = False
+
+        def value(operand: str) -> str:
+            if not is_variable(operand):
+                return operand
+            if operand in local:
+                constant = local[operand]
+            else:
+                constant = local[operand] = self.constant_at_entry(block, operand)
+            if constant is None:
+                return operand
+            counts["propagated"] = counts.get("propagated", 0) + 1
+            return constant
+
+        instructions = block.instructions
+        for i, instr in enumerate(instructions):
+            new = instr
+            if isinstance(instr, IRAssign):
+                source = value(instr.source)
+                if source != instr.source:
+                    new = IRAssign(instr.dest, source)
+            elif isinstance(instr, IRBinOp):
+                left, right = value(instr.left), value(instr.right)
+                folded = None
+                if not is_variable(left) and not is_variable(right):
+                    folded = fold_binary(instr.op, int(left), int(right))
+                if folded is not None:
+                    new = IRAssign(instr.dest, str(folded))
+                    counts["folded"] = counts.get("folded", 0) + 1
+                elif left != instr.left or right != instr.right:
+                    new = IRBinOp(instr.dest, left, instr.op, right)
+            elif isinstance(instr, IRUnOp):
+                operand = value(instr.operand)
+                folded = None if is_variable(operand) else fold_unary(instr.op, int(operand))
+                if folded is not None:
+                    new = IRAssign(instr.dest, str(folded))
+                    counts["folded"] = counts.get("folded", 0) + 1
+                elif operand != instr.operand:
+                    new = IRUnOp(instr.dest, instr.op, operand)
+            elif isinstance(instr, IRDeref):
+                addr = value(instr.addr)
+                if addr != instr.addr:
+                    new = IRDeref(instr.dest, addr)
+            elif isinstance(instr, IRStoreDeref):
+                addr, stored = value(instr.addr), value(instr.value)
+                if addr != instr.addr or stored != instr.value:
+                    new = IRStoreDeref(addr, stored)
+
+            if new is not instr:
+                instructions[i] = new
+                changed = True
+            dest = defined_variable(new)
+            if dest is not None:
+                constant = isinstance(new, IRAssign) and not is_variable(new.source)
+                local[dest] = new.source if constant and dest not in self.address_taken else None
+
+        terminator = block.terminator
+        if isinstance(terminator, IRCondJump):
+            cond = value(terminator.cond)
+            if not is_variable(cond):
+                self.resolve_branch(block, int(cond) == 0)
+                changed = True
+            elif cond != terminator.cond:
+                block.terminator = IRCondJump(cond, terminator.label)
+                changed = True
+        return changed
+
+    def resolve_branch(self, block: BasicBlock, taken: bool):
+        """Replace a conditional jump whose condition is known.
+
+        Args:
+            taken: The jump is always taken (the condition is 0): it becomes
+                an unconditional jump; otherwise control always falls through
+        """
+        edges = self.cfg.edges
+        target = self.cfg.jump_target(block)
+        others = [succ for succ in block.successors if succ is not target]
+        if taken:
+            block.terminator = IRJump(block.terminator.label)
+            for succ in others:
+                edges.remove_edge(block.index, succ.index)
+        else:
+            block.terminator = None
+            if target is not None and others:
+                edges.remove_edge(block.index, target.index)
+            # An unlabeled block after it is only entered from here, and the
+            # textual IR could not tell the two apart any more: merge them
+            if others and others[0].label is None:
+                self.merge_next(block, others[0])
+        counts = self.stats.counts
+        counts["branches"] = counts.get("branches", 0) + 1
+
+    def merge_next(self, block: BasicBlock, following: BasicBlock):
+        """Append the fall-through block (with its terminator and edges) to a block."""
+        edges = self.cfg.edges
+        block.instructions = block.instructions + following.instructions
+        block.terminator = following.terminator
+        successors = list(edges.succ[following.index])
+        edges.remove_block(following.index)
+        for target in successors:
+            edges.add_edge(block.index, target)
+        self.cfg.blocks.remove(following)
+        self.stats.blocks_removed += 1
+
+
+def remove_dead_temporaries(cfg: ControlFlowGraph) -> int:
+    """Drop assignments to temporaries (#n) that are never read.
+
+    Loads (*p) and divisions that may fault are kept. Returns the number
+    of instructions removed.
+    """
+    address_taken = address_taken_variables(cfg)
+    removed = 0
+    while True:
+        live = liveness(cfg)
+        round_removed = 0
+        for block in cfg.blocks:
+            current = live.names(live.result.block_out[block.index])
+            if isinstance(block.terminator, IRCondJump) and is_variable(block.terminator.cond):
+                current.add(block.terminator.cond)
+            kept: List[Instruction] = []
+            for instr in reversed(block.instructions):
+                dest = defined_variable(instr)
+                if (dest is not None and dest.startswith("#") and dest not in current
+                        and _removable(instr)):
+                    round_removed += 1
+                    continue
+                kept.append(instr)
+                if dest is not None:
+                    current.discard(dest)
+                current.update(operand for operand in used_operands(instr) if is_variable(operand))
+                if isinstance(instr, IRDeref):
+                    current.update(address_taken)
+            if len(kept) != len(block.instructions):
+                kept.reverse()
+                block.instructions = kept
+        removed += round_removed
+        if not round_removed:
+            return removed
+
+
+def _removable(instr: Instruction) -> bool:
+    """Check whether an unused assignment has no effect besides its destination."""
+    if isinstance(instr, (IRAssign, IRUnOp, IRAddrOf)):
+        return True
+    if isinstance(instr, IRBinOp):
+        return instr.op not in ('/', '%') or (not is_variable(instr.right) and int(instr.right) != 0)
+    return False
+
+
+def fold_constants(cfg: ControlFlowGraph) -> PassStats:
+    """Constant folding and propagation, in place.
+
+    Rounds of folding and propagation are repeated until nothing changes
+    (a constant found in one round can make another foldable in the next).
+    Conditional jumps on constants are resolved, unreachable blocks removed,
+    and unused temporaries dropped. Running the pass again changes nothing.
+
+    Counters: folded (operations replaced by their value), propagated
+    (operands replaced by a constant), branches (conditional jumps resolved).
+    """
+    stats = PassStats("constants", counts={"folded": 0, "propagated": 0, "branches": 0})
+    instructions_before = instruction_count(cfg)
+
+    # Dropping code can take away the last &x of a variable, which then
+    # becomes a candidate for propagation
+    while True:
+        while _ConstantFolder(cfg, stats).run():
+            stats.blocks_removed += remove_unreachable_blocks(cfg)
+        if not remove_dead_temporaries(cfg):
+            break
+    stats.blocks_removed += remove_empty_fallthrough_blocks(cfg)
+
+    stats.instructions_removed = instructions_before - instruction_count(cfg)
+    rebuild_bb_ir(cfg)
+    return stats
+
+
+# =======================
+# CFG Simplification
+# =======================
+
+def _is_jump_only(block: BasicBlock) -> bool:
+    """Check whether a block holds nothing but an unconditional jump."""
+    return not block.instructions and isinstance(block.terminator, IRJump)
+
+
+def _retarget(jump: Instruction, label: str) -> Instruction:
+    """Copy of a jump or conditional jump with another target."""
+    if isinstance(jump, IRCondJump):
+        return IRCondJump(jump.cond, label)
+    return IRJump(label)
+
+
+def _reachable_blocks(blocks: List[BasicBlock], label_to_block: Dict[str, BasicBlock]) -> List[BasicBlock]:
+    """Blocks reachable from the first one, following jumps and fall-through, in layout order."""
+    if not blocks:
+        return []
+    position = {id(block): i for i, block in enumerate(blocks)}
+    seen = [False] * len(blocks)
+    seen[0] = True
+    stack = [0]
+    while stack:
+        i = stack.pop()
+        block = blocks[i]
+        terminator = block.terminator
+        targets = []
+        if terminator is not None:
+            target = label_to_block.get(terminator.label)
+            if target is not None and id(target) in position:
+                targets.append(position[id(target)])
+        if not isinstance(terminator, IRJump) and i + 1 < len(blocks):
+            targets.append(i + 1)
+        for target in targets:
+            if not seen[target]:
+                seen[target] = True
+                stack.append(target)
+    return [block for i, block in enumerate(blocks) if seen[i]]
+
+
+def _thread_jumps(blocks: List[BasicBlock], label_to_block: Dict[str, BasicBlock], stats: PassStats) -> bool:
+    """Point jumps to a jump-only block at that block's final target."""
+    final: Dict[str, str] = {}     # label -> end of its chain of jump-only blocks
+
+    def resolve(label: str) -> str:
+        path: List[str] = []
+        on_path: Set[str] = set()
+        while label not in final:
+            target = label_to_block.get(label)
+            # A cycle of jump-only blocks (an empty infinite loop) ends the chain
+            if target is None or not _is_jump_only(target) or label in on_path:
+                final[label] = label
+                break
+            path.append(label)
+            on_path.add(label)
+            label = target.terminator.label
+        end = final[label]
+        for label in path:
+            final[label] = end
+        return end
+
+    changed = False
+    for block in blocks:
+        terminator = block.terminator
+        if terminator is None:
+            continue
+        label = resolve(terminator.label)
+        if label != terminator.label:
+            block.terminator = _retarget(terminator, label)
+            stats.counts["threaded"] += 1
+            changed = True
+    return changed
+
+
+def _remove_redundant_jumps(blocks: List[BasicBlock], label_to_block: Dict[str, BasicBlock],
+                            stats: PassStats) -> bool:
+    """Drop jumps to the next block in layout order, which is reached by falling through anyway."""
+    changed = False
+    for block, following in zip(blocks, blocks[1:]):
+        terminator = block.terminator
+        if terminator is not None and label_to_block.get(terminator.label) is following:
+            # Both ways out of a conditional jump lead to the same block
+            block.terminator = None
+            stats.counts["jumps"] += 1
+            changed = True
+    return changed
+
+
+def _remove_empty_blocks(blocks: List[BasicBlock], label_to_block: Dict[str, BasicBlock]) -> List[BasicBlock]:
+    """Drop blocks that do nothing, moving their labels and jumps elsewhere.
+
+    A block without instructions or jump is replaced by the block after it:
+    its label moves there, or becomes an alias of that block's label. A
+    jump-only block entered only by falling through from a block without a
+    jump hands its jump to that block. Returns the kept blocks.
+    """
+    referenced: Dict[str, int] = {}
+    for block in blocks:
+        if block.terminator is not None:
+            referenced[block.terminator.label] = referenced.get(block.terminator.label, 0) + 1
+
+    aliases: Dict[str, str] = {}
+    kept: List[BasicBlock] = []
+    for i, block in enumerate(blocks):
+        label = block.label
+        if not block.instructions and block.terminator is None:
+            following = blocks[i + 1] if i + 1 < len(blocks) else None
+            if following is None:
+                # The program exit: jumps to it need the label
+                if label is not None and referenced.get(label):
+                    kept.append(block)
+                    continue
+            elif label is not None:
+                if following.label is None:
+                    following.label = label
+                    label_to_block[label] = following
+                else:
+                    aliases[label] = following.label
+                    referenced[following.label] = referenced.get(following.label, 0) + referenced.get(label, 0)
+            if label is not None and label_to_block.get(label) is block:
+                del label_to_block[label]
+            continue
+        if (_is_jump_only(block) and kept and kept[-1].terminator is None
+                and (label is None or not referenced.get(label))):
+            kept[-1].terminator = block.terminator
+            if label is not None and label_to_block.get(label) is block:
+                del label_to_block[label]
+            continue
+        kept.append(block)
+
+    if aliases:
+        for block in kept:
+            terminator = block.terminator
+            if terminator is not None and terminator.label in aliases:
+                label = terminator.label
+                while label in aliases:
+                    label = aliases[label]
+                block.terminator = _retarget(terminator, label)
+    return kept
+
+
+def renumber_blocks(cfg: ControlFlowGraph):
+    """Renumber blocks and labels in layout order and rebuild the edges.
+
+    Block ids become positions in cfg.blocks and labels become BB_1, BB_2,
+    ... in order of appearance (jumps are rewritten to match). The edges
+    are derived from the layout: a block's jump target comes first, then
+    the next block unless the block ends with an unconditional jump.
+    """
+    blocks = cfg.blocks
+    names: Dict[str, str] = {}
+    for block in blocks:
+        if block.label is not None:
+            names[block.label] = f"BB_{len(names) + 1}"
+    edges = EdgeStore()
+    label_to_block: Dict[str, BasicBlock] = {}
+    for position, block in enumerate(blocks):
+        block.id = position
+        block.graph = None
+        block._successors = block._predecessors = None
+        edges.add_block(block)
+        if block.label is not None:
+            block.label = names[block.label]
+            label_to_block[block.label] = block
+        terminator = block.terminator
+        if terminator is not None and terminator.label in names and names[terminator.label] != terminator.label:
+            block.terminator = _retarget(terminator, names[terminator.label])
+
+    for block in blocks:
+        terminator = block.terminator
+        if terminator is not None and terminator.label in label_to_block:
+            edges.add_edge(block.index, label_to_block[terminator.label].index)
+        if not isinstance(terminator, IRJump) and block.index + 1 < len(blocks):
+            edges.add_edge(block.index, block.index + 1)
+    cfg.edges = edges
+    cfg.label_to_block = label_to_block
+    cfg.entry_block = blocks[0] if blocks else None
+
+
+def simplify_cfg(cfg: ControlFlowGraph) -> PassStats:
+    """Empty-block elimination and jump threading, in place.
+
+    Repeats until nothing changes: jumps to a jump-only block go straight
+    to its final target, jumps to the next block become fall-through,
+    blocks that do nothing are dropped, and unreachable blocks removed.
+    Then blocks and labels are renumbered (see renumber_blocks). Running
+    the pass again changes nothing.
+
+    Counters: threaded (jumps retargeted), jumps (jumps to the next block
+    removed), edges (edges removed).
+    """
+    stats = PassStats("simplify", counts={"threaded": 0, "jumps": 0, "edges": 0})
+    instructions_before = instruction_count(cfg)
+    blocks_before = len(cfg.blocks)
+    edges_before = cfg.edges.edge_count()
+
+    blocks = list(cfg.blocks)
+    label_to_block = dict(cfg.label_to_block)
+    while True:
+        changed = _thread_jumps(blocks, label_to_block, stats)
+        changed = _remove_redundant_jumps(blocks, label_to_block, stats) or changed
+        kept = _remove_empty_blocks(_reachable_blocks(blocks, label_to_block), label_to_block)
+        if not changed and len(kept) == len(blocks):
+            break
+        blocks = kept
+
+    cfg.blocks[:] = blocks
+    renumber_blocks(cfg)
+    rebuild_bb_ir(cfg)
+
+    stats.instructions_removed = instructions_before - instruction_count(cfg)
+    stats.blocks_removed = blocks_before - len(cfg.blocks)
+    stats.counts["edges"] = edges_before - cfg.edges.edge_count()
+    return stats
+
+
+# =======================
+# Block Merging
+# =======================
+
+def merge_blocks(cfg: ControlFlowGraph) -> PassStats:
+    """Fuse each block into its unique predecessor when that predecessor has no other successor, in place.
+
+    A block that follows its predecessor in the layout is appended to it
+    (a jump to it becomes fall-through). A block elsewhere is moved into
+    its predecessor when it ends with a jump, or falls through to a
+    labeled block (which the merged block then jumps to); a block ending
+    with a conditional jump is only merged where it already follows its
+    predecessor. The entry block is never merged into another. Blocks and
+    labels are then renumbered (see renumber_blocks).
+
+    Counters: edges (edges removed).
+    """
+    stats = PassStats("merge", counts={"edges": 0})
+    instructions_before = instruction_count(cfg)
+    blocks_before = len(cfg.blocks)
+    edges_before = cfg.edges.edge_count()
+
+    edges = cfg.edges
+    blocks = cfg.blocks
+    # Layout as a doubly linked list of positions, so blocks can be unlinked in O(1)
+    position = {block.index: i for i, block in enumerate(blocks)}
+    next_position = list(range(1, len(blocks) + 1))
+    previous_position = list(range(-1, len(blocks) - 1))
+    removed = [False] * len(blocks)
+
+    def unlink(i: int):
+        removed[i] = True
+        before, after = previous_position[i], next_position[i]
+        if before >= 0:
+            next_position[before] = after
+        if after < len(blocks):
+            previous_position[after] = before
+
+    for i, block in enumerate(blocks):
+        if removed[i]:
+            continue
+        while True:
+            successors = edges.succ[block.index]
+            if len(successors) != 1:
+                break
+            target = edges.blocks[successors[0]]
+            if target is block or target is cfg.entry_block or len(edges.pred[target.index]) != 1:
+                break
+            t = position[target.index]
+            terminator = target.terminator
+            if t == next_position[i]:
+                # Only falling through, or a jump that goes there too
+                if block.terminator is not None and cfg.jump_target(block) is not target:
+                    break
+                jump = None
+            else:
+                if not isinstance(block.terminator, IRJump):
+                    break
+                # The block jumps to target; target's own fall-through must become a jump
+                jump = terminator
+                if terminator is None:
+                    after = next_position[t]
+                    if after >= len(blocks) or blocks[after].label is None:
+                        break
+                    jump = IRJump(blocks[after].label)
+                elif not isinstance(terminator, IRJump):
+                    break
+            block.instructions = block.instructions + target.instructions
+            block.terminator = terminator if jump is None else jump
+            if target.label is not None and cfg.label_to_block.get(target.label) is target:
+                del cfg.label_to_block[target.label]
+            target_successors = list(edges.succ[target.index])
+            edges.remove_block(target.index)
+            for successor in target_successors:
+                edges.add_edge(block.index, successor)
+            unlink(t)
+
+    cfg.blocks[:] = [block for i, block in enumerate(blocks) if not removed[i]]
+    # A jump-only block can take in an empty one and end up with nothing
+    remove_empty_fallthrough_blocks(cfg)
+    renumber_blocks(cfg)
+    rebuild_bb_ir(cfg)
+
+    stats.instructions_removed = instructions_before - instruction_count(cfg)
+    stats.blocks_removed = blocks_before - len(cfg.blocks)
+    stats.counts["edges"] = edges_before - cfg.edges.edge_count()
+    return stats
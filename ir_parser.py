@@ -0,0 +1,154 @@
+"""
+Reader for the Textual IR Format
+
+This module reads back the IR text that ControlFlowGraph.__str__,
+print_blocks_structure, write_bb_ir and the Markdown reports write:
+
+    BB_1:
+        #0 = (i < n)
+        if (! #0) then jmp BB_2
+        x = #1
+
+1. Each line is one instruction, recognised from its tokens alone (no
+   backtracking, no regular expressions), so reading is linear in the text
+2. Lines can be read from any iterable, e.g. an open file, so a dump is
+   never held in memory as one string
+3. read_cfg rebuilds blocks and edges with BlockBuilder, keeping the labels
+   as written
+
+For IR produced by generate_cfg, str(parse_cfg(str(cfg))) == str(cfg), and
+the blocks and edges are the same as cfg's. Phi functions are not read: a
+CFG in SSA form (ssa.construct_ssa) must be printed after destruct_ssa.
+"""
+
+from typing import Iterable, Iterator, List
+from ir_representation import *
+from block_builder import BlockBuilder
+
+
+class IRParseError(ValueError):
+    """Line of IR text that is not an instruction or a label."""
+
+    def __init__(self, message: str, line: int):
+        self.line = line
+        super().__init__(f"line {line}: {message}")
+
+
+# =======================
+# Instructions
+# =======================
+
+def parse_instruction(text: str) -> Instruction:
+    """Parse one line of IR (a label or an instruction, indentation optional).
+
+    Raises:
+        ValueError: If the line is not in the format the IR classes print
+    """
+    tokens = text.split()
+    count = len(tokens)
+    if count == 0:
+        raise ValueError("empty line")
+    first = tokens[0]
+
+    if count == 1:
+        if first.endswith(":") and len(first) > 1:
+            return IRLabel(first[:-1])
+    elif tokens[1] == "=":
+        if count > 2 and tokens[2].startswith("phi("):
+            raise ValueError("phi function: CFG is in SSA form; call destruct_ssa before printing it")
+        if count == 3:
+            # dest = source, dest = *addr, dest = &var, *addr = value
+            source = tokens[2]
+            if first[0] == "*" and len(first) > 1:
+                return IRStoreDeref(first[1:], source)
+            if source[0] == "*" and len(source) > 1:
+                return IRDeref(first, source[1:])
+            if source[0] == "&" and len(source) > 1:
+                return IRAddrOf(first, source[1:])
+            return IRAssign(first, source)
+        if count == 4:
+            return IRUnOp(first, tokens[2], tokens[3])
+        if count == 5:
+            # Comparison and logical operators are printed in parentheses
+            left, right = tokens[2], tokens[4]
+            if left[0] == "(" and right[-1] == ")" and len(left) > 1 and len(right) > 1:
+                left, right = left[1:], right[:-1]
+            return IRBinOp(first, left, tokens[3], right)
+    elif first == "jmp":
+        if count == 2:
+            return IRJump(tokens[1])
+    elif first == "if":
+        # if (! cond) then jmp label
+        if (count == 6 and tokens[1] == "(!" and tokens[2][-1] == ")" and len(tokens[2]) > 1
+                and tokens[3] == "then" and tokens[4] == "jmp"):
+            return IRCondJump(tokens[2][:-1], tokens[5])
+    raise ValueError(f"not an IR instruction: {text.strip()!r}")
+
+
+def read_ir(lines: Iterable[str]) -> Iterator[Instruction]:
+    """Instructions of IR text given line by line (blank lines are skipped).
+
+    Raises:
+        IRParseError: On the first line that cannot be parsed
+    """
+    for number, line in enumerate(lines, 1):
+        if line.isspace() or not line:
+            continue
+        try:
+            yield parse_instruction(line)
+        except ValueError as e:
+            raise IRParseError(str(e), number) from None
+
+
+def parse_ir(text: str) -> List[Instruction]:
+    """Instructions of an IR text."""
+    return list(read_ir(text.splitlines()))
+
+
+# =======================
+# Control Flow Graphs
+# =======================
+
+def read_cfg(lines: Iterable[str], rename_labels: bool = False) -> ControlFlowGraph:
+    """Rebuild a CFG from IR text given line by line.
+
+    Blocks start at every label and after every jump, and edges follow
+    the jumps and fall-through, as in generate_cfg.
+
+    Args:
+        lines: IR text, e.g. an open file
+        rename_labels: Rename labels to BB_1, BB_2, ... in order of
+            appearance (for linear IR with LABEL_ labels); by default
+            the labels are kept as written
+
+    Returns:
+        The CFG; linear_ir holds the instructions as read, bb_ir the IR
+        with the final labels
+    """
+    builder = BlockBuilder(rename_labels=rename_labels)
+    instructions: List[Instruction] = []
+    builder.feed(_recording(read_ir(lines), instructions))
+    blocks = builder.finish()
+    cfg = ControlFlowGraph(blocks, builder.edges, builder.label_to_block)
+    cfg.linear_ir = instructions
+    cfg.bb_ir = builder.bb_instructions
+    return cfg
+
+
+def _recording(instructions: Iterator[Instruction], record: List[Instruction]) -> Iterator[Instruction]:
+    """Pass instructions through, appending each one to record."""
+    append = record.append
+    for instr in instructions:
+        append(instr)
+        yield instr
+
+
+def parse_cfg(text: str, rename_labels: bool = False) -> ControlFlowGraph:
+    """Rebuild a CFG from an IR text (see read_cfg)."""
+    return read_cfg(text.splitlines(), rename_labels)
+
+
+def load_cfg(path: str, rename_labels: bool = False) -> ControlFlowGraph:
+    """Rebuild a CFG from an IR file, reading it line by line (see read_cfg)."""
+    with open(path, encoding="utf-8") as f:
+        return read_cfg(f, rename_labels)
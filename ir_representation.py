@@ -8,7 +8,7 @@ This module defines:
 """
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, TextIO
 
 
 # =======================
@@ -130,8 +130,25 @@ class IRJump:
         return f"jmp {self.label}"
 
 
+@dataclass
+class IRPhi:
+    """SSA phi function: dest = phi(value for each predecessor)
+
+    Only in SSA form (see ssa.py); sources maps the index of each
+    predecessor block (block.index) to the value arriving from it.
+
+    Example: x.3 = phi(B1: x.1, B4: x.2)
+    """
+    dest: str
+    sources: Dict[int, str]
+
+    def __str__(self):
+        arguments = ", ".join(f"B{index}: {value}" for index, value in self.sources.items())
+        return f"{self.dest} = phi({arguments})"
+
+
 # Type alias for any IR instruction
-Instruction = IRAssign | IRBinOp | IRUnOp | IRDeref | IRAddrOf | IRStoreDeref | IRLabel | IRCondJump | IRJump
+Instruction = IRAssign | IRBinOp | IRUnOp | IRDeref | IRAddrOf | IRStoreDeref | IRLabel | IRCondJump | IRJump | IRPhi
 
 
 # =======================
@@ -148,6 +165,12 @@ class BasicBlock:
     - terminator: The jump instruction ending this block (if any)
     - successors: List of successor blocks (outgoing edges)
     - predecessors: List of predecessor blocks (incoming edges)
+    - graph / index: The EdgeStore holding this block's edges and the
+      block's position in it (None / -1 while the block is standalone)
+
+    Edges of a standalone block are kept on the block itself; once the block
+    belongs to an EdgeStore (e.g. as part of a ControlFlowGraph) they are
+    read from the store.
     """
     
     def __init__(self, block_id: int):
@@ -155,8 +178,30 @@ class BasicBlock:
         self.label: Optional[str] = None
         self.instructions: List[Instruction] = []
         self.terminator: Optional[Instruction] = None  # IRJump or IRCondJump
-        self.successors: List['BasicBlock'] = []
-        self.predecessors: List['BasicBlock'] = []
+        self.graph: Optional['EdgeStore'] = None
+        self.index = -1
+        # Standalone edges, created on first use: dicts used as
+        # insertion-ordered sets of blocks
+        self._successors: Optional[Dict['BasicBlock', None]] = None
+        self._predecessors: Optional[Dict['BasicBlock', None]] = None
+
+    @property
+    def successors(self) -> List['BasicBlock']:
+        """Successor blocks (outgoing edges), in insertion order."""
+        graph = self.graph
+        if graph is None:
+            return list(self._successors) if self._successors else []
+        blocks = graph.blocks
+        return [blocks[i] for i in graph.succ[self.index]]
+
+    @property
+    def predecessors(self) -> List['BasicBlock']:
+        """Predecessor blocks (incoming edges), in insertion order."""
+        graph = self.graph
+        if graph is None:
+            return list(self._predecessors) if self._predecessors else []
+        blocks = graph.blocks
+        return [blocks[i] for i in graph.pred[self.index]]
     
     def add_instruction(self, instr: Instruction):
         """Add an instruction to this block."""
@@ -166,12 +211,35 @@ class BasicBlock:
         """Set the terminating jump instruction."""
         self.terminator = instr
     
-    def add_successor(self, block: 'BasicBlock'):
-        """Add a successor block and update bidirectional edges."""
-        if block not in self.successors:
-            self.successors.append(block)
-        if self not in block.predecessors:
-            block.predecessors.append(self)
+    def add_successor(self, block: 'BasicBlock', first: bool = False, link_back: bool = True):
+        """Add a successor block and update bidirectional edges.
+
+        Args:
+            block: The successor block
+            first: Put the edge before the existing successors
+                (a jump target precedes the fall-through successor)
+            link_back: Also record self as a predecessor of block
+                (standalone blocks only; an EdgeStore always keeps both sides)
+        """
+        graph = self.graph
+        if graph is not None and graph is block.graph:
+            graph.add_edge(self.index, block.index, first)
+            return
+        if graph is not None or block.graph is not None:
+            raise ValueError(f"Blocks {self.id} and {block.id} belong to different graphs")
+
+        successors = self._successors
+        if successors is None:
+            successors = self._successors = {}
+        if block not in successors:
+            if first and successors:
+                self._successors = {block: None, **successors}
+            else:
+                successors[block] = None
+        if link_back:
+            if block._predecessors is None:
+                block._predecessors = {}
+            block._predecessors[self] = None
     
     def __str__(self):
         """Pretty-print the basic block with proper formatting."""
@@ -195,18 +263,166 @@ class BasicBlock:
         return f"BasicBlock(id={self.id}, label={self.label}, instrs={len(self.instructions)})"
 
 
+# =======================
+# Edge Store
+# =======================
+
+class EdgeStore:
+    """Control flow edges of a set of blocks, stored by integer block index.
+
+    - blocks[i]: The block with index i (None once removed)
+    - succ[i]: Successor indices of block i, in order (jump target first)
+    - pred[i]: Predecessor indices of block i, as a dict used as an
+      insertion-ordered set
+    - version: Counter increased by every change, so results computed from
+      the edges (see dominance.py) can tell whether they are still valid
+
+    Edge membership is answered by pred, so adding and testing an edge are
+    O(1) however large the fan-in, while iteration order (and therefore all
+    printed output) stays deterministic. A block ends with at most one jump,
+    so successor lists stay short and are kept as plain lists.
+    """
+
+    def __init__(self):
+        self.blocks: List[Optional[BasicBlock]] = []
+        self.succ: List[List[int]] = []
+        self.pred: List[Dict[int, None]] = []
+        self.version = 0
+        self.removed = 0    # number of empty slots
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[BasicBlock]) -> 'EdgeStore':
+        """Create a store for standalone blocks, taking over their edges.
+
+        Edges to blocks outside the given ones are dropped.
+        """
+        store = cls()
+        blocks = list(blocks)
+        for block in blocks:
+            store.add_block(block)
+        for block in blocks:
+            if block._successors:
+                store.succ[block.index] = [s.index for s in block._successors if s.graph is store]
+            if block._predecessors:
+                store.pred[block.index] = {p.index: None for p in block._predecessors if p.graph is store}
+            block._successors = block._predecessors = None
+        return store
+
+    def add_block(self, block: BasicBlock) -> int:
+        """Register a block, returning its index."""
+        if block.graph is not None:
+            raise ValueError(f"Block {block.id} already belongs to a graph")
+        block.graph = self
+        block.index = len(self.blocks)
+        self.blocks.append(block)
+        self.succ.append([])
+        self.pred.append({})
+        self.version += 1
+        return block.index
+
+    def add_edge(self, src: int, dst: int, first: bool = False):
+        """Add the edge src -> dst (no-op if present).
+
+        Args:
+            src, dst: Block indices
+            first: Put the edge before the existing successors of src
+        """
+        pred = self.pred[dst]
+        if src not in pred:
+            pred[src] = None
+            self.version += 1
+            if first:
+                self.succ[src].insert(0, dst)
+            else:
+                self.succ[src].append(dst)
+
+    def remove_block(self, index: int):
+        """Remove a block and all its edges.
+
+        The slot stays empty (blocks[index] is None), so the indices of the
+        other blocks do not change until compact(). The block becomes
+        standalone, without edges.
+        """
+        block = self.blocks[index]
+        for dst in self.succ[index]:
+            del self.pred[dst][index]
+        for src in self.pred[index]:
+            if src != index:
+                self.succ[src].remove(index)
+        self.succ[index] = []
+        self.pred[index] = {}
+        self.blocks[index] = None
+        self.removed += 1
+        self.version += 1
+        block.graph = None
+        block.index = -1
+
+    def compact(self):
+        """Drop the empty slots, renumbering the remaining blocks in order.
+
+        Block indices change, so index-based results computed before (e.g.
+        cached analyses) are invalidated through version.
+        """
+        if not self.removed:
+            return
+        live = [index for index, block in enumerate(self.blocks) if block is not None]
+        renumber = [-1] * len(self.blocks)
+        for new, old in enumerate(live):
+            renumber[old] = new
+            self.blocks[old].index = new
+        self.blocks = [self.blocks[old] for old in live]
+        self.succ = [[renumber[dst] for dst in self.succ[old]] for old in live]
+        self.pred = [{renumber[src]: None for src in self.pred[old]} for old in live]
+        self.removed = 0
+        self.version += 1
+
+    def remove_edge(self, src: int, dst: int):
+        """Remove the edge src -> dst if present."""
+        if self.pred[dst].pop(src, 0) is None:
+            self.succ[src].remove(dst)
+            self.version += 1
+
+    def has_edge(self, src: int, dst: int) -> bool:
+        """Check whether the edge src -> dst exists."""
+        return src in self.pred[dst]
+
+    def edge_count(self) -> int:
+        """Total number of edges."""
+        return sum(len(pred) for pred in self.pred)
+
+    def __len__(self):
+        return len(self.blocks)
+
+
 # =======================
 # Control Flow Graph
 # =======================
 
 class ControlFlowGraph:
-    """Control Flow Graph consisting of basic blocks."""
+    """Control Flow Graph consisting of basic blocks.
+
+    Edges are kept in self.edges (an EdgeStore indexed by block.index, which
+    is the position in self.blocks unless blocks were replaced later, as
+    incremental.py does). Standalone blocks passed in are attached to a new store.
+    Jump targets are looked up in self.label_to_block (label -> block),
+    which is taken from the builder or built here in one pass.
+    """
     
-    def __init__(self, blocks: List[BasicBlock]):
+    def __init__(self, blocks: List[BasicBlock], edges: Optional[EdgeStore] = None,
+                 label_to_block: Optional[Dict[str, BasicBlock]] = None):
         self.blocks = blocks
+        self.edges = edges if edges is not None else EdgeStore.from_blocks(blocks)
+        if label_to_block is None:
+            label_to_block = {}
+            for block in blocks:
+                if block.label is not None:
+                    label_to_block.setdefault(block.label, block)
+        self.label_to_block = label_to_block
         self.entry_block = blocks[0] if blocks else None
         self.linear_ir: List[Instruction] = []  # LABEL version (expression splitting phase)
         self.bb_ir: List[Instruction] = []      # BB version (basic block phase)
+        self.stats = None   # GenerationStats (cfg_generator), if generated with collect_stats=True
+        self.analyses: Dict[str, tuple] = {}   # cached analysis results (dominance.py)
     
     def __str__(self):
         """Print all blocks in order (using BB version)."""
@@ -260,6 +476,16 @@ class ControlFlowGraph:
             else:
                 print(f"    {instr}")
     
+    def block_for_label(self, label: str) -> Optional[BasicBlock]:
+        """Find the block starting with the given label (None if unknown)."""
+        return self.label_to_block.get(label)
+    
+    def jump_target(self, block: BasicBlock) -> Optional[BasicBlock]:
+        """Find the block a block's terminator jumps to (None if no jump)."""
+        if isinstance(block.terminator, (IRJump, IRCondJump)):
+            return self.label_to_block.get(block.terminator.label)
+        return None
+    
     def print_graph_info(self):
         """Print CFG structure information (for debugging)."""
         print(f"Control Flow Graph with {len(self.blocks)} blocks:")
@@ -284,89 +510,16 @@ class ControlFlowGraph:
         
         # Generate nodes for each block
         for block in self.blocks:
-            block_id = f"B{block.id}"
-            
-            # Show only regular instructions (no jumps)
-            if block.instructions:
-                content = []
-                for instr in block.instructions:
-                    instr_str = str(instr)
-                    # Escape special characters (only quotes and &)
-                    instr_str = instr_str.replace('"', "'")
-                    instr_str = instr_str.replace('&', '&amp;')
-                    content.append(instr_str)
-                
-                # Join with <br/>
-                content_str = "<br/>".join(content)
-                
-                # Rectangle node (regular basic block)
-                lines.append(f'    {block_id}["{content_str}"]')
-            else:
-                # Empty block
-                lines.append(f'    {block_id}["(empty)"]')
-            
-            # If there's a conditional jump, create diamond decision node
-            if isinstance(block.terminator, IRCondJump):
-                cond_id = f"C{block.id}"
-                cond = block.terminator.cond
-                # Escape special characters (only &, < > can remain in condition)
-                cond = cond.replace('&', '&amp;')
-                # Diamond node (single curly braces)
-                lines.append(f'    {cond_id}{{{cond}}}')
+            lines.extend(mermaid_node_lines(block))
         
         lines.append("")
         
         # Generate edges
         for block in self.blocks:
-            block_id = f"B{block.id}"
-            
-            if isinstance(block.terminator, IRCondJump):
-                # Conditional jump: basic block -> diamond -> true/false branches
-                cond_id = f"C{block.id}"
-                lines.append(f"    {block_id} --> {cond_id}")
-                
-                # False branch: jump to target
-                target_label = block.terminator.label
-                false_target = None
-                for b in self.blocks:
-                    if b.label == target_label:
-                        false_target = b
-                        break
-                
-                # True branch: fall-through to next block
-                true_target = None
-                if len(block.successors) == 2:
-                    for succ in block.successors:
-                        if succ != false_target:
-                            true_target = succ
-                            break
-                
-                if false_target:
-                    lines.append(f"    {cond_id} -->|false| B{false_target.id}")
-                if true_target:
-                    lines.append(f"    {cond_id} -->|true| B{true_target.id}")
-                
-            elif isinstance(block.terminator, IRJump):
-                # Unconditional jump: direct connection
-                target_label = block.terminator.label
-                for b in self.blocks:
-                    if b.label == target_label:
-                        lines.append(f"    {block_id} --> B{b.id}")
-                        break
-            else:
-                # No jump: fall-through
-                if block.successors:
-                    for succ in block.successors:
-                        lines.append(f"    {block_id} --> B{succ.id}")
-                elif not block.successors:
-                    # Exit
-                    lines.append(f"    {block_id} --> Exit([Exit])")
+            lines.extend(mermaid_edge_lines(block, self.jump_target(block)))
         
         # Styles
-        lines.append("")
-        if self.entry_block:
-            lines.append(f"    style B{self.entry_block.id} fill:#e1f5e1")
-        lines.append("    style Exit fill:#ffe1e1")
+        lines.extend(mermaid_style_lines(self.entry_block.id if self.entry_block else None))
         
         return "\n".join(lines)
     
@@ -378,3 +531,140 @@ class ControlFlowGraph:
             f.write("\n```\n")
         print(f"Mermaid diagram saved to: {filename}")
 
+
+# =======================
+# Mermaid and Text Writers
+# =======================
+
+def mermaid_node_lines(block: BasicBlock) -> List[str]:
+    """Mermaid node declarations for one block (plus its decision diamond)."""
+    lines = []
+    block_id = f"B{block.id}"
+    
+    # Show only regular instructions (no jumps)
+    if block.instructions:
+        content = []
+        for instr in block.instructions:
+            instr_str = str(instr)
+            # Escape special characters (only quotes and &)
+            instr_str = instr_str.replace('"', "'")
+            instr_str = instr_str.replace('&', '&amp;')
+            content.append(instr_str)
+        
+        # Join with <br/>
+        content_str = "<br/>".join(content)
+        
+        # Rectangle node (regular basic block)
+        lines.append(f'    {block_id}["{content_str}"]')
+    else:
+        # Empty block
+        lines.append(f'    {block_id}["(empty)"]')
+    
+    # If there's a conditional jump, create diamond decision node
+    if isinstance(block.terminator, IRCondJump):
+        cond_id = f"C{block.id}"
+        cond = block.terminator.cond
+        # Escape special characters (only &, < > can remain in condition)
+        cond = cond.replace('&', '&amp;')
+        # Diamond node (single curly braces)
+        lines.append(f'    {cond_id}{{{cond}}}')
+    
+    return lines
+
+
+def mermaid_edge_lines(block: BasicBlock, jump_target: Optional[BasicBlock]) -> List[str]:
+    """Mermaid edges leaving one block.
+    
+    Args:
+        block: The source block
+        jump_target: The block labelled with the terminator's target (None if
+            there is no jump or the label is unknown)
+    """
+    lines = []
+    block_id = f"B{block.id}"
+    
+    if isinstance(block.terminator, IRCondJump):
+        # Conditional jump: basic block -> diamond -> true/false branches
+        cond_id = f"C{block.id}"
+        lines.append(f"    {block_id} --> {cond_id}")
+        
+        # False branch: jump to target
+        false_target = jump_target
+        
+        # True branch: fall-through to next block
+        true_target = None
+        if len(block.successors) == 2:
+            for succ in block.successors:
+                if succ != false_target:
+                    true_target = succ
+                    break
+        
+        if false_target:
+            lines.append(f"    {cond_id} -->|false| B{false_target.id}")
+        if true_target:
+            lines.append(f"    {cond_id} -->|true| B{true_target.id}")
+        
+    elif isinstance(block.terminator, IRJump):
+        # Unconditional jump: direct connection
+        if jump_target:
+            lines.append(f"    {block_id} --> B{jump_target.id}")
+    else:
+        # No jump: fall-through
+        if block.successors:
+            for succ in block.successors:
+                lines.append(f"    {block_id} --> B{succ.id}")
+        elif not block.successors:
+            # Exit
+            lines.append(f"    {block_id} --> Exit([Exit])")
+    
+    return lines
+
+
+def mermaid_style_lines(entry_id: Optional[int]) -> List[str]:
+    """Trailing Mermaid style lines (entry and exit colouring)."""
+    lines = [""]
+    if entry_id is not None:
+        lines.append(f"    style B{entry_id} fill:#e1f5e1")
+    lines.append("    style Exit fill:#ffe1e1")
+    return lines
+
+
+def write_bb_ir(blocks: Iterable[BasicBlock], out: TextIO):
+    """Write the BB_ textual IR of a block stream, one block at a time.
+    
+    Produces the same text as str(cfg), followed by a newline.
+    """
+    for block in blocks:
+        out.write(str(block))
+        out.write("\n")
+
+
+def write_mermaid(blocks: Iterable[BasicBlock], out: TextIO):
+    """Write a Mermaid flowchart for a block stream, starting immediately.
+    
+    Each block's node and edge lines are written as it arrives (Mermaid
+    accepts edges to nodes declared later), so nothing but the entry id is
+    kept. Produces the node, edge and style lines of cfg.to_mermaid(), with
+    each block's edges right after its nodes instead of after all nodes, and
+    no trailing newline.
+    """
+    out.write("flowchart TD")
+    # Only the id is kept: holding the block would keep every later block alive
+    entry_id = None
+    
+    for block in blocks:
+        if entry_id is None:
+            entry_id = block.id
+        
+        # Streamed blocks are final: the jump target is one of the successors
+        jump_target = None
+        if isinstance(block.terminator, (IRJump, IRCondJump)):
+            for succ in block.successors:
+                if succ.label == block.terminator.label:
+                    jump_target = succ
+                    break
+        for line in mermaid_node_lines(block) + mermaid_edge_lines(block, jump_target):
+            out.write("\n" + line)
+    
+    for line in mermaid_style_lines(entry_id):
+        out.write("\n" + line)
@@ -9,6 +9,7 @@ import sys
 from ast_definition import *
 from ir_representation import *
 from cfg_generator import CFGGenerator
+from cfg_cache import CFGArtifacts, CFGCache
 
 
 def print_test_header(test_num: int, test_name: str, source_program):
@@ -272,13 +273,20 @@ def run_all_tests():
     print("#" * 70)
 
 
-def generate_mermaid_files():
-    """生成所有测试用例的 Mermaid 流程图文件"""
+def generate_mermaid_files(cache: CFGCache = None):
+    """生成所有测试用例的 Mermaid 流程图文件
+    
+    Args:
+        cache: 若提供，未修改的程序直接复用缓存中的 IR 和 Mermaid 文本
+    """
     
     def save_mermaid(test_num: int, test_name: str, source: str, program: Com, output_file: str):
         """生成并保存 Mermaid 流程图"""
-        generator = CFGGenerator()
-        cfg = generator.generate_cfg(program)
+        if cache is not None:
+            artifacts = cache.get_or_build(program)
+        else:
+            generator = CFGGenerator()
+            artifacts = CFGArtifacts.from_cfg(generator.generate_cfg(program))
         
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(f"# 测试 {test_num}: {test_name}\n\n")
@@ -286,25 +294,17 @@ def generate_mermaid_files():
             
             f.write("## 阶段1：表达式拆分 (LABEL)\n\n")
             f.write("```\n")
-            for instr in cfg.linear_ir:
-                if hasattr(instr, 'name'):
-                    f.write(f"{instr.name}:\n")
-                else:
-                    f.write(f"    {instr}\n")
+            f.write(artifacts.linear_ir)
             f.write("```\n\n")
             
             f.write("## 阶段2：基本块 (BB)\n\n")
             f.write("```\n")
-            for instr in cfg.bb_ir:
-                if hasattr(instr, 'name'):
-                    f.write(f"{instr.name}:\n")
-                else:
-                    f.write(f"    {instr}\n")
+            f.write(artifacts.bb_ir)
             f.write("```\n\n")
             
             f.write("## 阶段3：控制流图\n\n")
             f.write("```mermaid\n")
-            f.write(cfg.to_mermaid())
+            f.write(artifacts.mermaid)
             f.write("\n```\n")
         
         print(f"  ✓ 测试 {test_num}: {test_name}")
@@ -428,6 +428,8 @@ def generate_mermaid_files():
     print("=" * 80)
     print("✅ Mermaid 文件生成完成")
     print("=" * 80)
+    if cache is not None:
+        print(f"缓存: {cache.stats}")
     print(f"""
 所有 Mermaid 流程图已保存到 {output_dir}/ 目录
 
@@ -440,7 +442,12 @@ def generate_mermaid_files():
 if __name__ == "__main__":
     # 根据命令行参数决定是否生成文件
     if len(sys.argv) > 1 and sys.argv[1] == "--generate":
-        generate_mermaid_files()
+        # --cache：复用 .cfg_cache/ 中未修改程序的结果
+        generate_mermaid_files(CFGCache() if "--cache" in sys.argv[2:] else None)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--check":
+        # 各功能的正确性检查（小规模，不计时），同 python benchmark.py --check
+        from benchmark import CHECKS, run_checks
+        sys.exit(0 if run_checks(list(CHECKS)) else 1)
     else:
         run_all_tests()
         print("\n" + "=" * 70)
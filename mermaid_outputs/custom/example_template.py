@@ -13,6 +13,7 @@
 from ast_definition import *
 from ir_representation import *
 from cfg_generator import CFGGenerator
+from whiled_parser import parse_program
 import os
 
 def save_mermaid(name: str, source: str, program: Com, output_file: str):
@@ -56,14 +57,17 @@ def save_mermaid(name: str, source: str, program: Com, output_file: str):
 # 测试名称
 test_name = "我的测试用例"
 
-# 源程序（用于显示）
+# 源程序（WhileD 语法，见 whiled_parser.py）
 source = "x = a + b"
 
-# 构建 AST
-program = CAsgnVar(
-    "x",
-    EBinop("+", EVar("a"), EVar("b"))
-)
+# 解析源程序得到 AST
+program = parse_program(source)
+
+# 也可以手工构建 AST：
+# program = CAsgnVar(
+#     "x",
+#     EBinop("+", EVar("a"), EVar("b"))
+# )
 
 # ============================================
 # 生成文件
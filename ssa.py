@@ -0,0 +1,509 @@
+"""
+Static Single Assignment Form for the CFG
+
+This module converts a ControlFlowGraph to SSA form and back, in place:
+1. construct_ssa: pruned SSA. Phi functions (IRPhi) are placed on the
+   iterated dominance frontiers of each variable's definitions (see
+   dominance.py), only where the variable is live (see dataflow.py); then
+   a walk of the dominator tree renames every definition to a new version
+   x.1, x.2, ... (temporaries too: #0.1, ...). A use that no definition
+   reaches keeps the plain name, which stands for the value on entry
+2. destruct_ssa: back to phi-free IR. Versions of a variable that do not
+   interfere are coalesced back to its name, the phi functions left over
+   become copies at the end of the predecessors (split critical edges get
+   a block of their own), and copies that must happen at once (a swap)
+   go through a temporary
+
+Variables are the program's results: their final values are recorded for
+every exit block (SSAForm.exit_values) and copied back to the plain names
+by destruct_ssa, so optimisations may work on the versions in between.
+
+Variables whose address is taken (&x) may be changed through pointers, so
+they are not renamed (SSAForm.memory).
+
+Instructions are never changed in place (they are shared with
+cfg.linear_ir); renamed instructions are new objects. cfg.bb_ir is
+rebuilt from the blocks.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from ir_representation import *
+from dataflow import BACKWARD, DataflowProblem, defined_variable, liveness, solve, used_operands
+from dominance import dominators
+from ir_optimizer import (PassStats, address_taken_variables, rebuild_bb_ir, remove_empty_fallthrough_blocks,
+                          remove_unreachable_blocks)
+
+
+# =======================
+# SSA Form
+# =======================
+
+@dataclass
+class SSAForm:
+    """A CFG in SSA form, as built by construct_ssa.
+
+    - cfg: The graph, rewritten in place
+    - original: SSA name -> the variable it is a version of
+    - exit_values: Exit block index -> {variable: operand holding its final
+      value}, for every renamed variable that is not a temporary
+    - memory: Address-taken variables, which keep their names
+    - phis: Number of phi functions placed
+    - added: Empty blocks construct_ssa added (removed again by
+      destruct_ssa if still empty)
+    """
+    cfg: ControlFlowGraph
+    original: Dict[str, str] = field(default_factory=dict)
+    exit_values: Dict[int, Dict[str, str]] = field(default_factory=dict)
+    memory: Set[str] = field(default_factory=set)
+    phis: int = 0
+    added: List[BasicBlock] = field(default_factory=list)
+
+
+def rename_instruction(instr: Instruction, use: Callable[[str], str], dest: Optional[str] = None) -> Instruction:
+    """Copy of an instruction with its operands mapped by use and its destination replaced by dest.
+
+    The instruction itself is returned if nothing changes. Neither the
+    variable of &x nor the target of a jump is an operand.
+    """
+    if isinstance(instr, IRAssign):
+        new = IRAssign(dest or instr.dest, use(instr.source))
+    elif isinstance(instr, IRBinOp):
+        new = IRBinOp(dest or instr.dest, use(instr.left), instr.op, use(instr.right))
+    elif isinstance(instr, IRUnOp):
+        new = IRUnOp(dest or instr.dest, instr.op, use(instr.operand))
+    elif isinstance(instr, IRDeref):
+        new = IRDeref(dest or instr.dest, use(instr.addr))
+    elif isinstance(instr, IRAddrOf):
+        new = IRAddrOf(dest or instr.dest, instr.var)
+    elif isinstance(instr, IRStoreDeref):
+        new = IRStoreDeref(use(instr.addr), use(instr.value))
+    elif isinstance(instr, IRCondJump):
+        new = IRCondJump(use(instr.cond), instr.label)
+    else:
+        return instr
+    return instr if new == instr else new
+
+
+def phi_functions(block: BasicBlock) -> List[IRPhi]:
+    """Phi functions at the start of a block."""
+    phis = []
+    for instr in block.instructions:
+        if not isinstance(instr, IRPhi):
+            break
+        phis.append(instr)
+    return phis
+
+
+# =======================
+# Construction
+# =======================
+
+def construct_ssa(cfg: ControlFlowGraph) -> SSAForm:
+    """Convert a CFG to pruned SSA form, in place.
+
+    Unreachable blocks are removed first. If the entry block has
+    predecessors (a loop starts the program), an empty block is put before
+    it, so phi functions there have an edge for the value on entry; if the
+    last block ends with a conditional jump (the program can end by
+    falling through it), an empty block is appended, so every exit is a
+    block without successors.
+    """
+    remove_unreachable_blocks(cfg)
+    ssa = SSAForm(cfg, memory=address_taken_variables(cfg))
+    if cfg.entry_block is None:
+        return ssa
+    edges = cfg.edges
+    next_id = max(block.id for block in cfg.blocks) + 1
+    if edges.pred[cfg.entry_block.index]:
+        preheader = BasicBlock(next_id)
+        next_id += 1
+        edges.add_block(preheader)
+        edges.add_edge(preheader.index, cfg.entry_block.index)
+        cfg.blocks.insert(0, preheader)
+        cfg.entry_block = preheader
+        ssa.added.append(preheader)
+    if isinstance(cfg.blocks[-1].terminator, IRCondJump):
+        exit_block = BasicBlock(next_id)
+        edges.add_block(exit_block)
+        edges.add_edge(cfg.blocks[-1].index, exit_block.index)
+        cfg.blocks.append(exit_block)
+        ssa.added.append(exit_block)
+    memory = ssa.memory
+
+    # Blocks defining each renamed variable
+    definitions: Dict[str, List[int]] = {}
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            dest = defined_variable(instr)
+            if dest is not None and dest not in memory:
+                blocks = definitions.setdefault(dest, [])
+                if not blocks or blocks[-1] != block.index:
+                    blocks.append(block.index)
+    results = [name for name in definitions if not name.startswith("#")]
+
+    # Phi functions on the iterated dominance frontier, where the variable is live
+    live = liveness(cfg, live_at_exit=results)
+    live_in = live.result.block_in
+    frontiers = dominators(cfg).frontiers
+    phis: Dict[int, List[IRPhi]] = {}
+    for name, blocks in definitions.items():
+        bit = 1 << live.variable_bits[name]
+        placed: Set[int] = set()
+        queued = set(blocks)
+        work = list(blocks)
+        while work:
+            for target in frontiers[work.pop()]:
+                if target in placed or not live_in[target] & bit:
+                    continue
+                placed.add(target)
+                phis.setdefault(target, []).append(IRPhi(name, {}))
+                if target not in queued:
+                    queued.add(target)
+                    work.append(target)
+    ssa.phis = sum(len(placed) for placed in phis.values())
+
+    _rename(ssa, definitions, phis, results)
+    rebuild_bb_ir(cfg)
+    return ssa
+
+
+def _rename(ssa: SSAForm, definitions: Dict[str, List[int]], phis: Dict[int, List[IRPhi]], results: List[str]):
+    """Give every definition a new version, walking the dominator tree."""
+    cfg = ssa.cfg
+    edges = cfg.edges
+    tree = dominators(cfg)
+    original = ssa.original
+    counter: Dict[str, int] = {}
+    stacks: Dict[str, List[str]] = {name: [] for name in definitions}
+    pushed: List[str] = []    # variables in the order their versions were pushed
+
+    def define(name: str) -> str:
+        version = counter.get(name, 0) + 1
+        counter[name] = version
+        new = f"{name}.{version}"
+        original[new] = name
+        stacks[name].append(new)
+        pushed.append(name)
+        return new
+
+    def use(operand: str) -> str:
+        stack = stacks.get(operand)
+        return stack[-1] if stack else operand
+
+    # Phi functions are named after their variable until renamed
+    variables = {id(phi): phi.dest for placed in phis.values() for phi in placed}
+    blocks = edges.blocks
+    marks: Dict[int, int] = {}
+    stack = [cfg.entry_block.index]
+    while stack:
+        index = stack.pop()
+        if index < 0:
+            # Leaving the subtree: drop the versions it pushed
+            mark = marks.pop(~index)
+            while len(pushed) > mark:
+                stacks[pushed.pop()].pop()
+            continue
+        marks[index] = len(pushed)
+        block = blocks[index]
+
+        placed = phis.get(index, [])
+        for phi in placed:
+            phi.dest = define(phi.dest)
+        instructions: List[Instruction] = list(placed)
+        for instr in block.instructions:
+            dest = defined_variable(instr)
+            # Operands are read before the destination is written
+            renamed = rename_instruction(instr, use)
+            if dest is not None and dest not in ssa.memory:
+                renamed = rename_instruction(renamed, lambda operand: operand, define(dest))
+            instructions.append(renamed)
+        block.instructions = instructions
+        if block.terminator is not None:
+            block.terminator = rename_instruction(block.terminator, use)
+
+        successors = edges.succ[index]
+        for successor in successors:
+            for phi in phis.get(successor, ()):
+                phi.sources[index] = use(variables[id(phi)])
+        if not successors:
+            ssa.exit_values[index] = {name: use(name) for name in results}
+
+        stack.append(~index)
+        stack.extend(reversed(tree.children[index]))
+
+
+# =======================
+# Destruction
+# =======================
+
+def sequential_copies(copies: List[Tuple[str, str]], temporary: Callable[[], str]) -> List[IRAssign]:
+    """Order parallel copies (dest, source) so no source is overwritten before it is read.
+
+    A cycle (e.g. a swap) is broken by saving one value in a temporary.
+    """
+    pending = {dest: source for dest, source in copies if dest != source}
+    result: List[IRAssign] = []
+    while pending:
+        read = set(pending.values())
+        ready = [dest for dest in pending if dest not in read]
+        if ready:
+            for dest in ready:
+                result.append(IRAssign(dest, pending.pop(dest)))
+            continue
+        # Only cycles are left: free one destination
+        dest = next(iter(pending))
+        saved = temporary()
+        result.append(IRAssign(saved, dest))
+        for other, source in pending.items():
+            if source == dest:
+                pending[other] = saved
+    return result
+
+
+class _Destructor:
+    """State of one destruct_ssa call."""
+
+    def __init__(self, ssa: SSAForm):
+        self.ssa = ssa
+        self.cfg = ssa.cfg
+        self.edges = ssa.cfg.edges
+        self.rename: Dict[str, str] = {}
+        self.next_id = max((block.id for block in self.cfg.blocks), default=-1) + 1
+        self.next_label = len(self.cfg.label_to_block) + 1
+        self.temporaries = 0
+        self.split = 0
+        self.copies = 0
+
+    def base(self, name: str) -> str:
+        return self.ssa.original.get(name, name)
+
+    def phi_source(self, phi: IRPhi, predecessor: int) -> str:
+        """Value a phi function takes from a predecessor (the value on entry if it has none)."""
+        return phi.sources.get(predecessor, self.base(phi.dest))
+
+    def interference(self) -> Dict[str, Set[str]]:
+        """Pairs of versions of the same variable that are live at the same time.
+
+        Phi arguments are read at the end of the predecessors and phi
+        destinations written at the start of their block; exit values are
+        read at the end of the exit blocks. A copy does not make its source
+        and destination interfere (they hold the same value). Only renamed
+        variables and their versions are tracked: the others have one name.
+        """
+        cfg, edges, ssa = self.cfg, self.edges, self.ssa
+        tracked = set(ssa.original)
+        tracked.update(ssa.original.values())
+        variable_bits: Dict[str, int] = {}
+        variables: List[str] = []
+
+        def bit(name: str) -> int:
+            position = variable_bits.get(name)
+            if position is None:
+                position = variable_bits[name] = len(variables)
+                variables.append(name)
+            return 1 << position
+
+        def reads_at_end(block: BasicBlock) -> List[str]:
+            reads = [self.phi_source(phi, block.index) for successor in edges.succ[block.index]
+                     for phi in phi_functions(edges.blocks[successor])]
+            reads.extend(ssa.exit_values.get(block.index, {}).values())
+            return [operand for operand in reads if operand in tracked]
+
+        size = len(edges.blocks)
+        gen = [0] * size
+        kill = [0] * size
+        for block in cfg.blocks:
+            use = defined = 0
+            for operand in reads_at_end(block):
+                use |= bit(operand)
+            body = block.instructions + ([block.terminator] if block.terminator is not None else [])
+            for instr in reversed(body):
+                dest = instr.dest if isinstance(instr, IRPhi) else defined_variable(instr)
+                if dest in tracked:
+                    mask = bit(dest)
+                    defined |= mask
+                    use &= ~mask
+                if not isinstance(instr, IRPhi):
+                    for operand in used_operands(instr):
+                        if operand in tracked:
+                            use |= bit(operand)
+            gen[block.index] = use
+            kill[block.index] = defined
+        result = solve(cfg, DataflowProblem(BACKWARD, gen, kill, may=True, universe=len(variables)))
+
+        # Walk each block backwards with the live versions grouped by variable
+        interferes: Dict[str, Set[str]] = {}
+        for block in cfg.blocks:
+            live: Dict[str, Set[str]] = {}
+            value = result.block_out[block.index]
+            while value:
+                low = value & -value
+                name = variables[low.bit_length() - 1]
+                live.setdefault(self.base(name), set()).add(name)
+                value ^= low
+            for operand in reads_at_end(block):
+                live.setdefault(self.base(operand), set()).add(operand)
+
+            body = block.instructions + ([block.terminator] if block.terminator is not None else [])
+            for instr in reversed(body):
+                dest = instr.dest if isinstance(instr, IRPhi) else defined_variable(instr)
+                if dest in tracked:
+                    same = live.get(self.base(dest), ())
+                    copied = instr.source if isinstance(instr, IRAssign) else None
+                    for other in same:
+                        if other != dest and other != copied:
+                            interferes.setdefault(dest, set()).add(other)
+                            interferes.setdefault(other, set()).add(dest)
+                    if dest in same:
+                        same.discard(dest)
+                if not isinstance(instr, IRPhi):
+                    for operand in used_operands(instr):
+                        if operand in tracked:
+                            live.setdefault(self.base(operand), set()).add(operand)
+        return interferes
+
+    def coalesce(self):
+        """Map versions back to their variable where they do not interfere with the versions already mapped."""
+        interferes = self.interference()
+        classes: Dict[str, Set[str]] = {}
+        for name, variable in self.ssa.original.items():
+            members = classes.setdefault(variable, {variable})
+            if members.isdisjoint(interferes.get(name, ())):
+                members.add(name)
+                self.rename[name] = variable
+
+    def temporary(self) -> str:
+        """A temporary not used anywhere in the graph."""
+        if not self.temporaries:
+            numbers = [int(name[1:].split(".")[0]) for name in self.ssa.original if name.startswith("#")]
+            for block in self.cfg.blocks:
+                for instr in block.instructions:
+                    dest = defined_variable(instr)
+                    if dest is not None and dest.startswith("#"):
+                        numbers.append(int(dest[1:].split(".")[0]))
+            self.temporaries = max(numbers, default=-1) + 1
+        name = f"#{self.temporaries}"
+        self.temporaries += 1
+        return name
+
+    def new_block(self, labeled: bool) -> BasicBlock:
+        """A new empty block at the end of cfg.blocks, with a fresh BB_n label if labeled."""
+        cfg = self.cfg
+        block = BasicBlock(self.next_id)
+        self.next_id += 1
+        if labeled:
+            while f"BB_{self.next_label}" in cfg.label_to_block:
+                self.next_label += 1
+            block.label = f"BB_{self.next_label}"
+            cfg.label_to_block[block.label] = block
+        self.edges.add_block(block)
+        cfg.blocks.append(block)    # placed in the layout by run()
+        return block
+
+    def run(self) -> PassStats:
+        ssa, cfg, edges = self.ssa, self.cfg, self.edges
+        stats = PassStats("out-of-ssa", counts={"copies": 0, "split": 0, "versions": 0})
+        self.coalesce()
+        rename = self.rename
+
+        def use(operand: str) -> str:
+            return rename.get(operand, operand)
+
+        # Copies for each edge into a block with phi functions, and at the exits
+        edge_copies: Dict[Tuple[int, int], List[Tuple[str, str]]] = {}
+        for block in cfg.blocks:
+            phis = phi_functions(block)
+            if not phis:
+                continue
+            stats.instructions_removed += len(phis)
+            for source in edges.pred[block.index]:
+                copies = [(use(phi.dest), use(self.phi_source(phi, source))) for phi in phis]
+                edge_copies[(source, block.index)] = [(dest, value) for dest, value in copies if dest != value]
+        for block in cfg.blocks:
+            instructions = []
+            for instr in block.instructions:
+                if isinstance(instr, IRPhi):
+                    continue
+                dest = defined_variable(instr)
+                instructions.append(rename_instruction(instr, use, None if dest is None else use(dest)))
+            block.instructions = instructions
+            if block.terminator is not None:
+                block.terminator = rename_instruction(block.terminator, use)
+        for index, values in ssa.exit_values.items():
+            block = edges.blocks[index]
+            copies = sequential_copies([(name, use(value)) for name, value in values.items()], self.temporary)
+            block.instructions = block.instructions + copies
+            stats.counts["copies"] += len(copies)
+
+        # Copies go at the end of the predecessor, or into a new block on a critical edge
+        layout_after: Dict[int, BasicBlock] = {}
+        jump_blocks: List[BasicBlock] = []
+        blocks_before = list(cfg.blocks)
+        for (source, target), pairs in edge_copies.items():
+            copies = sequential_copies(pairs, self.temporary)
+            if not copies:
+                continue
+            stats.counts["copies"] += len(copies)
+            block = edges.blocks[source]
+            if len(edges.succ[source]) == 1:
+                block.instructions = block.instructions + copies
+                continue
+            stats.counts["split"] += 1
+            target_block = edges.blocks[target]
+            jumps_there = cfg.jump_target(block) is target_block
+            split = self.new_block(jumps_there)
+            split.instructions = copies
+            edges.remove_edge(source, target)
+            if jumps_there:
+                block.terminator = IRCondJump(block.terminator.cond, split.label)
+                edges.add_edge(source, split.index, first=True)
+                split.terminator = IRJump(target_block.label)
+                jump_blocks.append(split)
+            else:
+                edges.add_edge(source, split.index)
+                layout_after[source] = split
+            edges.add_edge(split.index, target)
+
+        # Blocks entered by a jump go after the last block, which must not fall into them
+        layout: List[BasicBlock] = []
+        for block in blocks_before:
+            layout.append(block)
+            if block.index in layout_after:
+                layout.append(layout_after[block.index])
+        if jump_blocks:
+            last = layout[-1]
+            if not isinstance(last.terminator, IRJump):
+                end = self.new_block(True)
+                if last.terminator is None:
+                    last.terminator = IRJump(end.label)
+                    edges.add_edge(last.index, end.index)
+                else:
+                    bridge = self.new_block(False)
+                    bridge.terminator = IRJump(end.label)
+                    edges.add_edge(last.index, bridge.index)
+                    edges.add_edge(bridge.index, end.index)
+                    layout.append(bridge)
+                jump_blocks.append(end)
+            layout.extend(jump_blocks)
+        cfg.blocks[:] = layout
+
+        # The blocks construct_ssa added, and blocks optimisations emptied, go
+        entry = cfg.entry_block
+        if entry in ssa.added and not entry.instructions and entry.terminator is None and entry.label is None:
+            cfg.entry_block = edges.blocks[edges.succ[entry.index][0]]
+        remove_empty_fallthrough_blocks(cfg)
+
+        stats.counts["versions"] = len(ssa.original) - len(rename)
+        rebuild_bb_ir(cfg)
+        return stats
+
+
+def destruct_ssa(ssa: SSAForm) -> PassStats:
+    """Convert a CFG in SSA form back to IR without phi functions, in place.
+
+    instructions_removed counts the phi functions; counters: copies
+    (copies inserted), split (critical edges given a block), versions (SSA
+    names left because they interfere with another version).
+    """
+    return _Destructor(ssa).run()
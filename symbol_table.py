@@ -0,0 +1,125 @@
+"""
+Interned Symbol Table for IR Operands
+
+This module maps every IR operand name to a small integer id:
+1. Temporaries (#n), LABEL_n and BB_n labels carry their number in the id
+   itself, so they take no memory and their names are only built when printed
+2. Every other name (variables, constants, operators, LABEL_entry) is stored
+   once and referred to by index
+3. Renaming and comparing symbols are integer operations
+
+Id layout: id = (payload << 2) | kind, where payload is the number of a
+numbered symbol or the index of an interned name.
+"""
+
+from typing import Dict, List
+
+
+# =======================
+# Symbol Kinds
+# =======================
+
+NAME = 0     # interned string (variable, constant, operator, other label)
+TEMP = 1     # #n
+LABEL = 2    # LABEL_n
+BB = 3       # BB_n
+
+_KIND_BITS = 2
+_KIND_MASK = (1 << _KIND_BITS) - 1
+
+# Name prefix of each numbered kind
+_PREFIXES = {TEMP: "#", LABEL: "LABEL_", BB: "BB_"}
+
+
+def symbol_kind(symbol: int) -> int:
+    """Kind of a symbol id (NAME, TEMP, LABEL or BB)."""
+    return symbol & _KIND_MASK
+
+
+def symbol_number(symbol: int) -> int:
+    """Number of a TEMP, LABEL or BB symbol (name index for NAME)."""
+    return symbol >> _KIND_BITS
+
+
+def numbered(kind: int, number: int) -> int:
+    """Id of a numbered symbol, e.g. numbered(TEMP, 3) is #3."""
+    return (number << _KIND_BITS) | kind
+
+
+def _parse_number(text: str):
+    """Number in a canonical decimal string ("0", "12"), else None."""
+    if text.isascii() and text.isdigit() and (text == "0" or text[0] != "0"):
+        return int(text)
+    return None
+
+
+# =======================
+# Symbol Table
+# =======================
+
+class SymbolTable:
+    """Bidirectional mapping between operand names and integer ids.
+
+    Usage:
+        symbols = SymbolTable()
+        x = symbols.intern("x")          # interned name
+        t = symbols.temp(0)              # #0, nothing stored
+        symbols.name(t)                  # "#0", built on demand
+
+    Interning the text of a numbered symbol ("#3", "LABEL_2", "BB_1") gives
+    the same id as temp(3) / label(2) / bb(1), so ids can be compared
+    directly whatever way they were created.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, text: str) -> int:
+        """Id of a name, adding it to the table if new."""
+        symbol = self.ids.get(text)
+        if symbol is not None:
+            return symbol
+
+        if text.startswith("#"):
+            kind, digits = TEMP, text[1:]
+        elif text.startswith("LABEL_"):
+            kind, digits = LABEL, text[6:]
+        elif text.startswith("BB_"):
+            kind, digits = BB, text[3:]
+        else:
+            kind, digits = NAME, ""
+        if kind != NAME:
+            number = _parse_number(digits)
+            if number is not None:
+                return numbered(kind, number)
+
+        symbol = self.ids[text] = numbered(NAME, len(self.names))
+        self.names.append(text)
+        return symbol
+
+    def temp(self, number: int) -> int:
+        """Id of temporary #number."""
+        return numbered(TEMP, number)
+
+    def label(self, number: int) -> int:
+        """Id of LABEL_number."""
+        return numbered(LABEL, number)
+
+    def bb(self, number: int) -> int:
+        """Id of BB_number."""
+        return numbered(BB, number)
+
+    def name(self, symbol: int) -> str:
+        """Text of a symbol id."""
+        kind = symbol & _KIND_MASK
+        if kind == NAME:
+            return self.names[symbol >> _KIND_BITS]
+        return f"{_PREFIXES[kind]}{symbol >> _KIND_BITS}"
+
+    def __len__(self):
+        """Number of interned (NAME) symbols."""
+        return len(self.names)
+
+    def __repr__(self):
+        return f"SymbolTable({len(self.names)} names)"
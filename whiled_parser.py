@@ -0,0 +1,335 @@
+"""
+WhileD Source Parser
+
+This module turns WhileD program text into the AST classes of ast_definition:
+1. Lexer: a single compiled pattern splits the source into token strings
+2. Expressions: precedence climbing with an explicit operator stack
+3. Statements: an explicit stack of open if/while/block frames
+
+Neither level recurses, so nesting depth is limited only by memory.
+
+Syntax (as in the test programs):
+    x = a + b * c                      assignment
+    *p = 10                            store through a pointer
+    skip
+    s1; s2; s3                         sequence (CSeq nests to the right)
+    { s1; s2 }                         block
+    if (x > 0) then s1 else s2
+    while (i < n) do { s = s + i; i = i + 1 }
+
+Operators, loosest to tightest: ||, &&, == !=, < <= > >=, + -, * / %,
+then the prefix operators - ! * & (all binary operators are left-associative).
+"""
+
+import re
+from typing import List, Optional
+from ast_definition import *
+
+
+class ParseError(ValueError):
+    """Syntax error in WhileD source, with the line and column where it was found."""
+
+    def __init__(self, message: str, source: str, pos: int):
+        self.line = source.count('\n', 0, pos) + 1
+        self.column = pos - (source.rfind('\n', 0, pos) + 1) + 1
+        super().__init__(f"line {self.line}, column {self.column}: {message}")
+
+
+# =======================
+# Lexer
+# =======================
+
+KEYWORDS = frozenset({"skip", "if", "then", "else", "while", "do"})
+
+# Binary operators and their precedence (higher binds tighter)
+BINARY_PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3,
+    "<": 4, "<=": 4, ">": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6, "%": 6,
+}
+PREFIX_OPERATORS = frozenset({"-", "!", "*", "&"})
+OPERATORS = frozenset(BINARY_PRECEDENCE) | PREFIX_OPERATORS | set("=;(){}")
+
+_DIGITS = frozenset("0123456789")
+_NAME_START = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_")
+
+# Above every binary operator: parse a single prefix/primary operand
+_UNARY_ONLY = max(BINARY_PRECEDENCE.values()) + 1
+
+# One token per match: a number, a name, an operator, or any other
+# character (reported as an error by the parser)
+_TOKEN_PATTERN = re.compile(r"\s*([0-9]+|[A-Za-z_][A-Za-z0-9_]*|\|\||&&|==|!=|<=|>=|\S)")
+
+# Marks the end of the token list
+EOF = ""
+
+
+def tokenize(source: str) -> List[str]:
+    """Split a source string into token texts, followed by EOF.
+
+    Tokens are plain strings, classified by the parser from their text:
+    numbers start with a digit, names with a letter or '_', everything
+    else is an operator (or an unexpected character). The whole scan runs
+    inside the regular expression engine.
+    """
+    tokens = _TOKEN_PATTERN.findall(source)
+    tokens.append(EOF)
+    return tokens
+
+
+def token_position(source: str, index: int) -> int:
+    """Offset in source of the token with the given index (only needed for errors)."""
+    for i, match in enumerate(_TOKEN_PATTERN.finditer(source)):
+        if i == index:
+            return match.start(1)
+    return len(source)
+
+
+# =======================
+# Parser
+# =======================
+
+class Parser:
+    """Parser for one WhileD source string.
+
+    Usage:
+        program = Parser(source).parse_program()
+        expr = Parser("a + b * c").parse_expression_only()
+
+    Args:
+        source: WhileD program text
+        table: If given, every node is built through this HashConsTable, so
+            identical subtrees of the program are shared
+    """
+
+    def __init__(self, source: str, table: Optional[HashConsTable] = None):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.index = 0
+        self.text = self.tokens[0]
+        self.make = table.make if table is not None else (lambda cls, *args: cls(*args))
+
+    # ==================
+    # Token Helpers
+    # ==================
+
+    def advance(self):
+        """Move to the next token."""
+        self.index += 1
+        self.text = self.tokens[self.index]
+
+    def error(self, message: str) -> ParseError:
+        text = self.text
+        if text == EOF:
+            message += ", found end of input"
+        elif text[0] in _DIGITS or text[0] in _NAME_START or text in OPERATORS:
+            message += f", found {text!r}"
+        else:
+            message = f"unexpected character {text!r}"
+        return ParseError(message, self.source, token_position(self.source, self.index))
+
+    def expect(self, text: str):
+        """Consume the token with the given text."""
+        if self.text != text:
+            raise self.error(f"expected {text!r}")
+        self.advance()
+
+    # ==================
+    # Expressions
+    # ==================
+
+    def parse_expression(self, min_precedence: int = 1) -> Expr:
+        """Parse an expression whose binary operators bind at least min_precedence.
+
+        Precedence climbing without recursion: operands and pending operators
+        live on explicit stacks, and an operator is applied as soon as one
+        binding at least as tightly follows it. Open parentheses are markers
+        on the operator stack; each restarts climbing at the lowest level.
+
+        Operator stack entries:
+            ("(", floor)          open parenthesis; floor is the enclosing min_precedence
+            ("u", op)             prefix operator waiting for its operand
+            ("b", op, prec)       binary operator waiting for its right operand
+        """
+        make = self.make
+        operands: List[Expr] = []
+        operators: List[tuple] = []
+        floor = min_precedence
+
+        while True:
+            # Operand position: prefix operators and '(' until a primary
+            text = self.text
+            if text in PREFIX_OPERATORS:
+                operators.append(("u", text))
+                self.advance()
+                continue
+            if text == "(":
+                operators.append(("(", floor))
+                floor = 1
+                self.advance()
+                continue
+            first = text[:1]
+            if first in _DIGITS:
+                operands.append(make(EConst, int(text)))
+            elif first in _NAME_START and text not in KEYWORDS:
+                operands.append(make(EVar, text))
+            else:
+                raise self.error("expected an expression")
+            self.advance()
+
+            # Operator position: close parentheses, then a binary operator or the end
+            while True:
+                text = self.text
+                prec = BINARY_PRECEDENCE.get(text, 0)
+                if prec < floor:
+                    prec = 0
+                # Apply the pending operators that bind at least as tightly
+                while operators:
+                    top = operators[-1]
+                    if top[0] == "u":
+                        operators.pop()
+                        operands.append(self._unary(top[1], operands.pop()))
+                    elif top[0] == "b" and top[2] >= prec:
+                        operators.pop()
+                        right = operands.pop()
+                        operands.append(make(EBinop, top[1], operands.pop(), right))
+                    else:
+                        break
+                if prec:
+                    operators.append(("b", text, prec))
+                    self.advance()
+                    break
+                if text == ")" and operators and operators[-1][0] == "(":
+                    floor = operators.pop()[1]
+                    self.advance()
+                    continue
+                if operators:
+                    raise self.error("expected ')'")
+                return operands[0]
+
+    def _unary(self, op: str, operand: Expr) -> Expr:
+        """Build the node of a prefix operator."""
+        if op == "*":
+            return self.make(EDeref, operand)
+        if op == "&":
+            return self.make(EAddrOf, operand)
+        return self.make(EUnop, op, operand)
+
+    def parse_expression_only(self) -> Expr:
+        """Parse a source consisting of a single expression."""
+        expr = self.parse_expression()
+        if self.text != EOF:
+            raise self.error("expected end of input")
+        return expr
+
+    # ==================
+    # Statements
+    # ==================
+
+    def parse_program(self) -> Com:
+        """Parse a whole program (a statement sequence up to the end of input).
+
+        Open constructs are kept on a frame stack instead of the call stack:
+            ["seq", statements, closing]   sequence, closed by '}' or end of input
+            ["if", cond, then_branch]      then_branch is None until 'else'
+            ["while", cond]
+        """
+        make = self.make
+        frames: List[list] = [["seq", [], ""]]
+
+        while True:
+            # Start of a statement: open frames until a simple statement is parsed
+            text = self.text
+            if text == "if":
+                self.advance()
+                cond = self.parse_expression()
+                self.expect("then")
+                frames.append(["if", cond, None])
+                continue
+            if text == "while":
+                self.advance()
+                cond = self.parse_expression()
+                self.expect("do")
+                frames.append(["while", cond])
+                continue
+            if text == "{":
+                self.advance()
+                frames.append(["seq", [], "}"])
+                continue
+            stmt = self._simple_statement()
+
+            # End of a statement: close the frames it completes
+            while True:
+                frame = frames[-1]
+                if frame[0] == "if":
+                    if frame[2] is None:
+                        frame[2] = stmt
+                        self.expect("else")
+                        break
+                    frames.pop()
+                    stmt = make(CIf, frame[1], frame[2], stmt)
+                    continue
+                if frame[0] == "while":
+                    frames.pop()
+                    stmt = make(CWhile, frame[1], stmt)
+                    continue
+
+                # Sequence: ';' continues it (a trailing ';' is allowed), '}' or end closes it
+                statements, closing = frame[1], frame[2]
+                statements.append(stmt)
+                if self.text == ";":
+                    self.advance()
+                    if not self._at_close(closing):
+                        break
+                if not self._at_close(closing):
+                    raise self.error("expected ';'" + (" or '}'" if closing else ""))
+                stmt = self._sequence(statements)
+                if not closing:
+                    return stmt
+                self.advance()
+                frames.pop()
+
+    def _at_close(self, closing: str) -> bool:
+        """Check whether the current token closes a sequence ('}' or end of input)."""
+        return self.text == closing
+
+    def _simple_statement(self) -> Com:
+        """Parse skip, an assignment or a pointer store."""
+        text = self.text
+        if text == "skip":
+            self.advance()
+            return self.make(CSkip)
+        if text[:1] in _NAME_START and text not in KEYWORDS:
+            self.advance()
+            self.expect("=")
+            return self.make(CAsgnVar, text, self.parse_expression())
+        if text == "*":
+            self.advance()
+            addr = self.parse_expression(_UNARY_ONLY)
+            self.expect("=")
+            return self.make(CAsgnDeref, addr, self.parse_expression())
+        raise self.error("expected a statement")
+
+    def _sequence(self, statements: List[Com]) -> Com:
+        """Right-nested CSeq of a statement list."""
+        stmt = statements[-1]
+        for first in reversed(statements[:-1]):
+            stmt = self.make(CSeq, first, stmt)
+        return stmt
+
+
+# =======================
+# Convenience Functions
+# =======================
+
+def parse_program(source: str, table: Optional[HashConsTable] = None) -> Com:
+    """Parse WhileD program text into an AST."""
+    return Parser(source, table).parse_program()
+
+
+def parse_expression(source: str, table: Optional[HashConsTable] = None) -> Expr:
+    """Parse a single WhileD expression."""
+    return Parser(source, table).parse_expression_only()